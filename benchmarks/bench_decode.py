@@ -0,0 +1,85 @@
+"""Decoding of a large API page: json.loads(response.text) against the bytes-based (orjson) and incremental (ijson)
+decoding of wrex.decode. Each page is turned into columnar WOSpaper objects, as WOSquery.parse_responsedata() does.
+
+Run from the repository root with:
+    python -m benchmarks.bench_decode [records per page] [repeats]
+"""
+import json
+import sys
+import time
+import tracemalloc
+from wrex import WOSpaper
+from wrex import decode
+from wrex.cache import CachedResponse
+from wrex.compact import WOSrecordstore
+from wrex.synthetic import make_corpus
+
+
+def legacy_records(response):
+    return decode.response_records(json.loads(response.text), firstrun=True)
+
+
+def bytes_records(response):
+    return decode.decode_page(response, firstrun=True, incremental=False)[1]
+
+
+def incremental_records(response):
+    return decode.decode_page(response, firstrun=True, incremental=True)[1]
+
+
+def build_papers(decoder, response):
+    store = WOSrecordstore()
+    papers = []
+    for x in decoder(response):
+        papers.append(WOSpaper(x))
+        papers[-1].compact("columnar", store)
+    return papers
+
+
+def decode_only(decoder, response):
+    return list(decoder(response))
+
+
+def best_time(func, decoder, response, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func(decoder, response)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def measure(decoder, response, repeats):
+    decoding = best_time(decode_only, decoder, response, repeats)
+    building = best_time(build_papers, decoder, response, repeats)
+    tracemalloc.start()
+    papers = build_papers(decoder, response)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del papers
+    return decoding, building, peak
+
+
+def main(size=1000, repeats=5):
+    page = {"QueryResult": {"QueryID": 1, "RecordsFound": size, "RecordsSearched": size},
+            "Data": {"Records": {"records": {"REC": make_corpus(size)}}}}
+    response = CachedResponse(200, {}, json.dumps(page).encode("utf-8"))
+    del page
+    print("Page: {} synthetic records, {:.1f} MB (orjson {}, ijson {})".format(
+        size, len(response.content) / 1024 ** 2, "installed" if decode.orjson else "missing",
+        decode.ijson.backend if decode.ijson else "missing"))
+
+    decoders = [("json.loads(response.text)", legacy_records), ("Bytes decoding", bytes_records)]
+    if decode.ijson is not None:
+        decoders.append(("Incremental decoding", incremental_records))
+    print("{:<26} {:>16} {:>18} {:>10}".format("", "decode only", "decode + papers", "peak"))
+    baseline = None
+    for name, decoder in decoders:
+        decoding, building, peak = measure(decoder, response, repeats)
+        baseline = baseline or decoding
+        print("{:<26} {:>7.1f} ms {:.2f}x {:>15.1f} ms {:>7.1f} MB".format(name, decoding * 1000, baseline / decoding,
+                                                                         building * 1000, peak / 1024 ** 2))
+
+
+if __name__ == "__main__":
+    main(*[int(x) for x in sys.argv[1:3]])
@@ -0,0 +1,41 @@
+"""Micro-benchmark of field extraction: make_field_dict and the FIELD_SPEC interpreter against the original function.
+
+Run from the repository root with:
+    python -m benchmarks.bench_fields [number of records] [repeats]
+"""
+import sys
+import time
+from wrex.fields import make_field_dict, default_extractor
+from wrex.synthetic import make_corpus
+from benchmarks.legacy_fields import legacy_make_field_dict
+
+
+def records_per_second(funcs, corpus, repeats):
+    # Alternate between the functions on every repeat, so that drift in machine load affects them equally
+    best = [float("inf")] * len(funcs)
+    for _ in range(repeats):
+        for x, func in enumerate(funcs):
+            start = time.perf_counter()
+            for record in corpus:
+                func(record)
+            best[x] = min(best[x], time.perf_counter() - start)
+    return [len(corpus) / x for x in best]
+
+
+def main(size=20000, repeats=5):
+    corpus = make_corpus(size)
+    mismatched = sum(make_field_dict(x) != legacy_make_field_dict(x) for x in corpus)
+    print("Corpus: {} synthetic records, {} with differing output".format(size, mismatched))
+    # make_field_dict() is written out by hand and must agree with the spec, down to the order of the fields
+    unspecified = sum(list(make_field_dict(x).items()) != list(default_extractor.extract(x).items()) for x in corpus)
+    print("{} records where make_field_dict differs from FIELD_SPEC".format(unspecified))
+
+    legacy, extracted, interpreted = records_per_second(
+        [legacy_make_field_dict, make_field_dict, default_extractor.extract], corpus, repeats)
+    print("Legacy make_field_dict:   {:>10,.0f} records/sec".format(legacy))
+    print("make_field_dict:          {:>10,.0f} records/sec ({:.2f}x)".format(extracted, extracted / legacy))
+    print("FieldExtractor:           {:>10,.0f} records/sec ({:.2f}x)".format(interpreted, interpreted / legacy))
+
+
+if __name__ == "__main__":
+    main(*[int(x) for x in sys.argv[1:3]])
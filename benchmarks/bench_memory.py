@@ -0,0 +1,27 @@
+"""Memory used per record by WOSpaper objects under each compact storage mode.
+
+Run from the repository root with:
+    python -m benchmarks.bench_memory [number of records]
+"""
+import json
+import sys
+from wrex import WOSpaper
+from wrex.compact import WOSrecordstore, deep_sizeof
+from wrex.synthetic import make_corpus
+
+
+def main(size=20000):
+    print("Corpus: {} synthetic records".format(size))
+    for rawdata, intern in [("keep", False), ("columnar", False), ("columnar", True), ("drop", False), ("drop", True)]:
+        store = WOSrecordstore() if rawdata == "columnar" else None
+        # Round trip through JSON so that, as with API responses, repeated values are separate string objects
+        papers = [WOSpaper(x) for x in json.loads(json.dumps(make_corpus(size)))]
+        for x in papers:
+            x.compact(rawdata, store, intern)
+        print("rawdata={:<9} intern={!s:<6} {:>8,.0f} bytes/record".format(rawdata, intern,
+                                                                            deep_sizeof([papers, store]) / size))
+        del papers, store
+
+
+if __name__ == "__main__":
+    main(*[int(x) for x in sys.argv[1:2]])
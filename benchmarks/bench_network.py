@@ -0,0 +1,71 @@
+"""Co-authorship and keyword co-occurrence networks built with nested Python loops against sparse matrix products.
+
+One record in every 200 is turned into a large collaboration with hundreds of authors, as real corpora have, since those
+are where pairwise loops become quadratic.
+
+Run from the repository root with:
+    python -m benchmarks.bench_network [number of records] [authors per collaboration]
+"""
+import collections
+import itertools
+import sys
+import random
+import time
+from wrex.WOS import WOSquery, WOSpaper
+from wrex.fields import list_from_WOSlist
+from wrex.network import build_network
+from wrex.synthetic import make_corpus
+
+
+def loop_network(wosquery, field):
+    """Count co-occurrences pair by pair, as was needed before wrex.network."""
+    weights = collections.Counter()
+    for paper in wosquery:
+        values = sorted(set(paper.fielddict(return_dict=True).get(field) or []))
+        for x, y in itertools.combinations(values, 2):
+            weights[x, y] += 1
+    return weights
+
+
+def add_collaborations(corpus, authors, every=200):
+    rng = random.Random(0)
+    pool = ["MEMBER{}, {}".format(x, rng.choice("ABCDEFGH")) for x in range(authors * 5)]
+    for record in corpus[::every]:
+        names = record["static_data"]["summary"]["names"]
+        # Records with a single author hold it as a dict rather than a list
+        names["name"] = list_from_WOSlist(names["name"]) + [{"seq_no": x + 1, "role": "author", "wos_standard": y, "full_name": y, "display_name": y}
+                          for x, y in enumerate(rng.sample(pool, authors))]
+        names["count"] = len(names["name"])
+    return corpus
+
+
+def main(size=100000, authors=300):
+    wosquery = WOSquery(None, None, storage="drop")
+    wosquery.add_papers([WOSpaper(x) for x in add_collaborations(make_corpus(size), authors)])
+    print("Corpus: {} synthetic records, {} of them with {} extra authors".format(size, len(range(0, size, 200)),
+                                                                             authors))
+
+    for facet, field in (("author", "AU"), ("keyword", "ID")):
+        start = time.perf_counter()
+        weights = loop_network(wosquery, field)
+        looped = time.perf_counter() - start
+        start = time.perf_counter()
+        network = build_network(wosquery, facet)
+        sparse = time.perf_counter() - start
+        print("{:<8} nested loops: {:>7.2f} s, sparse: {:>7.2f} s ({:.1f}x), {} nodes, {} edges".format(
+            facet, looped, sparse, looped / sparse, len(network), len(weights)))
+
+    # With the inverted indexes built, the incidence matrix is read from them without touching any fields
+    wosquery.build_index()
+    start = time.perf_counter()
+    network = build_network(wosquery, "author")
+    indexed = time.perf_counter() - start
+    start = time.perf_counter()
+    pruned = network.threshold(2).prune(10)
+    pruning = time.perf_counter() - start
+    print("author   from the index: {:>7.2f} s, threshold and top-10 pruning: {:.2f} s ({} edges left)".format(
+        indexed, pruning, pruned.edgecount()))
+
+
+if __name__ == "__main__":
+    main(*[int(x) for x in sys.argv[1:3]])
@@ -0,0 +1,54 @@
+"""Field extraction of whole pages on a single process against a WOSparser process pool.
+
+Run from the repository root with:
+    python -m benchmarks.bench_parallel [number of records] [worker processes]
+"""
+import json
+import os
+import sys
+import time
+from wrex.cache import CachedResponse
+from wrex.parallel import WOSparser, extract_page
+from wrex.synthetic import make_corpus
+
+
+def make_pages(corpus, count=100):
+    pages = []
+    for x in range(0, len(corpus), count):
+        page = {"QueryResult": {"QueryID": 1}, "Records": {"records": {"REC": corpus[x:x + count]}}}
+        pages.append(CachedResponse(200, {}, json.dumps(page).encode("utf-8")))
+    return pages
+
+
+def main(size=20000, workers=None):
+    workers = workers or os.cpu_count()
+    corpus = make_corpus(size)
+    pages = make_pages(corpus)
+    print("Corpus: {} synthetic records in {} pages, {} CPU/s".format(size, len(pages), os.cpu_count()))
+
+    start = time.perf_counter()
+    for x in pages:
+        extract_page(x.content)
+    serial = time.perf_counter() - start
+    print("Single process:             {:>10,.0f} records/sec".format(size / serial))
+
+    for processes in sorted({1, workers}):
+        with WOSparser(processes) as parser:
+            # Start the workers before timing
+            parser.extract(corpus[:processes])
+            start = time.perf_counter()
+            futures = [parser.submit_page(x) for x in pages]
+            for x in futures:
+                x.result()
+            pooled = time.perf_counter() - start
+            start = time.perf_counter()
+            parser.extract(corpus)
+            batched = time.perf_counter() - start
+        print("WOSparser({:>2}) pages:       {:>10,.0f} records/sec ({:.2f}x)".format(processes, size / pooled,
+                                                                                    serial / pooled))
+        print("WOSparser({:>2}) raw records: {:>10,.0f} records/sec ({:.2f}x)".format(processes, size / batched,
+                                                                                    serial / batched))
+
+
+if __name__ == "__main__":
+    main(*[int(x) for x in sys.argv[1:3]])
@@ -0,0 +1,48 @@
+"""Reading WOS plain text exports, one line at a time and on WOSparser worker processes.
+
+Run from the repository root with:
+    python -m benchmarks.bench_plaintext [number of records] [worker processes]
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from wrex.WOS import WOSquery, WOSpaper
+from wrex.plaintext import read_records, read_export
+from wrex.synthetic import make_corpus
+
+
+def main(size=50000, workers=None):
+    workers = workers or os.cpu_count()
+    wosquery = WOSquery(None, None)
+    wosquery.add_papers([WOSpaper(x) for x in make_corpus(size)])
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "export.txt")
+        wosquery.export_to(path)
+        megabytes = os.path.getsize(path) / 1024 ** 2
+        print("Export: {} synthetic records, {:.0f} MB, {} CPU/s".format(size, megabytes, os.cpu_count()))
+
+        start = time.perf_counter()
+        for _ in read_records(path):
+            pass
+        elapsed = time.perf_counter() - start
+        # Measured on a separate pass, as tracing slows reading down
+        tracemalloc.start()
+        for _ in read_records(path):
+            pass
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print("read_records():             {:>7.1f} MB/sec {:>10,.0f} records/sec, peak memory {:.2f} MB".format(
+            megabytes / elapsed, size / elapsed, peak / 1024 ** 2))
+
+        for parser in (None, workers):
+            start = time.perf_counter()
+            loaded = read_export(path, parser=parser, storage="drop")
+            elapsed = time.perf_counter() - start
+            print("read_export(parser={:>4}): {:>7.1f} MB/sec {:>10,.0f} records/sec".format(
+                str(parser), megabytes / elapsed, len(loaded) / elapsed))
+
+
+if __name__ == "__main__":
+    main(*[int(x) for x in sys.argv[1:3]])
@@ -0,0 +1,42 @@
+"""Saving and reopening a binary snapshot, against rebuilding the papers of a query from its raw records saved as JSON.
+
+Run from the repository root with:
+    python -m benchmarks.bench_snapshot [number of records] [snapshot path]
+"""
+import os
+import sys
+import time
+from wrex import WOSpaper, WOSquery, save_snapshot, load_snapshot
+from wrex.decode import dumps, loads
+from wrex.synthetic import make_corpus
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main(size=100000, path="bench.snap"):
+    saved = dumps(make_corpus(size))
+    wosquery = WOSquery(None, None, querystr="TS=benchmark")
+    papers, parsing = timed(lambda: [WOSpaper(x) for x in loads(saved)])
+    wosquery.add_papers(papers)
+    wosquery.found = len(wosquery.data)
+    print("Corpus: {} synthetic records".format(size))
+    print("Raw records as JSON  {:>7.1f} MB  load and extract all fields {:>7.3f} s".format(len(saved) / 1024 ** 2,
+                                                                                       parsing))
+    del saved
+
+    for rawdata in (False, True):
+        _, saving = timed(save_snapshot, wosquery, path, rawdata)
+        loaded, opening = timed(load_snapshot, path)
+        _, materialising = timed(lambda: [x.fielddict(return_dict=True) for x in loaded])
+        print("Snapshot rawdata={!s:<5}{:>7.1f} MB  save {:>7.3f} s  open {:>7.3f} s  materialise all {:>7.3f} s"
+              .format(rawdata, os.path.getsize(path) / 1024 ** 2, saving, opening, materialising))
+        loaded.data.close()
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main(*[int(x) for x in sys.argv[1:2]], *sys.argv[2:3])
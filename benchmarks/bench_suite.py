@@ -0,0 +1,167 @@
+"""End-to-end benchmark suite of the client against a local WOSmockserver.
+
+Reports requests/sec and records/sec of WOSquery.getall() (serially, concurrently and against a throttling, page
+dropping server) and of WOSquery.agetall() over many concurrent queries, records/sec of response parsing, export throughput and peak memory. Results can be saved and compared
+with an earlier run, exiting with status 1 if any metric regressed by more than the tolerance.
+
+Run from the repository root with:
+    python -m benchmarks.bench_suite [--records N] [--latency S] [--workers N] [--save FILE] [--compare FILE]
+"""
+import argparse
+import asyncio
+import io
+import json
+import sys
+import time
+import tracemalloc
+import wrex
+from wrex.cache import CachedResponse
+from wrex.mockserver import WOSmockserver
+
+
+def connect(server):
+    # Pace requests far above the real API limit, so that the client rather than the rate limit is measured
+    return wrex.WOSconnection("mock", server.apiurl, scheduler=wrex.WOSscheduler(persecond=10000, backoff=0.01))
+
+
+def retrieve(server, workers):
+    conn = connect(server)
+    before = sum(server.requests.values())
+    start = time.perf_counter()
+    wosquery = wrex.query(conn, "TS=benchmark")
+    wosquery.getall(workers=workers)
+    elapsed = time.perf_counter() - start
+    requests = sum(server.requests.values()) - before
+    conn.close()
+    return wosquery, elapsed, requests
+
+
+async def aretrieve(server, queries, limit):
+    conn = wrex.WOSaioconnection("mock", server.apiurl, limit=limit,
+                                 scheduler=wrex.WOSscheduler(persecond=10000, backoff=0.01))
+    async with conn:
+        async def retrieve_one(x):
+            wosquery = await wrex.aquery(conn, "TS=benchmark{}".format(x))
+            await wosquery.agetall()
+            return len(wosquery)
+        return sum(await asyncio.gather(*[retrieve_one(x) for x in range(queries)]))
+
+
+def bench_retrieval(results, records, latency, workers):
+    with WOSmockserver(records=records, latency=latency) as server:
+        for x in sorted({1, workers}):
+            wosquery, elapsed, requests = retrieve(server, x)
+            results["getall_workers{}_requests".format(x)] = (requests / elapsed, "requests/sec", True)
+            results["getall_workers{}_records".format(x)] = (len(wosquery) / elapsed, "records/sec", True)
+    with WOSmockserver(records=records, latency=latency, throttle=0.1, drop=0.1, retryafter=0.01) as server:
+        wosquery, elapsed, requests = retrieve(server, workers)
+        results["getall_unreliable_records"] = (len(wosquery) / elapsed, "records/sec", True)
+        results["getall_unreliable_complete"] = (100.0 * len(wosquery) / records, "% retrieved", True)
+    # The same number of records spread over many small queries, all in flight on one event loop
+    queries = max(records // 250, 1)
+    with WOSmockserver(records=records // queries, latency=latency) as server:
+        start = time.perf_counter()
+        loop = asyncio.new_event_loop()
+        try:
+            retrieved = loop.run_until_complete(aretrieve(server, queries, workers))
+        finally:
+            loop.close()
+        elapsed = time.perf_counter() - start
+        results["agetall_queries{}_requests".format(queries)] = (sum(server.requests.values()) / elapsed,
+                                                                  "requests/sec", True)
+        results["agetall_queries{}_records".format(queries)] = (retrieved / elapsed, "records/sec", True)
+
+
+def bench_parsing(results, records):
+    with WOSmockserver(records=records) as server:
+        server.queries[1] = range(records)
+        pages = [CachedResponse(200, {}, server.page(1, x, 100)) for x in range(1, records + 1, 100)]
+    for storage in ("keep", "drop"):
+        wosquery = wrex.WOSquery(None, None, storage=storage)
+        start = time.perf_counter()
+        for x in pages:
+            wosquery.parse_responsedata(x)
+        results["parse_{}".format(storage)] = (records / (time.perf_counter() - start), "records/sec", True)
+    return wosquery
+
+
+def bench_export(results, wosquery):
+    target = io.BytesIO()
+    start = time.perf_counter()
+    wosquery.export_to(target)
+    elapsed = time.perf_counter() - start
+    results["export_records"] = (len(wosquery) / elapsed, "records/sec", True)
+    results["export_bytes"] = (len(target.getvalue()) / 1024 ** 2 / elapsed, "MB/sec", True)
+
+
+def bench_memory(results, records):
+    with WOSmockserver(records=records) as server:
+        for storage in ("keep", "drop"):
+            conn = connect(server)
+            tracemalloc.start()
+            wosquery = wrex.query(conn, "TS=benchmark", storage=storage)
+            wosquery.getall()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            results["peak_memory_{}".format(storage)] = (peak / 1024 ** 2, "MB", False)
+            del wosquery
+            conn.close()
+
+
+def compare(results, baseline, tolerance):
+    """Print the change of every metric against a baseline, returning the names of those which regressed."""
+    regressed = []
+    for name, (value, unit, higher) in results.items():
+        if name not in baseline:
+            continue
+        previous = baseline[name][0]
+        change = (value - previous) / previous if previous else 0.0
+        worse = -change if higher else change
+        flag = ""
+        if worse > tolerance:
+            regressed.append(name)
+            flag = "  REGRESSION"
+        print("{:<30} {:>12.1f} -> {:>12.1f} {:<14} {:>+7.1%}{}".format(name, previous, value, unit, change, flag))
+    return regressed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="End-to-end benchmarks of wrex against a local mock WOS API")
+    parser.add_argument("--records", type=int, default=5000, help="records found by each query")
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds of latency per request")
+    parser.add_argument("--workers", type=int, default=8, help="concurrent requests for the concurrent runs")
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="compare the results with an earlier saved run")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="relative change counted as a regression")
+    args = parser.parse_args(argv)
+
+    # Retrieval progress messages are not part of the results
+    results = dict()
+    stdout, sys.stdout = sys.stdout, io.StringIO()
+    try:
+        bench_retrieval(results, args.records, args.latency, args.workers)
+        wosquery = bench_parsing(results, args.records)
+        bench_export(results, wosquery)
+        bench_memory(results, args.records)
+    finally:
+        sys.stdout = stdout
+
+    print("Mock server: {} records, {:.0f} ms latency".format(args.records, args.latency * 1000))
+    for name, (value, unit, _) in results.items():
+        print("{:<30} {:>12.1f} {}".format(name, value, unit))
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print("\nCompared with {}:".format(args.compare))
+        regressed = compare(results, baseline, args.tolerance)
+        if regressed:
+            print("\n{} metric/s regressed by more than {:.0%}".format(len(regressed), args.tolerance))
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,238 @@
+"""A frozen copy of the original hand-written make_field_dict, kept as the baseline for the field extraction benchmark."""
+
+
+def list_from_WOSlist(raw, key=None):
+    # TODO: Needs a refactor to handle if raw is just a list rather than a dict.
+    if isinstance(raw, list):
+        # This is the expected configuration
+        if key is None:
+            return raw
+        else:
+            return [x[key] for x in raw]
+    elif isinstance(raw, dict):
+        if key is None:
+            return [raw]
+        else:
+            return [raw[key]]
+    else:
+        return [raw]
+
+
+def dict_from_WOSlist(raw, key="type", content="content"):
+    try:
+        return {x[key]: x[content] for x in raw}
+    except TypeError:
+        return {raw[key]: raw[content]}
+
+
+def dict_from_WOSmultilist(raw, key="type", content="content"):
+    finaldict = dict()
+    for x in raw:
+        try:
+            finaldict[x[key]] += "; {}".format(x[content])
+        except KeyError:
+            finaldict[x[key]] = x[content]
+    return finaldict
+
+
+def legacy_make_field_dict(rawdata, printmissing=False):
+    # This multiple try/except segment is long-winded but right now I'm leaving it here for ease of understanding
+    # It could possibly be done with another sub-function
+
+    # TODO: Look at FITTING the data in here to the published model and fix it to be so if needed.
+    #   - Make model validator
+    #   - Make code which fixes non-canonical output to be in model style
+    #   - Parse KNOWN GOOD models to fit appropriately
+    workingdict = dict()
+    missing = set()
+    # Parse simple fields
+    try:
+        workingdict["PT"] = rawdata["static_data"]["summary"]["pub_info"]["pubtype"][0]
+    except KeyError:
+        missing.add("PT")
+
+    try:
+        if rawdata["static_data"]["fullrecord_metadata"]["languages"]["count"] <= 1:
+            workingdict["LA"] = rawdata["static_data"]["fullrecord_metadata"]["languages"]["language"]["content"]
+        else:
+            ladict = dict_from_WOSlist(rawdata["static_data"]["fullrecord_metadata"]["languages"]["language"])
+            workingdict["LA"] = ladict["primary"]
+    except KeyError:
+        missing.add("LA")
+
+    try:
+        workingdict["DT"] = rawdata["static_data"]["summary"]["doctypes"]["doctype"]
+    except KeyError:
+        missing.add("DT")
+
+    try:
+        workingdict["AB"] = rawdata["static_data"]["fullrecord_metadata"]["abstracts"]["abstract"]["abstract_text"]["p"]
+    except KeyError:
+        missing.add("AB")
+
+    try:
+        workingdict["RP"] = rawdata["static_data"]["fullrecord_metadata"]["reprint_addresses"]["address_name"]["address_spec"]["full_address"]
+    except KeyError:
+        missing.add("RP")
+    except TypeError:
+        # Right now if we can't get a single address we ignore it.
+        # In future this dict should be correctly parsed, see WOS:000477903700010
+        missing.add("RP")
+
+    try:
+        workingdict["NR"] = rawdata["static_data"]["fullrecord_metadata"]["refs"]["count"]
+    except KeyError:
+        missing.add("NR")
+
+    try:
+        workingdict["TC"] = rawdata["dynamic_data"]["citation_related"]["tc_list"]["silo_tc"]["local_count"]
+    except KeyError:
+        missing.add("TC")
+
+    try:
+        workingdict["PU"] = rawdata["static_data"]["summary"]["publishers"]["publisher"]["names"]["name"]["full_name"]
+    except KeyError:
+        missing.add("PU")
+
+    try:
+        workingdict["PI"] = rawdata["static_data"]["summary"]["publishers"]["publisher"]["address_spec"]["city"]
+    except KeyError:
+        missing.add("PI")
+
+    try:
+        workingdict["PA"] = rawdata["static_data"]["summary"]["publishers"]["publisher"]["address_spec"]["full_address"]
+    except KeyError:
+        missing.add("PA")
+
+    try:
+        workingdict["PD"] = rawdata["static_data"]["summary"]["pub_info"]["pubmonth"]
+    except KeyError:
+        missing.add("PD")
+
+    try:
+        workingdict["PY"] = rawdata["static_data"]["summary"]["pub_info"]["pubyear"]
+    except KeyError:
+        missing.add("PY")
+
+    try:
+        workingdict["VL"] = rawdata["static_data"]["summary"]["pub_info"]["vol"]
+    except KeyError:
+        missing.add("VL")
+
+    try:
+        workingdict["IS"] = rawdata["static_data"]["summary"]["pub_info"]["issue"]
+    except KeyError:
+        missing.add("IS")
+
+    try:
+        workingdict["PG"] = rawdata["static_data"]["summary"]["pub_info"]["page"]["page_count"]
+    except KeyError:
+        missing.add("PG")
+
+    try:
+        workingdict["GA"] = rawdata["static_data"]["item"]["ids"]["content"]
+    except KeyError:
+        missing.add("GA")
+
+    try:
+        workingdict["UT"] = rawdata["UID"]
+    except KeyError:
+        missing.add("UT")
+
+    # Parse lists from lists of dicts
+    try:
+        workingdict["AU"] = list_from_WOSlist(rawdata["static_data"]["summary"]["names"]["name"], "wos_standard")
+    except KeyError:
+        missing.add("AU")
+
+    try:
+        workingdict["AF"] = list_from_WOSlist(rawdata["static_data"]["summary"]["names"]["name"], "full_name")
+    except KeyError:
+        missing.add("AF")
+    #     workingdict["OI"] = list_from_WOSlist(rawdata["static_data"]["summary"]["names"]["name"], "orcid_id")
+
+    try:
+        workingdict["ID"] = list_from_WOSlist(rawdata["static_data"]["item"]["keywords_plus"]["keyword"])
+    except KeyError:
+        missing.add("ID")
+    #     workingdict["C1"] = list_from_WOSlist(rawdata["static_data"]["summary"]["names"]["name"])
+
+    # Parse dicts from lists of dicts
+    titlesdict = dict_from_WOSlist(rawdata["static_data"]["summary"]["titles"]["title"])
+
+    try:
+        workingdict["TI"] = titlesdict["item"]
+    except KeyError:
+        missing.add("TI")
+
+    try:
+        workingdict["SO"] = titlesdict["source"]
+    except KeyError:
+        missing.add("SO")
+
+    try:
+        workingdict["J9"] = titlesdict["abbrev_29"]
+    except KeyError:
+        missing.add("J9")
+
+    try:
+        workingdict["JI"] = titlesdict["abbrev_iso"]
+    except KeyError:
+        missing.add("JI")
+
+    identdict = {}
+    try:
+        identdict = dict_from_WOSlist(rawdata["dynamic_data"]["cluster_related"]["identifiers"]["identifier"],
+                                      content="value")
+    except (TypeError, KeyError):
+        missing.update(["AR", "DI", "PM", "SN", "EI"])
+
+    if identdict:
+        try:
+            workingdict["AR"] = identdict["art_no"]
+        except KeyError:
+            missing.add("AR")
+
+        try:
+            workingdict["DI"] = identdict["doi"]
+        except KeyError:
+            missing.add("DI")
+
+        try:
+            workingdict["PM"] = identdict["pmid"]
+        except KeyError:
+            missing.add("PM")
+
+        try:
+            workingdict["SN"] = identdict["issn"]
+        except KeyError:
+            missing.add("SN")
+
+        try:
+            workingdict["EI"] = identdict["eissn"]
+        except KeyError:
+            missing.add("EI")
+    categorydict = {}
+    try:
+        categorydict = dict_from_WOSmultilist(
+            rawdata["static_data"]["fullrecord_metadata"]["category_info"]["subjects"]["subject"],
+            key="ascatype")
+    except (TypeError, KeyError):
+        missing.update(["WC", "SC"])
+
+    try:
+        workingdict["WC"] = categorydict["traditional"]
+    except KeyError:
+        missing.add("WC")
+
+    try:
+        workingdict["SC"] = categorydict["extended"]
+    except KeyError:
+        missing.add("SC")
+
+    # End Record
+    workingdict["ER"] = ""
+
+    if missing and printmissing:
+        print("Missing fields: {}\n".format(missing))
+    return workingdict
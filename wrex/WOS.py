@@ -1,16 +1,41 @@
 import requests
-import json
-import copy
+import requests.adapters
+import asyncio
+import concurrent.futures
+import gzip
+import io
+import os
 from . import exceptions
-from .const import __version__, query_repeat_timeout
+from .scheduler import WOSscheduler
+from .fields import make_field_dict, list_from_WOSlist, dict_from_WOSlist, dict_from_WOSmultilist
+from .compact import WOSrecordstore, intern_fields, deep_sizeof
+from .checkpoint import WOScheckpoint, parse_timestamp
+from .decode import decode_response, decode_page, error_message, response_records
+from .index import WOSindex
+from .parallel import WOSparser
+from .const import __version__, query_repeat_timeout, stale_age, max_query_length, max_retrievable_records, \
+    first_publication_year
+from .metrics import WOSmetrics
+from .network import build_network
 import datetime
+import time
 
 
 class WOSconnection:
     """
     The WOSconnection class provides an easy way to define, store, and retrieve the parameters required for WOS access.
+
+    Each connection owns a pooled, keep-alive HTTP session which is reused for every request made through it (and through
+    any copies of it made by WOSquery objects), so that paging through a query does not pay for a new TCP+TLS handshake
+    on every page. Requests are paced and retried by a WOSscheduler, which is likewise shared between copies so that all
+    queries using the same key draw from the same rate limit. Every request is reported to the WOSmetrics of the
+    connection, whose hooks and counters show where the time of a retrieval goes.
     """
-    def __init__(self, key, apiurl="https://wos-api.clarivate.com/api/wos", parameters=None):
+    # Whether get() is a coroutine, which only the async entry points can await (see WOSaioconnection)
+    asynchronous = False
+
+    def __init__(self, key, apiurl="https://wos-api.clarivate.com/api/wos", parameters=None, poolsize=10,
+                 keepalive=True, timeout=60, headers=None, session=None, scheduler=None, cache=None, metrics=None):
         """Initialise a WOSconnection instance
 
         Parameters
@@ -19,7 +44,24 @@ class WOSconnection:
             The personal API key provided by Clarivate
         apiurl: str
             The url of the WOS API (default https://wos-api.clarivate.com/api/wos)
-        parameters
+        parameters: dict
+            The default query parameters sent with every request (default databaseId=WOS, count=100, firstRecord=1)
+        poolsize: int
+            The maximum number of pooled connections kept open to the API (default 10)
+        keepalive: bool
+            Whether to keep connections open between requests (default True)
+        timeout: float or tuple
+            Timeout in seconds passed to every request, or a (connect, read) tuple (default 60)
+        headers: dict
+            Extra headers sent with every request
+        session: requests.Session
+            An existing session to share, rather than creating a new pool
+        scheduler: WOSscheduler
+            The scheduler which rate limits and retries requests (default WOSscheduler() at 5 requests per second)
+        cache: WOScache
+            An on-disk response cache consulted before any request is sent (default None, no caching)
+        metrics: WOSmetrics
+            The metrics which every request is reported to (default a new WOSmetrics)
         """
         self.apiurl = apiurl
         self.key = key
@@ -31,6 +73,91 @@ class WOSconnection:
                 "count": 100,
                 "firstRecord": 1
             }
+        self.poolsize = poolsize
+        self.keepalive = keepalive
+        self.timeout = timeout
+        self.headers = dict(headers) if headers else dict()
+        if session is None:
+            session = self.make_session()
+        self.session = session
+        if scheduler is None:
+            scheduler = WOSscheduler()
+        self.scheduler = scheduler
+        self.cache = cache
+        self.metrics = metrics if metrics is not None else WOSmetrics()
+
+    def make_session(self):
+        """Create a pooled requests session using the pool size, keep-alive and header settings of this connection."""
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=self.poolsize, pool_maxsize=self.poolsize)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers.update(self.headers)
+        if not self.keepalive:
+            session.headers["Connection"] = "close"
+        return session
+
+    def copy(self):
+        """Return a copy of this connection with its own parameters which shares the same session pool."""
+        return WOSconnection(self.key, self.apiurl, dict(self.parameters), poolsize=self.poolsize,
+                             keepalive=self.keepalive, timeout=self.timeout, headers=self.headers, session=self.session,
+                             scheduler=self.scheduler, cache=self.cache, metrics=self.metrics)
+
+    def setkey(self, key):
+        """Set the API key used for all further requests through this connection."""
+        self.key = key
+
+    def get(self, url, params):
+        """Perform a rate limited GET request against the API using the pooled session of this connection.
+
+        Throttled (429) and failing (500) requests are retried by the scheduler with jittered backoff. If the connection
+        has a cache, fresh cached responses are returned without touching the network.
+        """
+        started = time.perf_counter()
+        if self.cache is not None:
+            cached = self.cache.get(url, params)
+            if cached is not None:
+                self.report(url, cached, started, 0.0, [cached.status_code], fromcache=True)
+                return cached
+        statuses = []
+        latency = [0.0]
+
+        def send():
+            # Time and record every attempt, including those which the scheduler retries
+            attempt = time.perf_counter()
+            try:
+                response = self.session.get(url, headers={"X-ApiKey": self.key}, params=params, timeout=self.timeout)
+            except OSError:
+                statuses.append(None)
+                raise
+            finally:
+                latency[0] = time.perf_counter() - attempt
+            statuses.append(response.status_code)
+            return response
+
+        response = self.scheduler.request(send)
+        self.report(url, response, started, latency[0], statuses)
+        if self.cache is not None:
+            self.cache.put(url, params, response)
+        return response
+
+    def report(self, url, response, started, latency, statuses, fromcache=False):
+        self.metrics.emit({
+            "event": "request",
+            "url": url,
+            "status": response.status_code,
+            "latency": latency,
+            "elapsed": time.perf_counter() - started,
+            "bytes": len(response.content),
+            "retries": len(statuses) - 1,
+            "statuses": statuses,
+            "fromcache": fromcache,
+            "quota": dict(self.scheduler.quota),
+        })
+
+    def close(self):
+        """Close all pooled connections held by the session of this connection."""
+        self.session.close()
 
     def __repr__(self):
         return 'wrex.{0}(key="{2}", apiurl="{1}", defaults={3})'.format(self.__class__.__name__, self.apiurl, self.key,
@@ -42,7 +169,7 @@ class WOSconnection:
 
 
 class WOSquery:
-    def __init__(self, response, connection, querystr="", count=100):
+    def __init__(self, response, connection, querystr="", count=100, firstrecord=1, lazy=False, storage="keep"):
         self.querystr = querystr
         self.queryid = -1
         self.found = 0
@@ -53,10 +180,27 @@ class WOSquery:
         self.connection = None
         self.repack_connection(connection)
 
+        self.count = count
+        # Whether papers defer extracting their fields until they are first accessed
+        self.lazy = lazy
+        # How papers keep their raw records ("keep", "drop" or "columnar", see WOSpaper.compact())
+        self.storage = storage
+        self.store = WOSrecordstore() if storage == "columnar" else None
+        # Whether repeated field values of new papers are interned
+        self.intern = storage != "keep"
+        # Number of records received for each page, keyed by the firstRecord offset of that page
+        self.pages = dict()
         self.data = {}
-        self.parse_responsedata(response, firstrun=True)
+        # Inverted indexes over the papers, built by the first filter() or facet() and kept up to date from then on
+        self.index = None
+        # Records beyond this offset cannot be paged through a single query ID
+        self.maxrecords = max_retrievable_records
+        # The (first, last) publication years this query was restricted to by plan_partitions(), if any
+        self.partition = None
+        # A query created without a response (e.g. when loading a snapshot) starts out empty, with no pages retrieved
+        if response is not None:
+            self.pages[firstrecord] = len(self.parse_responsedata(response, firstrun=True, firstrecord=firstrecord))
 
-        self.count = count
         self.complete = False
         self.check_complete()
 
@@ -73,62 +217,645 @@ class WOSquery:
     def __len__(self):
         return len(self.data)
 
+    def __iter__(self):
+        return iter(self.data.values())
+
     def __getitem__(self, position):
-        # TODO: This is a horribly hacky way to do this, we should instead implement __iter__ and __next__
+        # Positional access still has to walk the dict, iterate over the query instead where possible
         return self.data[list(self.data.keys())[position]]
 
     def repack_connection(self, conn):
-        self.connection = WOSconnection(conn.key, conn.apiurl, conn.parameters)
+        # Freeze the parameters at query time, but keep using the session pool of the original connection
+        self.connection = conn.copy() if conn is not None else None
+        # Count the requests and pages of this query separately, while still reporting them to the original connection
+        self.metrics = WOSmetrics(parent=conn.metrics if conn is not None else None)
+        if self.connection is not None:
+            self.connection.metrics = self.metrics
+
+    def parse_responsedata(self, response, firstrun=False, fielddicts=None, firstrecord=None, encoded=None):
+        """Parse a raw API response into WOSpaper objects and add them to the query.
+
+        With storage "drop" or "columnar", large pages are decoded one record at a time (see
+        wrex.decode.decode_page()) and each paper is compacted as soon as it is built, so the decoded tree of a whole
+        page is never held alongside its papers. If the fields of the records have already been extracted (by a
+        WOSparser), `fielddicts` holds them in record order, and with "columnar" storage `encoded` can hold the raw
+        records already encoded for the record store.
 
-    def parse_responsedata(self, response, firstrun=False):
-        parsed = json.loads(response.text)
+        A "page" event with the parse time and the number of new papers is reported to the metrics of the query.
+
+        Returns the list of papers contained in the response.
+        """
+        started = time.perf_counter()
+        before = len(self.data)
+        if fielddicts is not None and encoded is not None and not firstrun:
+            # The page was decoded on a worker, which also encoded the raw records for the record store
+            queryresult, records = {}, [None] * len(fielddicts)
+            indices = [self.store.append_encoded(x) for x in encoded]
+        elif fielddicts is not None and self.storage == "drop" and not firstrun:
+            # The raw records would only be dropped again, so there is no need to decode them
+            queryresult, records = {}, [None] * len(fielddicts)
+        else:
+            # Decoding one record at a time is slower, and saves nothing if the raw records are kept anyway
+            incremental = None if self.storage != "keep" else False
+            queryresult, records = decode_page(response, firstrun, incremental)
 
         if firstrun:
-            self.queryid = int(parsed["QueryResult"]["QueryID"])
-            self.found = int(parsed["QueryResult"]["RecordsFound"])
-            self.searched = int(parsed["QueryResult"]["RecordsSearched"])
-            self.data.update({x["UID"]: WOSpaper(x) for x in parsed["Data"]["Records"]["records"]["REC"]})
+            self.queryid = int(queryresult["QueryID"])
+            self.found = int(queryresult["RecordsFound"])
+            self.searched = int(queryresult["RecordsSearched"])
+        if fielddicts is None:
+            built = (WOSpaper(x, lazy=self.lazy) for x in records)
+        elif encoded is not None and not firstrun:
+            built = (WOSpaper(None, fielddict=x, store=self.store, index=y) for x, y in zip(fielddicts, indices))
         else:
-            self.data.update({x["UID"]: WOSpaper(x) for x in parsed["Records"]["records"]["REC"]})
+            built = (WOSpaper(x, fielddict=y) for x, y in zip(records, fielddicts))
+        papers = []
+        for x in built:
+            papers.append(x)
+            if self.storage != "keep" or self.intern:
+                x.compact(self.storage, self.store, self.intern)
+        self.add_papers(papers, compacted=True)
+        self.metrics.emit({
+            "event": "page",
+            "queryid": self.queryid,
+            "firstrecord": firstrecord,
+            "records": len(papers),
+            "added": len(self.data) - before,
+            "parsetime": time.perf_counter() - started,
+        })
+        return papers
+
+    def add_papers(self, papers, compacted=False):
+        """Add a list of WOSpaper objects to the query, replacing any existing papers with the same UID.
+
+        Papers are compacted to the storage mode of the query unless `compacted` says this has already been done.
+        """
+        if not compacted and (self.storage != "keep" or self.intern):
+            for x in papers:
+                x.compact(self.storage, self.store, self.intern)
+        self.data.update({x.uid: x for x in papers})
+        if self.index is not None:
+            for x in papers:
+                self.index.add(x)
+
+    def build_index(self):
+        """(Re)build the inverted indexes over the papers of the query, extracting the fields of any lazy papers."""
+        self.index = WOSindex()
+        for x in self.data.values():
+            self.index.add(x)
+        return self.index
+
+    def filter(self, **criteria):
+        """Return the papers matching every criterion, using the inverted indexes of the query.
+
+        Criteria are given as facet=value, with the facets author (AU), keyword (ID), category (WC), area (SC),
+        year (PY), publication (SO) and doi (DI). A value can also be a list or tuple of values to match any of, and a
+        year a range object, e.g. `filter(author="KNUTH, DE", year=range(1970, 1980))`.
+
+        Returns
+        -------
+        list
+            The matching WOSpaper objects, ordered by UID
+        """
+        if self.index is None:
+            self.build_index()
+        return [self.data[x] for x in sorted(self.index.match(**criteria))]
+
+    def facet(self, name, top=None, **criteria):
+        """Count the papers per value of a facet (see filter()), most frequent first.
+
+        If any criteria are given, only the papers matching them are counted, e.g. `facet("category", year=2020)`.
+        Returns a list of (value, count) tuples, cut to the `top` most frequent values if given.
+        """
+        if self.index is None:
+            self.build_index()
+        uids = self.index.match(**criteria) if criteria else None
+        return self.index.facet(name, uids, top)
+
+    def network(self, facet="author", **kwargs):
+        """Return the co-occurrence network of a facet of the papers, e.g. co-authorship for "author".
 
-    def getall(self, showprogress=False):
-        # Check whether complete first, just in case
+        The inverted indexes of the query are used if they have been built. See wrex.network.build_network() for the
+        other parameters (mincount, minweight, top, normalise, fractional).
+        """
+        return build_network(self, facet, **kwargs)
+
+    def merge(self, other):
+        """Add the papers of another WOSquery to this one, deduplicating by UID.
+
+        A merged query no longer corresponds to a single query on the server, so it is marked as complete with `found`
+        set to the number of papers it holds.
+        """
+        self.add_papers(list(other.data.values()))
+        self.queryid = -1
+        self.found = len(self.data)
+        self.pages = {x: min(self.count, self.found - x + 1) for x in self.page_offsets()}
+        self.check_complete()
+        return self
+
+    def memory_usage(self):
+        """Return the approximate number of bytes used by the papers (and record store) of this query."""
+        return deep_sizeof([self.data, self.store])
+
+    def compact(self, rawdata="drop", intern=True):
+        """Shrink the papers already in this query and keep any papers added later equally compact.
+
+        The memory used per record before and after compacting is printed, and returned as a tuple of bytes.
+
+        Parameters
+        ----------
+        rawdata: str
+            "keep" the raw records, "drop" them once their fields have been extracted, or move them into a "columnar"
+            WOSrecordstore shared by the whole query
+        intern: bool
+            Intern the values of fields which repeat between papers
+        """
+        before = self.memory_usage() / max(len(self.data), 1)
+        if rawdata == "columnar" and self.store is None:
+            self.store = WOSrecordstore()
+        for x in self.data.values():
+            x.compact(rawdata, self.store, intern)
+        self.storage = rawdata
+        self.intern = intern
+        after = self.memory_usage() / max(len(self.data), 1)
+        print("Memory per record: {:.0f} bytes before, {:.0f} bytes after".format(before, after))
+        return before, after
+
+    def page_offsets(self):
+        """Return the firstRecord offset of every page needed to retrieve all found records (up to `maxrecords`)."""
+        return list(range(1, min(self.found, self.maxrecords) + 1, self.count))
+
+    def missing_pages(self):
+        """Return the firstRecord offsets of all pages which have not yet been fully retrieved."""
+        missing = []
+        for offset in self.page_offsets():
+            expected = min(self.count, self.found - offset + 1)
+            if self.pages.get(offset, 0) < expected:
+                missing.append(offset)
+        return missing
+
+    def fetch_page(self, firstrecord):
+        """Request a single page of the query from the API, returning the raw response."""
+        return query_byid(self.connection, self.queryid, count=self.count, firstRecord=firstrecord, returnraw=True)
+
+    def receive_page(self, firstrecord, response, showprogress=False, writer=None, checkpoint=None, fielddicts=None,
+                     encoded=None):
+        """Parse a page retrieved with fetch_page() and record how many of its records arrived.
+
+        If a WOSexportwriter is given, the papers of the page are written out to it straight away. If a WOScheckpoint is
+        given, the response is appended to it once it has been parsed. `fielddicts` (and `encoded`) are the fields (and
+        encoded raw records) of the records of the page if they have already been extracted (see parse_responsedata()).
+        """
+        papers = self.parse_responsedata(response, fielddicts=fielddicts, firstrecord=firstrecord, encoded=encoded)
+        self.pages[firstrecord] = len(papers)
+        if writer is not None:
+            writer.writemany(papers)
+        if checkpoint is not None:
+            checkpoint.write_page(self.queryid, firstrecord, response)
         self.check_complete()
-        self.check_stale()
-        # TODO: If stale, redo query and THEN run rest of getall
-        repeats = 0
-        threshold = query_repeat_timeout
-        previous_len = len(self.data)
-        while not self.complete:
-            tempresponse = query_byid(self.connection, self.queryid, firstRecord=len(self.data) + 1, returnraw=True)
-            self.parse_responsedata(tempresponse)
+        if showprogress:
+            print("Retrieved records: {}/{}".format(len(self.data), self.found))
+            print(response.headers)
+
+    def getall(self, showprogress=False, workers=1, writer=None, checkpoint=None, parser=None):
+        """Retrieve all pages of the query which have not been retrieved yet.
+
+        Every page offset is known from the first response, so with `workers` > 1 the missing pages are requested
+        concurrently and merged into self.data in whatever order they arrive. Pages which come back short are retried
+        until a full pass over the missing pages makes no progress `query_repeat_timeout` times in a row.
+
+        Stale queries, and queries whose ID has expired on the server part way through, are re-issued before carrying on
+        from the pages already retrieved.
+
+        Parameters
+        ----------
+        showprogress: bool
+            Print the number of retrieved records and the response headers after each page.
+        workers: int
+            Number of pages to request concurrently (default 1, i.e. one page after another).
+        writer: WOSexportwriter
+            If given, the papers already held and then each page of papers are exported to this writer as soon as they
+            have been retrieved, each paper exactly once.
+        checkpoint: str or WOScheckpoint
+            If given, progress is recorded in this checkpoint file as each page arrives. If the file already exists the
+            papers and pages recorded in it are restored first, so an interrupted getall() resumes where it stopped.
+        parser: int or WOSparser
+            If given, the fields of each page are extracted on the worker processes of this WOSparser (or of a new one
+            with this many processes) while further pages are being requested. It is not used with "keep" storage,
+            which has the main process decode every page anyway.
+        """
+        owned = checkpoint is not None and not isinstance(checkpoint, WOScheckpoint)
+        if owned:
+            checkpoint = WOScheckpoint(checkpoint)
+        parser = page_parser(parser, self.storage)
+        ownedparser = parser is not None and not isinstance(parser, WOSparser)
+        if ownedparser:
+            parser = WOSparser(parser)
+        try:
+            if self.found > self.maxrecords:
+                if self.querystr and self.partition is None:
+                    if checkpoint is not None:
+                        raise exceptions.WOSError("Query found {} records, more than the {} which can be retrieved "
+                                                  "through one query ID, so it has to be retrieved in partitions, "
+                                                  "which cannot be checkpointed".format(self.found, self.maxrecords))
+                    print("Query found {} records, more than the {} which can be retrieved through one query ID. "
+                          "Retrieving it in partitions".format(self.found, self.maxrecords))
+                    self.getall_partitioned(showprogress, workers, writer=writer, parser=parser)
+                    return
+                print("Query found {} records, only the first {} of them can be retrieved".format(self.found,
+                                                                                                  self.maxrecords))
+
+            if checkpoint is not None:
+                self.start_checkpoint(checkpoint)
+            if writer is not None:
+                # The papers already held (e.g. the first page) are written before any new page arrives
+                writer.writemany(self.data.values())
+
+            # Check whether complete first, just in case
             self.check_complete()
-            if showprogress:
-                print("Retrieved records: {}/{}".format(len(self.data), self.found))
-                print(tempresponse.headers)
-            # Timeout after threshold
-            if len(self.data) == previous_len:
-                repeats += 1
-                if repeats >= threshold:
-                    missing = self.found - len(self.data)
-                    print("Could not retrieve {}/{} entries. Trying one last time".format(missing, self.found))
-                    tempresponse = query_byid(self.connection, self.queryid, count=missing, firstRecord=len(self.data) + 1,
+            if not self.complete and self.check_stale(returnstatus=True) and self.querystr:
+                self.reissue(checkpoint)
+
+            repeats = 0
+            reissued = False
+            threshold = query_repeat_timeout
+            missing = self.missing_pages()
+            while missing:
+                try:
+                    if parser is not None:
+                        self.receive_parsed(missing, parser, workers, showprogress, writer, checkpoint)
+                    elif workers > 1:
+                        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+                            futures = {executor.submit(self.fetch_page, x): x for x in missing}
+                            for future in concurrent.futures.as_completed(futures):
+                                self.receive_page(futures[future], future.result(), showprogress, writer, checkpoint)
+                    else:
+                        for offset in missing:
+                            self.receive_page(offset, self.fetch_page(offset), showprogress, writer, checkpoint)
+                except (exceptions.WOSError400, exceptions.WOSError404):
+                    # The query ID has most likely expired, so re-issue the query once and carry on with the new ID
+                    if reissued or not self.querystr:
+                        raise
+                    print("Query ID {} was rejected, re-issuing the query".format(self.queryid))
+                    self.reissue(checkpoint)
+                    reissued = True
+                    missing = self.missing_pages()
+                    continue
+
+                previous_missing = missing
+                missing = self.missing_pages()
+                # Timeout after threshold passes without a single page being completed
+                if len(missing) == len(previous_missing):
+                    repeats += 1
+                    if repeats >= threshold:
+                        print("Could not retrieve {}/{} entries across {} page/s. Exiting after {} tries".format(
+                            self.found - len(self.data), self.found, len(missing), threshold))
+                        break
+                else:
+                    repeats = 0
+        finally:
+            if owned:
+                checkpoint.close()
+            if ownedparser:
+                parser.close()
+
+    async def afetch_page(self, firstrecord):
+        """Async counterpart of fetch_page(), for queries made through a WOSaioconnection."""
+        return firstrecord, await aquery_byid(self.connection, self.queryid, count=self.count, firstRecord=firstrecord,
                                               returnraw=True)
-                    self.parse_responsedata(tempresponse)
-                    print("Could not retrieve {}/{} entries. Exiting after {} tries".format(missing, self.found, threshold))
-                    break
-            else:
-                repeats = 0
-            previous_len = len(self.data)
+
+    async def agetall(self, showprogress=False, writer=None, checkpoint=None):
+        """Async counterpart of getall(), for queries made through a WOSaioconnection (e.g. by wrex.aquery()).
+
+        Every missing page is requested at once, leaving the concurrency limit and rate limit of the connection to pace
+        them, and pages are parsed on the event loop as they arrive. Short pages, stale queries and expired query IDs
+        are handled as by getall(), and a query which finds more than `maxrecords` records is retrieved in partitions
+        (see agetall_partitioned()). Extracting fields on a WOSparser is not supported here.
+
+        Parameters
+        ----------
+        showprogress: bool
+            Print the number of retrieved records and the response headers after each page.
+        writer: WOSexportwriter
+            If given, the papers already held and then each page of papers are exported to this writer as soon as they
+            have been retrieved, each paper exactly once.
+        checkpoint: str or WOScheckpoint
+            If given, progress is recorded in (and restored from) this checkpoint file, as by getall().
+        """
+        if self.found > self.maxrecords:
+            if self.querystr and self.partition is None:
+                if checkpoint is not None:
+                    raise exceptions.WOSError("Query found {} records, more than the {} which can be retrieved through "
+                                              "one query ID, so it has to be retrieved in partitions, which cannot be "
+                                              "checkpointed".format(self.found, self.maxrecords))
+                print("Query found {} records, more than the {} which can be retrieved through one query ID. "
+                      "Retrieving it in partitions".format(self.found, self.maxrecords))
+                await self.agetall_partitioned(showprogress, writer=writer)
+                return
+            print("Query found {} records, only the first {} of them can be retrieved".format(self.found,
+                                                                                              self.maxrecords))
+        owned = checkpoint is not None and not isinstance(checkpoint, WOScheckpoint)
+        if owned:
+            checkpoint = WOScheckpoint(checkpoint)
+        try:
+            if checkpoint is not None:
+                self.start_checkpoint(checkpoint)
+            if writer is not None:
+                writer.writemany(self.data.values())
+
+            self.check_complete()
+            if not self.complete and self.check_stale(returnstatus=True) and self.querystr:
+                await self.areissue(checkpoint)
+
+            repeats = 0
+            reissued = False
+            threshold = query_repeat_timeout
+            missing = self.missing_pages()
+            while missing:
+                try:
+                    await self.areceive_pages(missing, showprogress, writer, checkpoint)
+                except (exceptions.WOSError400, exceptions.WOSError404):
+                    if reissued or not self.querystr:
+                        raise
+                    print("Query ID {} was rejected, re-issuing the query".format(self.queryid))
+                    await self.areissue(checkpoint)
+                    reissued = True
+                    missing = self.missing_pages()
+                    continue
+
+                previous_missing = missing
+                missing = self.missing_pages()
+                if len(missing) == len(previous_missing):
+                    repeats += 1
+                    if repeats >= threshold:
+                        print("Could not retrieve {}/{} entries across {} page/s. Exiting after {} tries".format(
+                            self.found - len(self.data), self.found, len(missing), threshold))
+                        break
+                else:
+                    repeats = 0
+        finally:
+            if owned:
+                checkpoint.close()
+
+    async def areceive_pages(self, missing, showprogress=False, writer=None, checkpoint=None):
+        """Request all of the missing pages at once and receive each as soon as it arrives."""
+        tasks = [asyncio.ensure_future(self.afetch_page(x)) for x in missing]
+        try:
+            for future in asyncio.as_completed(tasks):
+                offset, response = await future
+                self.receive_page(offset, response, showprogress, writer, checkpoint)
+        finally:
+            # Do not leave the rest of the pages running (or their errors unretrieved) after a failure
+            for x in tasks:
+                x.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def agetall_partitioned(self, showprogress=False, maxrecords=None, years=None, writer=None):
+        """Async counterpart of getall_partitioned(), for queries made through a WOSaioconnection.
+
+        The partitions are planned with aplan_partitions() and retrieved at once, sharing the concurrency limit of the
+        connection, or one after another with a WOSexportwriter.
+        """
+        found = self.found
+        maxrecords = self.maxrecords if maxrecords is None else maxrecords
+        partitions = await aplan_partitions(self.connection, self.querystr, maxrecords, years, self.lazy, self.storage)
+        if writer is not None:
+            for x in partitions:
+                await x.agetall(showprogress, writer=writer)
+        else:
+            await asyncio.gather(*(x.agetall(showprogress) for x in partitions if not x.complete))
+        for x in partitions:
+            self.merge(x)
+        if len(self.data) < found:
+            print("Could not retrieve {}/{} entries across {} partition/s".format(found - len(self.data), found,
+                                                                                len(partitions)))
+
+    def getall_partitioned(self, showprogress=False, workers=1, maxrecords=None, years=None, writer=None, parser=None):
+        """Retrieve every record of a query which finds more than can be paged through one query ID.
+
+        The query string is split into disjoint publication year ranges (see plan_partitions()), each partition is
+        retrieved in full (or up to `maxrecords`, default self.maxrecords, for a single year which finds more), and
+        their papers are merged into this query. Records without a publication year inside `years` are not found by any
+        partition, so the number which could not be retrieved is reported.
+        """
+        found = self.found
+        maxrecords = self.maxrecords if maxrecords is None else maxrecords
+        partitions = plan_partitions(self.connection, self.querystr, maxrecords, years, workers, self.lazy, self.storage)
+        fetch_partitions(partitions, workers, showprogress, writer, parser)
+        for x in partitions:
+            self.merge(x)
+        if len(self.data) < found:
+            print("Could not retrieve {}/{} entries across {} partition/s".format(found - len(self.data), found,
+                                                                                len(partitions)))
+
+    def receive_parsed(self, missing, parser, workers=1, showprogress=False, writer=None, checkpoint=None):
+        """Request pages on `workers` threads and extract their fields on the worker processes of a WOSparser.
+
+        With "columnar" storage the workers also encode the raw records for the record store, so that no page is
+        decoded in the main process unless the storage is "keep".
+        """
+        encode = self.storage == "columnar"
+        parsing = dict()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+            fetches = {executor.submit(self.fetch_page, x): x for x in missing}
+            for future in concurrent.futures.as_completed(fetches):
+                response = future.result()
+                parsing[parser.submit_page(response, encode=encode)] = (fetches[future], response)
+                # Take in the pages which have finished parsing while the rest are still being requested
+                for x in [y for y in parsing if y.done()]:
+                    offset, response = parsing.pop(x)
+                    fielddicts, encoded = x.result() if encode else (x.result(), None)
+                    self.receive_page(offset, response, showprogress, writer, checkpoint, fielddicts, encoded)
+        for x in concurrent.futures.as_completed(parsing):
+            offset, response = parsing[x]
+            fielddicts, encoded = x.result() if encode else (x.result(), None)
+            self.receive_page(offset, response, showprogress, writer, checkpoint, fielddicts, encoded)
+
+    def regenerate(self, parser=None):
+        """Extract the fields of every paper from its raw record again, as fielddict(regenerate=True) does for one paper.
+
+        With a WOSparser the records are spread over its worker processes. Papers whose raw records have been dropped
+        keep their current fields. Returns the number of papers regenerated.
+        """
+        papers = []
+        records = []
+        for x in self.data.values():
+            record = x.rawdata
+            if record is not None:
+                papers.append(x)
+                records.append(record)
+        if parser is None:
+            fielddicts = [make_field_dict(x) for x in records]
+        else:
+            fielddicts = parser.extract(records)
+        for paper, fields in zip(papers, fielddicts):
+            if self.intern:
+                intern_fields(fields)
+            paper.set_fields(fields)
+            if self.index is not None:
+                self.index.add(paper)
+        return len(papers)
+
+    def start_checkpoint(self, checkpoint):
+        """Restore the progress recorded in a checkpoint if it exists, otherwise record the query so far in it."""
+        if checkpoint.exists():
+            restored = self.load_checkpoint(checkpoint)
+            print("Restored {} records from checkpoint".format(restored))
+        else:
+            records = [x.rawdata for x in self.data.values()]
+            if any(x is None for x in records):
+                # Papers stored without their raw records (storage="drop") cannot be checkpointed, so the pages they came
+                # from are retrieved again and checkpointed as they arrive
+                self.pages = dict()
+                records = [x for x in records if x is not None]
+            checkpoint.write_query(self)
+            checkpoint.write_records(records)
+
+    def load_checkpoint(self, checkpoint):
+        """Restore the papers and retrieved pages recorded in a checkpoint (see WOScheckpoint) into this query.
+
+        The query ID, number of records found and timestamp are taken from the latest query entry of the checkpoint,
+        so that getall() only requests the pages which are still missing. Returns the number of papers added.
+        """
+        if not isinstance(checkpoint, WOScheckpoint):
+            checkpoint = WOScheckpoint(checkpoint)
+        before = len(self.data)
+        for entry in checkpoint.entries():
+            if entry["type"] == "query":
+                if entry["querystr"] != self.querystr:
+                    raise exceptions.WOSError('Checkpoint {} belongs to the query "{}", not "{}"'.format(
+                        checkpoint.path, entry["querystr"], self.querystr))
+                self.queryid = entry["queryid"]
+                self.found = entry["found"]
+                self.count = entry["count"]
+                self.timestamp = parse_timestamp(entry["timestamp"])
+                # JSON object keys are always strings
+                self.pages = {int(x): y for x, y in entry["pages"].items()}
+            elif entry["type"] == "records":
+                self.add_papers([WOSpaper(x, lazy=self.lazy) for x in entry["records"]])
+            elif entry["type"] == "page" and entry["queryid"] == self.queryid:
+                papers = [WOSpaper(x, lazy=self.lazy) for x in response_records(entry["response"])]
+                self.add_papers(papers)
+                self.pages[entry["firstRecord"]] = len(papers)
+        self.check_complete()
+        return len(self.data) - before
+
+    def reissue(self, checkpoint=None):
+        """Re-issue the query for a fresh query ID, keeping the pages already retrieved where they are still valid."""
+        found = self.found
+        self.requery()
+        self.reissued(found, checkpoint)
+
+    async def areissue(self, checkpoint=None):
+        """Async counterpart of reissue()."""
+        found = self.found
+        await self.arequery()
+        self.reissued(found, checkpoint)
+
+    def reissued(self, found, checkpoint=None):
+        """Bring the retrieved pages up to date with a fresh query ID, given the number of records found before."""
+        if self.found != found:
+            self.reset_pages()
+        self.timestamp = datetime.datetime.now()
+        self.stale = False
+        if checkpoint is not None:
+            checkpoint.write_query(self)
+
+    def reset_pages(self):
+        """Mark every page of a fresh query ID as retrieved if the papers held cover every record found, and none of
+        them otherwise.
+
+        Records shift between pages when the number found changes, so it cannot be told which pages the papers already
+        held belong to. Any records still missing are then found by retrieving every page again, with the papers which
+        are already held simply being replaced.
+        """
+        if len(self.data) >= self.found:
+            self.pages = {x: min(self.count, self.found - x + 1) for x in self.page_offsets()}
+        else:
+            self.pages = dict()
 
     def check_complete(self, returnstatus=False):
         self.complete = len(self.data) >= self.found
         if returnstatus:
             return self.complete
 
+    def requery(self):
+        """Re-issue the original query to get a fresh query ID and number of records found, without any records."""
+        self.read_queryresult(query(self.requery_connection(), self.querystr, returnraw=True))
+
+    async def arequery(self):
+        """Async counterpart of requery()."""
+        self.read_queryresult(await aquery(self.requery_connection(), self.querystr, returnraw=True))
+
+    def requery_connection(self):
+        if not self.querystr:
+            raise exceptions.WOSError("Only queries made from a query string can be re-issued")
+        return probe_connection(self.connection)
+
+    def read_queryresult(self, response):
+        parsed = decode_response(response)
+        self.queryid = int(parsed["QueryResult"]["QueryID"])
+        self.found = int(parsed["QueryResult"]["RecordsFound"])
+        self.searched = int(parsed["QueryResult"]["RecordsSearched"])
+
+    def refresh(self, workers=1, showprogress=False):
+        """Bring the query up to date by retrieving only the records loaded or modified since it was last retrieved.
+
+        The original query is re-run twice, restricted with the loadTimeSpan and modifiedTimeSpan parameters to the days
+        since `timestamp`. New records are added to the query, and records which are already present (e.g. because their
+        citation counts changed) are updated in place. The query ID and number of records found are then renewed.
+
+        Parameters
+        ----------
+        workers: int
+            Number of pages to request concurrently for each of the restricted queries
+        showprogress: bool
+            Print the number of new and updated records
+
+        Returns
+        -------
+        tuple
+            The number of records added and the number of records updated
+        """
+        if not self.querystr:
+            raise exceptions.WOSError("Only queries made from a query string can be refreshed")
+        started = datetime.datetime.now()
+        span = "{}+{}".format(self.timestamp.strftime("%Y-%m-%d"), started.strftime("%Y-%m-%d"))
+        added = 0
+        updated = 0
+        for restriction in ("loadTimeSpan", "modifiedTimeSpan"):
+            conn = self.connection.copy()
+            conn.parameters[restriction] = span
+            conn.parameters["firstRecord"] = 1
+            delta = query(conn, self.querystr, lazy=self.lazy)
+            if not delta.complete:
+                delta.getall(workers=workers)
+            newpapers = []
+            for uid, paper in delta.data.items():
+                if uid in self.data:
+                    self.data[uid].update(paper)
+                    if self.storage != "keep" or self.intern:
+                        self.data[uid].compact(self.storage, self.store, self.intern)
+                    if self.index is not None:
+                        self.index.add(self.data[uid])
+                    updated += 1
+                else:
+                    newpapers.append(paper)
+            self.add_papers(newpapers)
+            added += len(newpapers)
+
+        self.requery()
+        self.reset_pages()
+        self.timestamp = started
+        self.stale = False
+        self.check_complete()
+        if showprogress:
+            print("Refreshed query: {} new records, {} updated records".format(added, updated))
+        return added, updated
+
     def check_stale(self, returnstatus=False):
         age = datetime.datetime.now() - self.timestamp
-        if age.days > 0:
+        if age >= stale_age:
             print("Query is stale! Age: {}".format(age))
             self.stale = True
         else:
@@ -148,34 +875,216 @@ class WOSquery:
             print("Data incomplete.\n\nRun WOSquery.getall() to retrieve data.")
 
     def export(self, verbose=False):
-        outstr = "FN Web of Science Recursive EXplorer (wrex)\nVR {}\n".format(__version__)
-        if verbose:
-            exportdata = []
+        """Export the query to the WOS text format, returning it as a string.
+
+        For large queries use export_to(), which writes the export out incrementally instead.
+        """
+        outstr = io.StringIO()
+        self.export_to(outstr, verbose=verbose)
+        return outstr.getvalue()
+
+    def export_to(self, target, compress=False, verbose=False):
+        """Write the query out in the WOS text format to a path or file object, one paper at a time.
+
+        Parameters
+        ----------
+        target: str or file object
+            The path to write to, or an open file object (text or binary)
+        compress: bool
+            Gzip the output
+        verbose: bool
+            Print the UID of each paper as it is written
+        """
+        with WOSexportwriter(target, compress=compress) as writer:
             for y, x in self.data.items():
-                print(y)
-                exportdata.append(x.fielddict())
+                if verbose:
+                    print(y)
+                writer.write(x)
+
+
+class WOSexportwriter:
+    """
+    The WOSexportwriter class writes papers out in the WOS text format as they are given to it.
+
+    Each paper is written field by field through a buffered (and optionally gzipped) stream, so that no export ever has
+    to be held in memory as a single string. The FN/VR header is written on creation and the EF footer on close().
+    Each UID is only written once, so papers can be handed to the writer again (e.g. when a short page is retried)
+    without duplicating their records.
+    """
+    def __init__(self, target, compress=False, buffersize=1024 ** 2):
+        """Initialise a WOSexportwriter instance
+
+        Parameters
+        ----------
+        target: str or file object
+            The path to write to, or an open file object (text or binary). File objects are not closed by close().
+        compress: bool
+            Gzip the output. File objects must then be opened in binary mode.
+        buffersize: int
+            Size in bytes of the write buffer used for paths (default 1 MiB)
+        """
+        self.target = target
+        self.written = 0
+        self.uids = set()
+        self.closed = False
+        self.owned = isinstance(target, (str, os.PathLike))
+        if self.owned:
+            if compress:
+                self.handle = io.TextIOWrapper(io.BufferedWriter(gzip.open(target, "wb"), buffersize), encoding="utf-8")
+            else:
+                self.handle = open(target, "w", encoding="utf-8", buffering=buffersize)
+        elif compress:
+            self.handle = io.TextIOWrapper(gzip.GzipFile(fileobj=target, mode="wb"), encoding="utf-8")
+        elif isinstance(target, io.TextIOBase):
+            self.handle = target
         else:
-            exportdata = [x.fielddict() for _, x in self.data.items()]
-        outstr += "\n".join(exportdata)
-        outstr += "\nEF"
-        return outstr
+            self.handle = io.TextIOWrapper(target, encoding="utf-8")
+        self.handle.write("FN Web of Science Recursive EXplorer (wrex)\nVR {}\n".format(__version__))
+
+    def __repr__(self):
+        return 'wrex.{0}(target={1!r}, written={2})'.format(self.__class__.__name__, self.target, self.written)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write(self, paper):
+        """Write a single WOSpaper out, unless a paper with the same UID has already been written."""
+        if paper.uid in self.uids:
+            return
+        self.uids.add(paper.uid)
+        if self.written:
+            self.handle.write("\n")
+        fields = paper.fielddict(return_dict=True)
+        last = len(fields) - 1
+        for x, field in enumerate(fields):
+            self.handle.write(make_field_str(field, fields[field]))
+            if x < last:
+                self.handle.write("\n")
+        self.written += 1
+
+    def writemany(self, papers):
+        """Write every WOSpaper from an iterable out."""
+        for paper in papers:
+            self.write(paper)
+
+    def close(self):
+        """Write the EF footer, flush the output and close any files opened by the writer."""
+        if self.closed:
+            return
+        self.handle.write("\nEF")
+        self.handle.flush()
+        if self.owned:
+            self.handle.close()
+        elif self.handle is not self.target:
+            # Finish the gzip/text layers wrapped around the caller's file object, but leave it open
+            inner = self.handle.detach()
+            if isinstance(inner, gzip.GzipFile):
+                inner.close()
+        self.closed = True
+
+
+class WOSstream:
+    """
+    The WOSstream class performs a query and yields its papers one at a time as the pages arrive, without keeping them.
+
+    While the papers of one page are being consumed the next page is already being requested in the background, so at
+    most two pages are held in memory at once. The query is only sent when the stream is iterated over, after which
+    `queryid` and `found` are filled in.
+    """
+    def __init__(self, connection, querystr, lazy=False, prefetch=True):
+        self.connection = connection.copy()
+        self.querystr = querystr
+        self.lazy = lazy
+        self.prefetch = prefetch
+        self.queryid = -1
+        self.found = 0
+        self.yielded = 0
+
+    def __repr__(self):
+        return 'wrex.{0}(connection, querystr="{1}")'.format(self.__class__.__name__, self.querystr)
+
+    def __str__(self):
+        return '{0}(querystr="{1}", queryid={2}, found={3}, yielded={4})'.format(self.__class__.__name__,
+                                                                                 self.querystr, self.queryid,
+                                                                                 self.found, self.yielded)
+
+    def fetch_page(self, firstrecord, count):
+        """Request a single page of the query, retrying while it comes back short, and return its raw records."""
+        expected = min(count, self.found - firstrecord + 1)
+        records = []
+        for _ in range(query_repeat_timeout):
+            response = query_byid(self.connection, self.queryid, count=count, firstRecord=firstrecord, returnraw=True)
+            attempt = list(decode_page(response)[1])
+            if len(attempt) > len(records):
+                records = attempt
+            if len(records) >= expected:
+                break
+        return records
+
+    def __iter__(self):
+        response = query(self.connection, self.querystr, returnraw=True)
+        queryresult, records = decode_page(response, firstrun=True)
+        self.queryid = int(queryresult["QueryID"])
+        self.found = int(queryresult["RecordsFound"])
+        del response
+
+        count = self.connection.parameters["count"]
+        firstrecord = self.connection.parameters.get("firstRecord", 1)
+        records = list(records)
+        if len(records) < min(count, self.found - firstrecord + 1):
+            # The first page came back short, so request it again by query ID like every other page
+            records = self.fetch_page(firstrecord, count)
+        offsets = iter(range(firstrecord + count, self.found + 1, count))
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=1) if self.prefetch else None
+        try:
+            while True:
+                offset = next(offsets, None)
+                upcoming = None
+                if offset is not None and executor is not None:
+                    upcoming = executor.submit(self.fetch_page, offset, count)
+                for x in records:
+                    self.yielded += 1
+                    yield WOSpaper(x, lazy=self.lazy)
+                if offset is None:
+                    break
+                records = upcoming.result() if upcoming is not None else self.fetch_page(offset, count)
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=False)
 
 
 class WOSpaper:
-    def __init__(self, rawdata):
-        self.rawdata = rawdata
-        self.uid = ""
-        self.title = ""
-        self.authors = []
-        self.year = 0
-        self.volume = 0
-        self.issue = 0
-        self.identifiers = dict()
-        self.publication = ""
-        self.keywords = []
+    """
+    A single Web of Science record.
+
+    The fields of the record are extracted from `rawdata` with make_field_dict(). If the paper is created with
+    `lazy=True` only the UID is read up front, and the fields are extracted (and kept) the first time any of them is
+    accessed, either through one of the properties below or through fielddict().
+
+    Papers use __slots__ to keep their per-record overhead down, and compact() can shrink them further by interning
+    repeated field values and by dropping the raw record or moving it into a WOSrecordstore.
+
+    Papers restored from a snapshot are created from their already extracted `fielddict`, with `rawdata` set to None
+    and the raw record (if it was kept) read on demand from `store` at `index`.
+    """
+    __slots__ = ("uid", "_fielddict", "_rawdata", "_store", "_index")
+
+    def __init__(self, rawdata, lazy=False, fielddict=None, store=None, index=-1):
+        self._rawdata = rawdata
+        self._store = store
+        self._index = index
+        if fielddict is not None:
+            self._fielddict = fielddict
+            self.uid = fielddict.get("UT", "")
+            return
+        self.uid = rawdata.get("UID", "")
         self._fielddict = dict()
 
-        self.parse_rawdata()
+        if not lazy:
+            self.parse_rawdata()
 
     def __repr__(self):
         return self.__repr__()
@@ -186,21 +1095,102 @@ class WOSpaper:
                                                                              self.authors[0],
                                                                              len(self.authors) - 1)
 
+    @property
+    def parsed(self):
+        """Whether the fields of this paper have been extracted yet."""
+        return bool(self._fielddict)
+
+    @property
+    def rawdata(self):
+        """The raw record of this paper, decoded from its record store if it has been moved into one."""
+        if self._rawdata is None and self._store is not None:
+            return self._store.get(self._index)
+        return self._rawdata
+
+    @rawdata.setter
+    def rawdata(self, value):
+        self._rawdata = value
+        self._store = None
+        self._index = -1
+
+    @property
+    def identifiers(self):
+        return {x: y for x, y in self.fielddict(return_dict=True).items() if x in ("AR", "DI", "PM", "SN", "EI")}
+
+    @property
+    def title(self):
+        return self.fielddict(return_dict=True).get("TI", "")
+
+    @property
+    def authors(self):
+        return self.fielddict(return_dict=True).get("AU", [])
+
+    @property
+    def year(self):
+        return self.fielddict(return_dict=True).get("PY", "")
+
+    @property
+    def volume(self):
+        return self.fielddict(return_dict=True).get("VL", "")
+
+    @property
+    def issue(self):
+        return self.fielddict(return_dict=True).get("IS", "")
+
+    @property
+    def publication(self):
+        return self.fielddict(return_dict=True).get("SO", "")
+
+    @property
+    def keywords(self):
+        return self.fielddict(return_dict=True).get("ID", [])
+
+    def update(self, other):
+        """Replace the record of this paper with the (newer) record of another paper with the same UID, in place."""
+        self._rawdata = other._rawdata
+        self._store = other._store
+        self._index = other._index
+        self._fielddict = other._fielddict
+
     def parse_rawdata(self):
         self._fielddict = make_field_dict(self.rawdata)
         self.uid = self._fielddict.get("UT", "")
-        self.title = self._fielddict.get("TI", "")
-        self.authors = self._fielddict.get("AU", [])
-        self.year = self._fielddict.get("PY", "")
-        self.volume = self._fielddict.get("VL", "")
-        self.issue = self._fielddict.get("IS", "")
-        self.publication = self._fielddict.get("SO", "")
-        self.keywords = self._fielddict.get("ID", [])
+
+    def set_fields(self, fielddict):
+        """Replace the extracted fields of this paper, e.g. with fields extracted from its raw record elsewhere."""
+        self._fielddict = fielddict
+        self.uid = fielddict.get("UT", self.uid)
+
+    def compact(self, rawdata="keep", store=None, intern=True):
+        """Shrink the memory used by this paper.
+
+        Parameters
+        ----------
+        rawdata: str
+            "keep" the raw record as it is, "drop" it once the fields have been extracted, or move it into a "columnar"
+            WOSrecordstore (in which case an unparsed paper stays unparsed)
+        store: WOSrecordstore
+            The record store to use with rawdata="columnar"
+        intern: bool
+            Intern the values of fields which repeat between papers (see wrex.compact.INTERNED_FIELDS)
+        """
+        if rawdata == "drop":
+            self.fielddict(return_dict=True)
+            self._rawdata = None
+            self._store = None
+        elif rawdata == "columnar" and self._rawdata is not None:
+            self._index = store.append(self._rawdata)
+            self._store = store
+            self._rawdata = None
+        if intern and self._fielddict:
+            intern_fields(self._fielddict)
 
     def fielddict(self, return_dict=False, regenerate=False, printmissing=False):
-        if not self._fielddict:
-            self._fielddict = make_field_dict(self.rawdata, printmissing)
-        elif regenerate:
+        if self._rawdata is None and self._store is None:
+            # The raw record has been dropped, so the existing fields are all there is
+            pass
+        elif not self._fielddict or regenerate:
+            # Only decode the raw record (which may live in a columnar store) when the fields have to be extracted
             self._fielddict = make_field_dict(self.rawdata, printmissing)
         if return_dict:
             return self._fielddict
@@ -208,6 +1198,21 @@ class WOSpaper:
             return "\n".join([make_field_str(x, self._fielddict[x]) for x in self._fielddict])
 
 
+responsecodes = {
+    400: exceptions.WOSError400,
+    403: exceptions.WOSError403,
+    404: exceptions.WOSError404,
+    429: exceptions.WOSError429,
+    500: exceptions.WOSError500
+}
+
+
+def check_response(response):
+    """Raise the matching WOSHTTPError if the API returned an error status code."""
+    if response.status_code in responsecodes.keys():
+        raise responsecodes[response.status_code](error_message(response))
+
+
 def rawquery(conn, querystr):
     """
     Perform a query against the WOS API and return the raw response.
@@ -225,13 +1230,25 @@ def rawquery(conn, querystr):
         Populated requests response object
 
     """
-    queryparams = copy.deepcopy(conn.parameters)
-    queryparams["usrQuery"] = querystr
-    response = requests.get(conn.apiurl, headers={"X-ApiKey": conn.key}, params=queryparams)
+    response = blocking_get(conn, conn.apiurl, query_params(conn, querystr))
     return response
 
 
-def query(conn, querystr, returnraw=False):
+def blocking_get(conn, url, params):
+    """Perform a request with a blocking connection, refusing a WOSaioconnection (whose get() is a coroutine)."""
+    if conn.asynchronous:
+        raise TypeError("{} can only be used with the async entry points (arawquery(), aquery(), aquery_byid() and "
+                        "WOSquery.agetall()), not their blocking counterparts".format(conn.__class__.__name__))
+    return conn.get(url, params)
+
+
+def query_params(conn, querystr):
+    queryparams = dict(conn.parameters)
+    queryparams["usrQuery"] = querystr
+    return queryparams
+
+
+def query(conn, querystr, returnraw=False, lazy=False, storage="keep"):
     """Perform a query against the WOS API, parse the response and return a parsed variant.
 
     Parameters
@@ -239,6 +1256,10 @@ def query(conn, querystr, returnraw=False):
     conn:
     querystr:
     returnraw:
+    lazy:
+        Defer extracting the fields of each paper until they are first accessed.
+    storage:
+        How papers keep their raw records: "keep", "drop" or "columnar" (see WOSpaper.compact()).
 
     Returns
     -------
@@ -247,63 +1268,454 @@ def query(conn, querystr, returnraw=False):
         If `returnraw` is True
     """
 
-    responsecodes = {
-        400: exceptions.WOSError400,
-        403: exceptions.WOSError403,
-        404: exceptions.WOSError404,
-        429: exceptions.WOSError429,
-        500: exceptions.WOSError500
-    }
     response = rawquery(conn, querystr)
-    if response.status_code in responsecodes.keys():
-        raise responsecodes[response.status_code](json.loads(response.text)["message"])
+    check_response(response)
     if returnraw:
         return response
     else:
-        return WOSquery(response, conn, querystr=querystr, count=conn.parameters["count"])
+        return WOSquery(response, conn, querystr=querystr, count=conn.parameters["count"],
+                        firstrecord=conn.parameters.get("firstRecord", 1), lazy=lazy, storage=storage)
+
+
+def stream(conn, querystr, lazy=False, prefetch=True):
+    """Create a WOSstream which yields the papers of a query one at a time as its pages arrive.
+
+    Parameters
+    ----------
+    conn: WOSconnection
+        The WOSconnection object containing the API connection data.
+    querystr: str
+        The query that should be asked to the WOS API.
+    lazy: bool
+        Defer extracting the fields of each paper until they are first accessed.
+    prefetch: bool
+        Request the next page in the background while the current one is being consumed.
+
+    Returns
+    -------
+    WOSstream
+    """
+    return WOSstream(conn, querystr, lazy=lazy, prefetch=prefetch)
 
 
 def rawquery_byid(conn, queryid, count=None, firstRecord=None):
-    queryparams = copy.deepcopy(conn.parameters)
+    response = blocking_get(conn, conn.apiurl + "/query/{}".format(queryid), byid_params(conn, count, firstRecord))
+    return response
+
+
+def byid_params(conn, count=None, firstRecord=None):
+    queryparams = {x: y for x, y in conn.parameters.items() if x != "usrQuery"}
     if count:
         queryparams["count"] = count
     if firstRecord:
         queryparams["firstRecord"] = firstRecord
-    if "usrQuery" in queryparams.keys():
-        del queryparams["usrQuery"]
-    response = requests.get(conn.apiurl + "/query/{}".format(queryid), headers={"X-ApiKey": conn.key}, params=queryparams)
-    return response
+    return queryparams
 
 
-def query_byid(conn, queryid, count=None, firstRecord=None, returnraw=False):
+def query_byid(conn, queryid, count=None, firstRecord=None, returnraw=False, lazy=False, storage="keep"):
     """
     Perform a query against the WOS API, parse the response and return a parsed variant.
 
     :param querystr:
     :param returnraw:
+    :param lazy: Defer extracting the fields of each paper until they are first accessed.
+    :param storage: How papers keep their raw records: "keep", "drop" or "columnar" (see WOSpaper.compact()).
     :return:
     """
-    responsecodes = {
-        400: exceptions.WOSError400,
-        403: exceptions.WOSError403,
-        404: exceptions.WOSError404,
-        429: exceptions.WOSError429,
-        500: exceptions.WOSError500
-    }
     response = rawquery_byid(conn, queryid, count, firstRecord)
-    if response.status_code in responsecodes.keys():
-        raise responsecodes[response.status_code](json.loads(response.text)["message"])
+    check_response(response)
     if count is None:
         count = conn.parameters["count"]  # Just to make sure the resulting query object is formed accurately
+    if firstRecord is None:
+        firstRecord = conn.parameters.get("firstRecord", 1)
+    if returnraw:
+        return response
+    else:
+        return WOSquery(response, conn, querystr="", count=count, firstrecord=firstRecord, lazy=lazy, storage=storage)
+
+
+async def arawquery(conn, querystr):
+    """Async counterpart of rawquery(), for a WOSaioconnection (see wrex.aio)."""
+    return await conn.get(conn.apiurl, query_params(conn, querystr))
+
+
+async def aquery(conn, querystr, returnraw=False, lazy=False, storage="keep"):
+    """Async counterpart of query(), for a WOSaioconnection (see wrex.aio).
+
+    The returned WOSquery keeps a copy of the async connection, so the rest of it is retrieved with `await q.agetall()`.
+    Many queries can be awaited at once (e.g. with asyncio.gather()), sharing the concurrency limit of the connection.
+    """
+    response = await arawquery(conn, querystr)
+    check_response(response)
+    if returnraw:
+        return response
+    else:
+        return WOSquery(response, conn, querystr=querystr, count=conn.parameters["count"],
+                        firstrecord=conn.parameters.get("firstRecord", 1), lazy=lazy, storage=storage)
+
+
+async def arawquery_byid(conn, queryid, count=None, firstRecord=None):
+    """Async counterpart of rawquery_byid(), for a WOSaioconnection (see wrex.aio)."""
+    return await conn.get(conn.apiurl + "/query/{}".format(queryid), byid_params(conn, count, firstRecord))
+
+
+async def aquery_byid(conn, queryid, count=None, firstRecord=None, returnraw=False, lazy=False, storage="keep"):
+    """Async counterpart of query_byid(), for a WOSaioconnection (see wrex.aio)."""
+    response = await arawquery_byid(conn, queryid, count, firstRecord)
+    check_response(response)
+    if count is None:
+        count = conn.parameters["count"]
+    if firstRecord is None:
+        firstRecord = conn.parameters.get("firstRecord", 1)
     if returnraw:
         return response
     else:
-        return WOSquery(response, conn, querystr="", count=count)
+        return WOSquery(response, conn, querystr="", count=count, firstrecord=firstRecord, lazy=lazy, storage=storage)
+
+
+def export(papers, target, compress=False):
+    """Write any iterable of WOSpaper objects (e.g. a WOSquery, or papers as they arrive) out in the WOS text format.
+
+    Returns the number of papers written.
+    """
+    with WOSexportwriter(target, compress=compress) as writer:
+        writer.writemany(papers)
+    return writer.written
+
+
+def rawquery_links(conn, linktype, uid, count=None, firstRecord=None):
+    """
+    Request the records linked to a single record and return the raw response.
+
+    Parameters
+    ----------
+    conn : WOSconnection
+        The WOSconnection object containing the API connection data.
+    linktype : str
+        "citing" (records citing `uid`), "references" (the cited references of `uid`) or "related" (records sharing
+        cited references with `uid`).
+    uid : str
+        The UID of the record whose links should be retrieved.
+    count : int
+        Number of links to return (defaults to the count of the connection).
+    firstRecord : int
+        Position of the first link to return (defaults to the firstRecord of the connection).
+
+    Returns
+    -------
+    requests.response
+    """
+    queryparams = {x: y for x, y in conn.parameters.items() if x != "usrQuery"}
+    queryparams["uniqueId"] = uid
+    if count:
+        queryparams["count"] = count
+    if firstRecord:
+        queryparams["firstRecord"] = firstRecord
+    response = blocking_get(conn, conn.apiurl + "/{}".format(linktype), queryparams)
+    return response
+
+
+def query_links(conn, linktype, uid, count=None, firstRecord=None):
+    """
+    Request the records linked to a single record (see rawquery_links()) and return the parsed response.
+
+    Returns
+    -------
+    tuple
+        The number of links found, and a list of either raw records ("citing" and "related") or cited reference dicts
+        ("references").
+    """
+    response = rawquery_links(conn, linktype, uid, count, firstRecord)
+    check_response(response)
+    parsed = decode_response(response)
+    found = int(parsed["QueryResult"]["RecordsFound"])
+    if linktype == "references":
+        return found, parsed["Data"] or []
+    return found, response_records(parsed, firstrun=True)
+
+
+def uid_batches(uids, count=100, maxlength=max_query_length):
+    """Split a list of UIDs into batches which each fit into a single "UT=(... OR ...)" query and a single page."""
+    batches = []
+    current = []
+    length = len("UT=()")
+    for uid in uids:
+        extra = len(uid) + (len(" OR ") if current else 0)
+        if current and (len(current) >= count or length + extra > maxlength):
+            batches.append(current)
+            current = []
+            length = len("UT=()")
+            extra = len(uid)
+        current.append(uid)
+        length += extra
+    if current:
+        batches.append(current)
+    return batches
+
+
+def fetch_uids(conn, uids, workers=4, lazy=False, maxlength=max_query_length):
+    """
+    Retrieve the records with the given UIDs, packing as many UIDs as possible into each request.
+
+    The UIDs are split into OR-combined "UT=" queries which each fit within `maxlength` characters and a single page of
+    `count` records. The batches are requested concurrently, any batch rejected by the API as a bad request is split in
+    half and retried, and all results are merged into a single WOSquery.
+
+    Parameters
+    ----------
+    conn : WOSconnection
+        The WOSconnection object containing the API connection data.
+    uids : list
+        The UIDs to retrieve (duplicates are ignored).
+    workers : int
+        Number of batches to request concurrently.
+    lazy : bool
+        Defer extracting the fields of each paper until they are first accessed.
+    maxlength : int
+        The longest query string to send.
+
+    Returns
+    -------
+    WOSquery
+    """
+    uids = list(dict.fromkeys(uids))
+    count = conn.parameters["count"]
+
+    def fetch_batch(batch):
+        try:
+            batchquery = query(conn, "UT=({})".format(" OR ".join(batch)), lazy=lazy)
+        except exceptions.WOSError400:
+            if len(batch) == 1:
+                return []
+            return fetch_batch(batch[:len(batch) // 2]) + fetch_batch(batch[len(batch) // 2:])
+        if not batchquery.complete:
+            batchquery.getall()
+        return [batchquery]
+
+    results = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        for x in executor.map(fetch_batch, uid_batches(uids, count, maxlength)):
+            results += x
+    if not results:
+        raise exceptions.WOSError("None of the {} UIDs could be retrieved".format(len(uids)))
+    merged = results[0]
+    for x in results[1:]:
+        merged.merge(x)
+    if len(results) > 1:
+        merged.querystr = ""
+    if len(merged.data) < len(uids):
+        print("Could not find {}/{} UIDs".format(len(uids) - len(merged.data), len(uids)))
+    return merged
+
+
+def partition_querystr(querystr, first, last):
+    """Return a query string restricting a query to the records published between two years (inclusive)."""
+    if first == last:
+        return "({}) AND PY={}".format(querystr, first)
+    return "({}) AND PY=({}-{})".format(querystr, first, last)
+
+
+def plan_partitions(conn, querystr, maxrecords=max_retrievable_records, years=None, workers=4, lazy=False,
+                    storage="keep"):
+    """
+    Split a query into disjoint publication year ranges which each find few enough records to be retrieved in full.
+
+    Starting from a single range covering `years`, every range whose query finds more than `maxrecords` records is
+    bisected and both halves are counted again, with each round of requests made concurrently. Ranges are only counted
+    (with a count of 0), so the first page of a partition is downloaded once it is known to be kept. A single year
+    which still finds too many records cannot be split further, and only its first `maxrecords` records will be
+    retrievable.
+
+    Parameters
+    ----------
+    conn : WOSconnection
+        The WOSconnection object containing the API connection data.
+    querystr : str
+        The query to partition.
+    maxrecords : int
+        The most records a partition may find (default the retrieval cap of the API).
+    years : tuple
+        The first and last publication year to cover (default 1900 to the current year).
+    workers : int
+        Number of partitions to query concurrently.
+    lazy : bool
+        Defer extracting the fields of each paper until they are first accessed.
+    storage : str
+        How papers keep their raw records: "keep", "drop" or "columnar" (see WOSpaper.compact()).
+
+    Returns
+    -------
+    list
+        A WOSquery holding the first page of each partition which found any records, ordered by year.
+    """
+    if years is None:
+        years = (first_publication_year, datetime.date.today().year)
+    probe = probe_connection(conn)
+
+    def count_range(yearrange):
+        return yearrange, records_found(rawquery(probe, partition_querystr(querystr, *yearrange)))
+
+    def query_range(yearrange):
+        return yearrange[0], partition_query(query(conn, partition_querystr(querystr, *yearrange), lazy=lazy,
+                                                   storage=storage), yearrange, maxrecords)
+
+    kept = []
+    pending = [tuple(years)]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        while pending:
+            pending = split_ranges(executor.map(count_range, pending), maxrecords, kept)
+        # Only the partitions which are kept have their first page downloaded
+        partitions = list(executor.map(query_range, kept))
+    return [x for _, x in sorted(partitions, key=lambda x: x[0])]
+
+
+async def aplan_partitions(conn, querystr, maxrecords=max_retrievable_records, years=None, lazy=False,
+                           storage="keep"):
+    """Async counterpart of plan_partitions(), for a WOSaioconnection (see wrex.aio).
+
+    Each round of ranges is requested at once, leaving the concurrency limit of the connection to pace them.
+    """
+    if years is None:
+        years = (first_publication_year, datetime.date.today().year)
+    probe = probe_connection(conn)
+
+    async def count_range(yearrange):
+        return yearrange, records_found(await arawquery(probe, partition_querystr(querystr, *yearrange)))
+
+    async def query_range(yearrange):
+        return yearrange[0], partition_query(await aquery(conn, partition_querystr(querystr, *yearrange), lazy=lazy,
+                                                          storage=storage), yearrange, maxrecords)
+
+    kept = []
+    pending = [tuple(years)]
+    while pending:
+        pending = split_ranges(await asyncio.gather(*(count_range(x) for x in pending)), maxrecords, kept)
+    partitions = await asyncio.gather(*(query_range(x) for x in kept))
+    return [x for _, x in sorted(partitions, key=lambda x: x[0])]
+
+
+def probe_connection(conn):
+    """Return a copy of a connection which asks for no records, to learn how many records a query finds."""
+    probe = conn.copy()
+    probe.parameters["count"] = 0
+    probe.parameters["firstRecord"] = 1
+    return probe
+
+
+def records_found(response):
+    check_response(response)
+    return int(decode_response(response)["QueryResult"]["RecordsFound"])
+
+
+def split_ranges(counted, maxrecords, kept):
+    """Bisect every year range which finds more than `maxrecords` records, adding the rest (if they find any) to
+    `kept`, and return the halves which have to be counted again."""
+    pending = []
+    for (first, last), found in counted:
+        if found > maxrecords and first < last:
+            middle = (first + last) // 2
+            pending += [(first, middle), (middle + 1, last)]
+            continue
+        if found > maxrecords:
+            print("Year {} alone finds {} records, only {} of them can be retrieved".format(first, found, maxrecords))
+        if found:
+            kept.append((first, last))
+    return pending
+
+
+def partition_query(partition, yearrange, maxrecords):
+    # Partitions are paged through as they are, however many records they find, rather than partitioned again
+    partition.partition = yearrange
+    partition.maxrecords = maxrecords
+    return partition
+
+
+def fetch_partitions(partitions, workers=4, showprogress=False, writer=None, parser=None):
+    """Retrieve every page of a list of partitions (see plan_partitions()), on `workers` threads between them.
+
+    Partitions are retrieved concurrently while there are more of them than workers, and the workers are shared out
+    among the pages of each partition otherwise. With a WOSexportwriter, which can only be written from one thread,
+    the partitions are retrieved one after another with all workers on their pages, and partitions which were already
+    complete are written out too.
+    """
+    if partitions:
+        parser = page_parser(parser, partitions[0].storage)
+    if writer is not None:
+        for x in partitions:
+            x.getall(showprogress, workers, writer=writer, parser=parser)
+        return
+    partitions = [x for x in partitions if not x.complete]
+    if not partitions:
+        return
+    pageworkers = max(1, workers // len(partitions))
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, min(workers, len(partitions)))) as executor:
+        futures = [executor.submit(x.getall, showprogress, pageworkers, parser=parser) for x in partitions]
+        for x in futures:
+            x.result()
+
+
+def page_parser(parser, storage):
+    """Return the parser to extract pages with, or None with "keep" storage (whose pages the main process decodes)."""
+    if parser is not None and storage == "keep":
+        print("Papers with \"keep\" storage hold their raw records, so every page is decoded in the main process "
+              "anyway. Extracting fields there rather than on a WOSparser")
+        return None
+    return parser
+
+
+def partitioned_query(conn, querystr, workers=4, maxrecords=max_retrievable_records, years=None, lazy=False,
+                      storage="keep", showprogress=False, writer=None, parser=None):
+    """
+    Retrieve every record of a query in disjoint publication year partitions, merged into a single WOSquery.
+
+    Unlike query() followed by getall(), which only partitions a query once its first page shows it to be too large,
+    this plans the partitions straight away. UIDs found by more than one partition are only kept once.
+
+    Parameters
+    ----------
+    conn : WOSconnection
+        The WOSconnection object containing the API connection data.
+    querystr : str
+        The query that should be asked to the WOS API.
+    workers : int
+        Number of requests made concurrently, both while planning and retrieving the partitions.
+    maxrecords : int
+        The most records a partition may find (default the retrieval cap of the API).
+    years : tuple
+        The first and last publication year to cover (default 1900 to the current year).
+    lazy : bool
+        Defer extracting the fields of each paper until they are first accessed.
+    storage : str
+        How papers keep their raw records: "keep", "drop" or "columnar" (see WOSpaper.compact()).
+    showprogress : bool
+        Print the number of retrieved records of each partition as its pages arrive.
+    writer : WOSexportwriter
+        If given, every partition's papers are exported to this writer as soon as they have been retrieved, each paper
+        exactly once.
+    parser : WOSparser
+        If given, fields are extracted on the worker processes of this WOSparser.
+
+    Returns
+    -------
+    WOSquery
+    """
+    partitions = plan_partitions(conn, querystr, maxrecords, years, workers, lazy, storage)
+    fetch_partitions(partitions, workers, showprogress, writer, parser)
+    merged = WOSquery(None, conn, querystr=querystr, count=conn.parameters["count"], lazy=lazy, storage=storage)
+    for x in partitions:
+        merged.merge(x)
+    return merged
 
 
-def getall(q, showprogress=False):
+def getall(q, showprogress=False, workers=1, checkpoint=None, parser=None):
     """ Helper function to provide an alternate interface for getting the full data of a query."""
-    q.getall(showprogress)
+    q.getall(showprogress, workers, checkpoint=checkpoint, parser=parser)
+    return q
+
+
+async def agetall(q, showprogress=False, checkpoint=None):
+    """Async counterpart of getall()."""
+    await q.agetall(showprogress, checkpoint=checkpoint)
     return q
 
 
@@ -321,240 +1733,3 @@ def make_field_str(fieldname, fielddata, verbose=False):
     else:
         outstr += str(fielddata)
     return outstr
-
-
-def list_from_WOSlist(raw, key=None):
-    # TODO: Needs a refactor to handle if raw is just a list rather than a dict.
-    if isinstance(raw, list):
-        # This is the expected configuration
-        if key is None:
-            return raw
-        else:
-            return [x[key] for x in raw]
-    elif isinstance(raw, dict):
-        if key is None:
-            return [raw]
-        else:
-            return [raw[key]]
-    else:
-        return [raw]
-
-
-def dict_from_WOSlist(raw, key="type", content="content"):
-    try:
-        return {x[key]: x[content] for x in raw}
-    except TypeError:
-        return {raw[key]: raw[content]}
-
-
-def dict_from_WOSmultilist(raw, key="type", content="content"):
-    finaldict = dict()
-    for x in raw:
-        try:
-            finaldict[x[key]] += "; {}".format(x[content])
-        except KeyError:
-            finaldict[x[key]] = x[content]
-    return finaldict
-
-
-def make_field_dict(rawdata, printmissing=False):
-    # This multiple try/except segment is long-winded but right now I'm leaving it here for ease of understanding
-    # It could possibly be done with another sub-function
-
-    # TODO: Look at FITTING the data in here to the published model and fix it to be so if needed.
-    #   - Make model validator
-    #   - Make code which fixes non-canonical output to be in model style
-    #   - Parse KNOWN GOOD models to fit appropriately
-    workingdict = dict()
-    missing = set()
-    # Parse simple fields
-    try:
-        workingdict["PT"] = rawdata["static_data"]["summary"]["pub_info"]["pubtype"][0]
-    except KeyError:
-        missing.add("PT")
-
-    try:
-        if rawdata["static_data"]["fullrecord_metadata"]["languages"]["count"] <= 1:
-            workingdict["LA"] = rawdata["static_data"]["fullrecord_metadata"]["languages"]["language"]["content"]
-        else:
-            ladict = dict_from_WOSlist(rawdata["static_data"]["fullrecord_metadata"]["languages"]["language"])
-            workingdict["LA"] = ladict["primary"]
-    except KeyError:
-        missing.add("LA")
-
-    try:
-        workingdict["DT"] = rawdata["static_data"]["summary"]["doctypes"]["doctype"]
-    except KeyError:
-        missing.add("DT")
-
-    try:
-        workingdict["AB"] = rawdata["static_data"]["fullrecord_metadata"]["abstracts"]["abstract"]["abstract_text"]["p"]
-    except KeyError:
-        missing.add("AB")
-
-    try:
-        workingdict["RP"] = rawdata["static_data"]["fullrecord_metadata"]["reprint_addresses"]["address_name"]["address_spec"]["full_address"]
-    except KeyError:
-        missing.add("RP")
-    except TypeError:
-        # Right now if we can't get a single address we ignore it.
-        # In future this dict should be correctly parsed, see WOS:000477903700010
-        missing.add("RP")
-
-    try:
-        workingdict["NR"] = rawdata["static_data"]["fullrecord_metadata"]["refs"]["count"]
-    except KeyError:
-        missing.add("NR")
-
-    try:
-        workingdict["TC"] = rawdata["dynamic_data"]["citation_related"]["tc_list"]["silo_tc"]["local_count"]
-    except KeyError:
-        missing.add("TC")
-
-    try:
-        workingdict["PU"] = rawdata["static_data"]["summary"]["publishers"]["publisher"]["names"]["name"]["full_name"]
-    except KeyError:
-        missing.add("PU")
-
-    try:
-        workingdict["PI"] = rawdata["static_data"]["summary"]["publishers"]["publisher"]["address_spec"]["city"]
-    except KeyError:
-        missing.add("PI")
-
-    try:
-        workingdict["PA"] = rawdata["static_data"]["summary"]["publishers"]["publisher"]["address_spec"]["full_address"]
-    except KeyError:
-        missing.add("PA")
-
-    try:
-        workingdict["PD"] = rawdata["static_data"]["summary"]["pub_info"]["pubmonth"]
-    except KeyError:
-        missing.add("PD")
-
-    try:
-        workingdict["PY"] = rawdata["static_data"]["summary"]["pub_info"]["pubyear"]
-    except KeyError:
-        missing.add("PY")
-
-    try:
-        workingdict["VL"] = rawdata["static_data"]["summary"]["pub_info"]["vol"]
-    except KeyError:
-        missing.add("VL")
-
-    try:
-        workingdict["IS"] = rawdata["static_data"]["summary"]["pub_info"]["issue"]
-    except KeyError:
-        missing.add("IS")
-
-    try:
-        workingdict["PG"] = rawdata["static_data"]["summary"]["pub_info"]["page"]["page_count"]
-    except KeyError:
-        missing.add("PG")
-
-    try:
-        workingdict["GA"] = rawdata["static_data"]["item"]["ids"]["content"]
-    except KeyError:
-        missing.add("GA")
-
-    try:
-        workingdict["UT"] = rawdata["UID"]
-    except KeyError:
-        missing.add("UT")
-
-    # Parse lists from lists of dicts
-    try:
-        workingdict["AU"] = list_from_WOSlist(rawdata["static_data"]["summary"]["names"]["name"], "wos_standard")
-    except KeyError:
-        missing.add("AU")
-
-    try:
-        workingdict["AF"] = list_from_WOSlist(rawdata["static_data"]["summary"]["names"]["name"], "full_name")
-    except KeyError:
-        missing.add("AF")
-    #     workingdict["OI"] = list_from_WOSlist(rawdata["static_data"]["summary"]["names"]["name"], "orcid_id")
-
-    try:
-        workingdict["ID"] = list_from_WOSlist(rawdata["static_data"]["item"]["keywords_plus"]["keyword"])
-    except KeyError:
-        missing.add("ID")
-    #     workingdict["C1"] = list_from_WOSlist(rawdata["static_data"]["summary"]["names"]["name"])
-
-    # Parse dicts from lists of dicts
-    titlesdict = dict_from_WOSlist(rawdata["static_data"]["summary"]["titles"]["title"])
-
-    try:
-        workingdict["TI"] = titlesdict["item"]
-    except KeyError:
-        missing.add("TI")
-
-    try:
-        workingdict["SO"] = titlesdict["source"]
-    except KeyError:
-        missing.add("SO")
-
-    try:
-        workingdict["J9"] = titlesdict["abbrev_29"]
-    except KeyError:
-        missing.add("J9")
-
-    try:
-        workingdict["JI"] = titlesdict["abbrev_iso"]
-    except KeyError:
-        missing.add("JI")
-
-    identdict = {}
-    try:
-        identdict = dict_from_WOSlist(rawdata["dynamic_data"]["cluster_related"]["identifiers"]["identifier"],
-                                      content="value")
-    except (TypeError, KeyError):
-        missing.update(["AR", "DI", "PM", "SN", "EI"])
-
-    if identdict:
-        try:
-            workingdict["AR"] = identdict["art_no"]
-        except KeyError:
-            missing.add("AR")
-
-        try:
-            workingdict["DI"] = identdict["doi"]
-        except KeyError:
-            missing.add("DI")
-
-        try:
-            workingdict["PM"] = identdict["pmid"]
-        except KeyError:
-            missing.add("PM")
-
-        try:
-            workingdict["SN"] = identdict["issn"]
-        except KeyError:
-            missing.add("SN")
-
-        try:
-            workingdict["EI"] = identdict["eissn"]
-        except KeyError:
-            missing.add("EI")
-    categorydict = {}
-    try:
-        categorydict = dict_from_WOSmultilist(
-            rawdata["static_data"]["fullrecord_metadata"]["category_info"]["subjects"]["subject"],
-            key="ascatype")
-    except (TypeError, KeyError):
-        missing.update(["WC", "SC"])
-
-    try:
-        workingdict["WC"] = categorydict["traditional"]
-    except KeyError:
-        missing.add("WC")
-
-    try:
-        workingdict["SC"] = categorydict["extended"]
-    except KeyError:
-        missing.add("SC")
-
-    # End Record
-    workingdict["ER"] = ""
-
-    if missing and printmissing:
-        print("Missing fields: {}\n".format(missing))
-    return workingdict
@@ -2,3 +2,15 @@
 from .const import *
 # Make all WOS funcs natively available
 from .WOS import *
+# Make the recursive explorer natively available
+from .explorer import WOSexplorer, explore
+# Make binary snapshots natively available
+from .snapshot import WOSsnapshot, save_snapshot, load_snapshot
+# Make the local paper store natively available
+from .store import WOSstore
+# Make the asyncio connection natively available (it needs aiohttp once used)
+from .aio import WOSaioconnection
+# Make the sparse network builder natively available (it needs numpy and scipy once used)
+from .network import WOSnetwork, build_network, citation_network
+# Make the plain text export reader natively available
+from .plaintext import read_records, read_papers, read_export
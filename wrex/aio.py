@@ -0,0 +1,181 @@
+"""An asyncio connection to the WOS API, for driving many queries concurrently from one event loop."""
+import asyncio
+import time
+from .WOS import WOSconnection
+from .cache import CachedResponse
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+class WOSaiosession:
+    """
+    The WOSaiosession class holds the aiohttp session of a WOSaioconnection and its copies, along with the semaphore
+    which limits how many requests are in flight through them at once.
+
+    aiohttp sessions belong to the event loop they were created on, so the session is only opened by the first request
+    and is replaced if the connection is later used from a different event loop.
+    """
+    def __init__(self, limit=10, headers=None, keepalive=True):
+        """Initialise a WOSaiosession instance
+
+        Parameters
+        ----------
+        limit: int
+            The maximum number of requests in flight at once, which is also the size of the connection pool
+        headers: dict
+            Extra headers sent with every request
+        keepalive: bool
+            Whether to keep connections open between requests
+        """
+        if aiohttp is None:
+            raise ImportError("WOSaioconnection requires the aiohttp package to be installed")
+        self.limit = limit
+        self.headers = dict(headers) if headers else dict()
+        self.keepalive = keepalive
+        self.session = None
+        self.semaphore = None
+        self.loop = None
+
+    def __repr__(self):
+        return 'wrex.{0}(limit={1})'.format(self.__class__.__name__, self.limit)
+
+    def open(self):
+        """Return the aiohttp session for the running event loop, creating it if needed."""
+        loop = asyncio.get_event_loop()
+        if self.session is None or self.session.closed or self.loop is not loop:
+            connector = aiohttp.TCPConnector(limit=self.limit, force_close=not self.keepalive)
+            self.session = aiohttp.ClientSession(connector=connector, headers=self.headers)
+            self.semaphore = asyncio.Semaphore(self.limit)
+            self.loop = loop
+        return self.session
+
+    async def get(self, url, headers, params, timeout):
+        """Perform a single GET request, returning its fully read response as a CachedResponse.
+
+        aiohttp errors are raised as ConnectionErrors, so that the scheduler retries them as it does dropped requests.
+        """
+        session = self.open()
+        if isinstance(timeout, tuple):
+            timeout = aiohttp.ClientTimeout(sock_connect=timeout[0], sock_read=timeout[1])
+        else:
+            timeout = aiohttp.ClientTimeout(total=timeout)
+        # aiohttp only accepts strings as query parameters
+        params = {x: str(y) for x, y in params.items()}
+        async with self.semaphore:
+            try:
+                async with session.get(url, headers=headers, params=params, timeout=timeout) as response:
+                    content = await response.read()
+            except aiohttp.ClientError as e:
+                raise ConnectionError(str(e)) from e
+        response = CachedResponse(response.status, response.headers.copy(), content, str(response.url))
+        response.fromcache = False
+        return response
+
+    async def close(self):
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
+
+
+class WOSaioconnection(WOSconnection):
+    """
+    The WOSaioconnection class is a WOSconnection whose requests are made on an asyncio event loop with aiohttp.
+
+    Its get() is a coroutine, so it is used with the async entry points (wrex.arawquery(), wrex.aquery(),
+    wrex.aquery_byid() and WOSquery.agetall()) rather than their blocking counterparts. Copies of it share its session,
+    so at most `limit` requests are in flight across every query made through it, however many are awaited at once, and
+    they share its scheduler, cache and metrics just like copies of a WOSconnection.
+    """
+    asynchronous = True
+
+    def __init__(self, key, apiurl="https://wos-api.clarivate.com/api/wos", parameters=None, limit=10, keepalive=True,
+                 timeout=60, headers=None, session=None, scheduler=None, cache=None, metrics=None):
+        """Initialise a WOSaioconnection instance
+
+        Parameters
+        ----------
+        key: str
+            The personal API key provided by Clarivate
+        apiurl: str
+            The url of the WOS API (default https://wos-api.clarivate.com/api/wos)
+        parameters: dict
+            The default query parameters sent with every request (default databaseId=WOS, count=100, firstRecord=1)
+        limit: int
+            The maximum number of requests in flight at once through this connection and its copies (default 10)
+        keepalive: bool
+            Whether to keep connections open between requests (default True)
+        timeout: float or tuple
+            Timeout in seconds of every request, or a (connect, read) tuple (default 60)
+        headers: dict
+            Extra headers sent with every request
+        session: WOSaiosession
+            An existing session to share, rather than opening a new one
+        scheduler: WOSscheduler
+            The scheduler which rate limits and retries requests (default WOSscheduler() at 5 requests per second)
+        cache: WOScache
+            An on-disk response cache consulted before any request is sent (default None, no caching)
+        metrics: WOSmetrics
+            The metrics which every request is reported to (default a new WOSmetrics)
+        """
+        super().__init__(key, apiurl, parameters, poolsize=limit, keepalive=keepalive, timeout=timeout,
+                         headers=headers, session=session, scheduler=scheduler, cache=cache, metrics=metrics)
+
+    @property
+    def limit(self):
+        return self.poolsize
+
+    def make_session(self):
+        return WOSaiosession(self.poolsize, self.headers, self.keepalive)
+
+    def copy(self):
+        """Return a copy of this connection with its own parameters which shares the same session and limit."""
+        return WOSaioconnection(self.key, self.apiurl, dict(self.parameters), limit=self.poolsize,
+                                keepalive=self.keepalive, timeout=self.timeout, headers=self.headers,
+                                session=self.session, scheduler=self.scheduler, cache=self.cache, metrics=self.metrics)
+
+    async def get(self, url, params):
+        """Perform a rate limited GET request against the API without blocking the event loop.
+
+        Requests wait for a free slot under the concurrency limit of the session as well as for the scheduler, and
+        are retried and cached exactly as by WOSconnection.get(). Cache lookups are blocking SQLite calls, so they are
+        run on a worker thread.
+        """
+        started = time.perf_counter()
+        if self.cache is not None:
+            cached = await asyncio.get_event_loop().run_in_executor(None, self.cache.get, url, params)
+            if cached is not None:
+                self.report(url, cached, started, 0.0, [cached.status_code], fromcache=True)
+                return cached
+        statuses = []
+        latency = [0.0]
+
+        async def send():
+            attempt = time.perf_counter()
+            try:
+                response = await self.session.get(url, {"X-ApiKey": self.key}, params, self.timeout)
+            except OSError:
+                statuses.append(None)
+                raise
+            finally:
+                latency[0] = time.perf_counter() - attempt
+            statuses.append(response.status_code)
+            return response
+
+        response = await self.scheduler.arequest(send)
+        self.report(url, response, started, latency[0], statuses)
+        if self.cache is not None:
+            await asyncio.get_event_loop().run_in_executor(None, self.cache.put, url, params, response)
+        return response
+
+    async def close(self):
+        """Close the aiohttp session of this connection (and of all its copies)."""
+        await self.session.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
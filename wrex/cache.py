@@ -0,0 +1,228 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from .const import stale_age, cache_maxsize_mb
+from .decode import response_records
+
+
+class CachedResponse:
+    """
+    A minimal stand-in for a requests response, holding a response which was stored in (or read from) a WOScache.
+    """
+    def __init__(self, status_code, headers, content, url=""):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.url = url
+        self.fromcache = True
+
+    def __repr__(self):
+        return '<{0} [{1}]>'.format(self.__class__.__name__, self.status_code)
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8")
+
+    def json(self):
+        return json.loads(self.content)
+
+
+def normalise_query(querystr):
+    """Collapse all runs of whitespace in a query string so that trivially different queries share a cache entry."""
+    return " ".join(querystr.split())
+
+
+def short_page(params, parsed):
+    """Whether a parsed response to a query or page request holds fewer records than it should have."""
+    try:
+        found = int(parsed["QueryResult"]["RecordsFound"])
+        records = response_records(parsed, firstrun="usrQuery" in params)
+    except (KeyError, TypeError, ValueError):
+        return False
+    firstrecord = int(params.get("firstRecord", 1))
+    expected = min(int(params.get("count", 0)), found - firstrecord + 1)
+    return len(records) < expected
+
+
+class WOScache:
+    """
+    The WOScache class stores API responses on disk so that repeated queries can be answered without a network call.
+
+    Entries are keyed on the normalised usrQuery plus the request parameters, expire after `ttl` (by default the same one
+    day after which a WOSquery is considered stale), and the least recently used entries are evicted once the cache grows
+    beyond `maxsize` MB. Pages retrieved by query ID are keyed on the query which created that ID, as the API reuses IDs.
+    """
+    def __init__(self, path, ttl=stale_age, maxsize=cache_maxsize_mb):
+        """Initialise a WOScache instance
+
+        Parameters
+        ----------
+        path: str
+            The file in which the cache is stored (created if it does not exist)
+        ttl: datetime.timedelta
+            How long an entry may be served for after it was stored (default 1 day)
+        maxsize: float
+            The maximum total size of the stored responses in MB (default 512)
+        """
+        self.path = os.path.expanduser(path)
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                querystr TEXT,
+                url TEXT,
+                created REAL,
+                accessed REAL,
+                size INTEGER,
+                status INTEGER,
+                headers TEXT,
+                body BLOB
+            );
+            CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed);
+            CREATE INDEX IF NOT EXISTS responses_querystr ON responses (querystr);
+            CREATE TABLE IF NOT EXISTS queryids (
+                apiurl TEXT,
+                queryid TEXT,
+                querystr TEXT,
+                PRIMARY KEY (apiurl, queryid)
+            );
+        """)
+        self.db.commit()
+
+    def __repr__(self):
+        return 'wrex.{0}(path="{1}", ttl={2!r}, maxsize={3})'.format(self.__class__.__name__, self.path, self.ttl,
+                                                                     self.maxsize)
+
+    def __len__(self):
+        with self.lock:
+            return self.db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def split_url(self, url):
+        """Return the base API url, and the query ID if `url` requests a page of an existing query."""
+        base, sep, queryid = url.rpartition("/query/")
+        if sep:
+            return base, queryid
+        return url, None
+
+    def querystr_for(self, url, params):
+        """Return the normalised query string which a request belongs to, or None if it is not known."""
+        if "usrQuery" in params:
+            return normalise_query(params["usrQuery"])
+        apiurl, queryid = self.split_url(url)
+        if queryid is None:
+            return None
+        row = self.db.execute("SELECT querystr FROM queryids WHERE apiurl = ? AND queryid = ?",
+                              (apiurl, queryid)).fetchone()
+        return row[0] if row else None
+
+    def makekey(self, url, params):
+        querystr = self.querystr_for(url, params)
+        if querystr is None:
+            return None, None
+        apiurl, queryid = self.split_url(url)
+        keyparams = {x: y for x, y in params.items() if x != "usrQuery"}
+        keysource = json.dumps([apiurl, queryid is not None, querystr, sorted((x, str(y)) for x, y in keyparams.items())])
+        return hashlib.sha256(keysource.encode("utf-8")).hexdigest(), querystr
+
+    def get(self, url, params):
+        """Return the cached response to a request, or None if there is no fresh entry for it."""
+        with self.lock:
+            key, _ = self.makekey(url, params)
+            row = None
+            if key is not None:
+                row = self.db.execute("SELECT created, status, headers, body FROM responses WHERE key = ?",
+                                      (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            created, status, headers, body = row
+            now = time.time()
+            if now - created > self.ttl.total_seconds():
+                self.db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.db.commit()
+                self.misses += 1
+                return None
+            self.db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self.db.commit()
+            self.hits += 1
+        return CachedResponse(status, json.loads(headers), body, url)
+
+    def put(self, url, params, response):
+        """Store the response to a request. Only successful responses holding a full page of records are cached."""
+        if response.status_code != 200:
+            return
+        body = response.content
+        try:
+            parsed = json.loads(body)
+        except ValueError:
+            parsed = None
+        with self.lock:
+            if "usrQuery" in params:
+                # Remember which query this ID belongs to, so that its pages can be keyed on the query itself
+                try:
+                    queryid = str(parsed["QueryResult"]["QueryID"])
+                except (KeyError, TypeError):
+                    queryid = None
+                if queryid is not None:
+                    self.db.execute("INSERT OR REPLACE INTO queryids VALUES (?, ?, ?)",
+                                    (url, queryid, normalise_query(params["usrQuery"])))
+            if parsed is not None and short_page(params, parsed):
+                # The page came back short and will be requested again, which must not be answered with the same page
+                self.db.commit()
+                return
+            key, querystr = self.makekey(url, params)
+            if key is None:
+                return
+            now = time.time()
+            self.db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                            (key, querystr, url, now, now, len(body), response.status_code,
+                             json.dumps(dict(response.headers)), body))
+            self.evict()
+            self.db.commit()
+
+    def size(self):
+        """Return the total size of the stored responses in MB."""
+        return (self.db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]) / 1024 ** 2
+
+    def evict(self):
+        """Remove expired entries, then the least recently used entries until the cache fits within maxsize."""
+        self.db.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.ttl.total_seconds(),))
+        total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        limit = self.maxsize * 1024 ** 2
+        if total <= limit:
+            return
+        removed = []
+        for key, size in self.db.execute("SELECT key, size FROM responses ORDER BY accessed ASC").fetchall():
+            if total <= limit:
+                break
+            removed.append((key,))
+            total -= size
+        self.db.executemany("DELETE FROM responses WHERE key = ?", removed)
+
+    def invalidate(self, querystr=None):
+        """Remove all cached responses for `querystr` (including its pages), or every entry if no query is given."""
+        with self.lock:
+            if querystr is None:
+                self.db.execute("DELETE FROM responses")
+                self.db.execute("DELETE FROM queryids")
+            else:
+                querystr = normalise_query(querystr)
+                self.db.execute("DELETE FROM responses WHERE querystr = ?", (querystr,))
+                self.db.execute("DELETE FROM queryids WHERE querystr = ?", (querystr,))
+            self.db.commit()
+
+    def clear(self):
+        """Remove every entry from the cache."""
+        self.invalidate()
+
+    def close(self):
+        self.db.close()
@@ -0,0 +1,93 @@
+import datetime
+import json
+import os
+
+timestamp_format = "%Y-%m-%dT%H:%M:%S.%f"
+
+
+class WOScheckpoint:
+    """
+    The WOScheckpoint class keeps an append-only record of the progress of WOSquery.getall() in a file.
+
+    The file holds one JSON entry per line: a "query" entry with the query metadata (written again whenever the query is
+    re-issued), a "records" entry with the papers already held when checkpointing started, and a "page" entry with the
+    raw response of every page as it is retrieved. Reading the entries back restores both the papers and the set of
+    completed page offsets, so a later getall() only requests the pages which are still missing.
+    """
+    def __init__(self, path, sync=False):
+        """Initialise a WOScheckpoint instance
+
+        Parameters
+        ----------
+        path: str
+            The file to keep the checkpoint in (created if it does not exist)
+        sync: bool
+            Force every entry to disk with os.fsync() as soon as it is written
+        """
+        self.path = os.path.expanduser(path)
+        self.sync = sync
+        self.handle = None
+
+    def __repr__(self):
+        return 'wrex.{0}(path="{1}")'.format(self.__class__.__name__, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def exists(self):
+        return os.path.exists(self.path) and os.path.getsize(self.path) > 0
+
+    def entries(self):
+        """Yield every entry of the checkpoint file in the order it was written."""
+        if not self.exists():
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # The process died part way through writing this entry, everything before it is still good
+                    break
+
+    def write_raw(self, line):
+        if self.handle is None:
+            self.handle = open(self.path, "a", encoding="utf-8")
+        self.handle.write(line + "\n")
+        self.handle.flush()
+        if self.sync:
+            os.fsync(self.handle.fileno())
+
+    def write_query(self, wosquery):
+        """Append the metadata of a query, including the pages it has already retrieved."""
+        self.write_raw(json.dumps({
+            "type": "query",
+            "querystr": wosquery.querystr,
+            "queryid": wosquery.queryid,
+            "found": wosquery.found,
+            "count": wosquery.count,
+            "timestamp": wosquery.timestamp.strftime(timestamp_format),
+            "pages": wosquery.pages,
+        }))
+
+    def write_records(self, records):
+        """Append a list of raw records."""
+        self.write_raw(json.dumps({"type": "records", "records": records}))
+
+    def write_page(self, queryid, firstrecord, response):
+        """Append the raw response to a page request, without decoding and re-encoding it."""
+        # Any line breaks in a JSON document are whitespace between tokens, so they can be flattened safely
+        body = response.text.replace("\r", " ").replace("\n", " ")
+        self.write_raw('{{"type": "page", "queryid": {}, "firstRecord": {}, "response": {}}}'.format(
+            json.dumps(queryid), json.dumps(firstrecord), body))
+
+    def close(self):
+        if self.handle is not None:
+            self.handle.close()
+            self.handle = None
+
+
+def parse_timestamp(timestamp):
+    return datetime.datetime.strptime(timestamp, timestamp_format)
@@ -0,0 +1,78 @@
+"""Compact storage of large result sets: interned field values, an array-backed raw record store and size measurement."""
+import sys
+from array import array
+from .decode import dumps, loads
+
+# Fields whose values repeat heavily between papers (journals, publishers, categories, authors, keywords, ...)
+INTERNED_FIELDS = {"PT", "LA", "DT", "PU", "PI", "PA", "PD", "SO", "J9", "JI", "SN", "EI", "WC", "SC", "AU", "AF", "ID",
+                   "VL", "IS"}
+
+
+def intern_fields(fielddict, fields=INTERNED_FIELDS):
+    """Replace the string values (and strings within list values) of the given fields with interned copies, in place."""
+    for tag in fields.intersection(fielddict):
+        value = fielddict[tag]
+        if isinstance(value, str):
+            fielddict[tag] = sys.intern(value)
+        elif isinstance(value, list):
+            fielddict[tag] = [sys.intern(x) if isinstance(x, str) else x for x in value]
+    return fielddict
+
+
+class WOSrecordstore:
+    """
+    The WOSrecordstore class keeps raw records in a single contiguous buffer rather than as trees of Python objects.
+
+    Each record is serialised to compact JSON and appended to one bytearray, with its end offset kept in an array of
+    unsigned 64-bit integers. A record is only decoded back into a dict when it is asked for.
+
+    A store can also be opened read-only over an existing buffer and offsets, e.g. views into a memory-mapped snapshot.
+    """
+    def __init__(self, buffer=None, offsets=None):
+        self.buffer = bytearray() if buffer is None else buffer
+        self.offsets = array("Q", [0]) if offsets is None else offsets
+
+    def __repr__(self):
+        return 'wrex.{0}(records={1}, bytes={2})'.format(self.__class__.__name__, len(self), len(self.buffer))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def append(self, record):
+        """Add a raw record to the store, returning its index."""
+        return self.append_encoded(dumps(record))
+
+    def append_encoded(self, encoded):
+        """Add a raw record which has already been encoded as compact JSON bytes, returning its index."""
+        self.buffer += encoded
+        self.offsets.append(len(self.buffer))
+        return len(self.offsets) - 2
+
+    def get(self, index):
+        """Decode and return the raw record at `index`."""
+        return loads(bytes(self.buffer[self.offsets[index]:self.offsets[index + 1]]))
+
+
+def deep_sizeof(obj, seen=None):
+    """Return the approximate number of bytes used by an object and everything it references (counting shared objects
+    once)."""
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (str, bytes, bytearray, int, float, bool, array)) or obj is None:
+        return size
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(x, seen) + deep_sizeof(y, seen) for x, y in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(x, seen) for x in obj)
+    else:
+        if hasattr(obj, "__dict__"):
+            size += deep_sizeof(obj.__dict__, seen)
+        for cls in type(obj).__mro__:
+            for slot in getattr(cls, "__slots__", ()):
+                if hasattr(obj, slot):
+                    size += deep_sizeof(getattr(obj, slot), seen)
+    return size
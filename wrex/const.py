@@ -1,4 +1,18 @@
 """PRAW constants."""
+import datetime
 
 __version__ = 0.1
 query_repeat_timeout = 3
+api_requests_per_second = 5
+request_max_retries = 5
+# Age after which a query (or a cached response) is considered stale
+stale_age = datetime.timedelta(days=1)
+cache_maxsize_mb = 512
+# Longest usrQuery sent when packing many UIDs into a single query
+max_query_length = 4000
+# Response bodies larger than this are decoded one record at a time when ijson is installed
+incremental_decode_bytes = 1024 ** 2
+# Highest record which can be retrieved through a single query ID (the API rejects larger firstRecord values)
+max_retrievable_records = 100000
+# Earliest publication year covered by the Web of Science, where partitioned retrieval starts splitting by year
+first_publication_year = 1900
@@ -0,0 +1,97 @@
+"""Decoding of API responses straight from their bytes, optionally with orjson and incrementally with ijson."""
+import io
+import json
+from .const import incremental_decode_bytes
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+
+def loads(content):
+    """Decode a JSON document from bytes (or str), using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def dumps(obj):
+    """Encode an object as compact UTF-8 JSON bytes, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def response_content(response):
+    """Return the undecoded body of a response, avoiding the bytes to str conversion of response.text."""
+    content = getattr(response, "content", None)
+    return response.text if content is None else content
+
+
+def decode_response(response):
+    """Decode the full JSON body of a response."""
+    return loads(response_content(response))
+
+
+def error_message(response):
+    """Return the message of an API error response, or its raw body if it is not the expected JSON."""
+    try:
+        return decode_response(response)["message"]
+    except (ValueError, KeyError, TypeError):
+        return response.text
+
+
+def records_prefix(firstrun=False):
+    # The response to the original query wraps its records in a "Data" object, pages requested by query ID do not
+    return "Data.Records.records.REC.item" if firstrun else "Records.records.REC.item"
+
+
+def decode_page(response, firstrun=False, incremental=False):
+    """Decode a page of results, returning its QueryResult dict and an iterator over its raw records.
+
+    Parameters
+    ----------
+    response: requests.Response or CachedResponse
+        The response to decode
+    firstrun: bool
+        Whether this is the response to the original query (rather than a page requested by query ID)
+    incremental: bool
+        Build the records one at a time with ijson instead of decoding the whole document up front, so that the full
+        tree of the page is never held in memory at once. This is several times slower, and only saves memory if each
+        record is compacted as soon as it is built, so it is off by default. None does this for bodies larger than
+        `incremental_decode_bytes` whenever ijson is installed.
+
+    Returns
+    -------
+    tuple
+        The QueryResult dict (empty if the response has none) and an iterator over the raw records
+    """
+    content = response_content(response)
+    if incremental is None:
+        incremental = ijson is not None and len(content) > incremental_decode_bytes
+    if not incremental:
+        parsed = loads(content)
+        return parsed.get("QueryResult", {}), iter(response_records(parsed, firstrun))
+    if ijson is None:
+        raise ImportError("Incremental decoding requires the ijson package to be installed")
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+    # QueryResult is small, so a separate pass for it is cheaper than handling every parse event in Python
+    queryresult = dict(ijson.kvitems(io.BytesIO(content), "QueryResult", use_float=True))
+    return queryresult, ijson.items(io.BytesIO(content), records_prefix(firstrun), use_float=True)
+
+
+def response_records(parsed, firstrun=False):
+    """Return the list of raw records from a parsed API response (firstrun for the response to the original query)."""
+    if firstrun:
+        records = parsed["Data"]["Records"]["records"]
+    else:
+        records = parsed["Records"]["records"]
+    # The API returns an empty string rather than an empty list when a page holds no records
+    return records["REC"] if records else []
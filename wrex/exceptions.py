@@ -10,6 +10,10 @@ class WOSStaleQueryError(WOSError):
     pass
 
 
+class WOSSnapshotError(WOSError):
+    pass
+
+
 class WOSHTTPError(WOSError):
     pass
 
@@ -0,0 +1,207 @@
+import concurrent.futures
+import threading
+from . import exceptions
+from .WOS import WOSpaper, query, query_links
+from .network import citation_network
+
+linktypes = ("citing", "references", "related")
+
+
+class WOSexplorer:
+    """
+    The WOSexplorer class recursively explores the bibliographic space around a set of seed records.
+
+    Starting from seed UIDs (or the results of a query), every record in the frontier is expanded breadth-first through the
+    citing, cited reference and related record endpoints, up to a given depth and a total budget of API requests. Each
+    UID is only ever expanded once, the requests of each level run concurrently, and the results are kept as a graph:
+    `papers` holds every record retrieved in full, `references` the cited reference entries of records which were only
+    seen as a reference, and `edges` the (source, target, kind) links between UIDs, where kind is "cites" (source cites
+    target) or "related".
+    """
+    def __init__(self, connection, seeds=None, querystr=None, depth=1, budget=1000, linktypes=linktypes, maxlinks=100,
+                 workers=4, lazy=True):
+        """Initialise a WOSexplorer instance
+
+        Parameters
+        ----------
+        connection: WOSconnection
+            The connection used for all requests
+        seeds: list
+            The UIDs to start exploring from
+        querystr: str
+            A query whose results are added to the seeds
+        depth: int
+            The number of levels to expand (1 only expands the seeds themselves)
+        budget: int
+            The maximum number of API requests to make, including those for the seed query
+        linktypes: tuple
+            The link endpoints to expand through, any of "citing", "references" and "related"
+        maxlinks: int
+            The maximum number of links followed per record and link type
+        workers: int
+            Number of requests to run concurrently
+        lazy: bool
+            Defer extracting the fields of retrieved papers until they are first accessed
+        """
+        self.connection = connection.copy()
+        self.seeds = list(seeds) if seeds else []
+        self.querystr = querystr
+        self.depth = depth
+        self.budget = budget
+        self.linktypes = tuple(linktypes)
+        self.maxlinks = maxlinks
+        self.workers = workers
+        self.lazy = lazy
+
+        self.papers = dict()
+        self.references = dict()
+        self.edges = set()
+        # The depth at which each UID was first reached
+        self.visited = dict()
+        self.expanded = set()
+        self.errors = []
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    def __repr__(self):
+        return 'wrex.{0}(connection, seeds={1}, querystr="{2}", depth={3}, budget={4})'.format(
+            self.__class__.__name__, self.seeds, self.querystr, self.depth, self.budget)
+
+    def __str__(self):
+        return '{0}(papers={1}, references={2}, edges={3}, requests={4}/{5})'.format(
+            self.__class__.__name__, len(self.papers), len(self.references), len(self.edges), self.requests, self.budget)
+
+    def __len__(self):
+        return len(self.visited)
+
+    def reserve(self):
+        """Take one request from the budget, returning False if it has run out."""
+        with self.lock:
+            if self.requests >= self.budget:
+                return False
+            self.requests += 1
+            return True
+
+    def seed_from_query(self):
+        """Add the results of the seed query to the seeds, within the request budget."""
+        if not self.reserve():
+            return
+        seedquery = query(self.connection, self.querystr, lazy=self.lazy)
+        for offset in seedquery.missing_pages():
+            if not self.reserve():
+                break
+            seedquery.receive_page(offset, seedquery.fetch_page(offset))
+        self.papers.update(seedquery.data)
+        self.seeds += list(seedquery.data)
+
+    def fetch_links(self, uid, linktype):
+        """Retrieve up to maxlinks links of one type for one UID, returning a list of (uid, paper or reference).
+
+        Returns None if the request budget ran out before the first request could be made.
+        """
+        count = min(self.connection.parameters["count"], self.maxlinks)
+        links = []
+        firstrecord = 1
+        found = None
+        while found is None or (firstrecord <= min(found, self.maxlinks)):
+            if not self.reserve():
+                if found is None:
+                    return None
+                break
+            try:
+                found, results = query_links(self.connection, linktype, uid, count=count, firstRecord=firstrecord)
+            except exceptions.WOSHTTPError as e:
+                with self.lock:
+                    self.errors.append((uid, linktype, e))
+                break
+            if not results:
+                break
+            if linktype == "references":
+                links += [(x.get("UID", ""), x) for x in results if x.get("UID")]
+            else:
+                links += [(x["UID"], WOSpaper(x, lazy=self.lazy)) for x in results]
+            firstrecord += count
+        return links[:self.maxlinks]
+
+    def add_links(self, uid, linktype, links):
+        for neighbour, item in links:
+            if isinstance(item, WOSpaper):
+                self.papers.setdefault(neighbour, item)
+            elif neighbour not in self.papers:
+                self.references.setdefault(neighbour, item)
+            if linktype == "citing":
+                self.edges.add((neighbour, uid, "cites"))
+            elif linktype == "references":
+                self.edges.add((uid, neighbour, "cites"))
+            else:
+                self.edges.add((uid, neighbour, "related"))
+
+    def run(self, showprogress=False):
+        """Explore outwards from the seeds, level by level, until the depth or the request budget is exhausted.
+
+        Calling run() again after increasing `depth` or `budget` continues from where the last run stopped.
+        """
+        if self.querystr and not self.visited:
+            self.seed_from_query()
+        for x in self.seeds:
+            self.visited.setdefault(x, 0)
+
+        for level in range(self.depth):
+            frontier = [x for x, y in self.visited.items() if y == level and x not in self.expanded]
+            if not frontier:
+                continue
+            tasks = [(x, y) for x in frontier for y in self.linktypes]
+            # Records which could not be fully expanded within the budget are picked up again by the next run()
+            unfinished = set()
+            with concurrent.futures.ThreadPoolExecutor(max_workers=self.workers) as executor:
+                futures = {executor.submit(self.fetch_links, x, y): (x, y) for x, y in tasks}
+                for future in concurrent.futures.as_completed(futures):
+                    uid, linktype = futures[future]
+                    links = future.result()
+                    if links is None:
+                        unfinished.add(uid)
+                        continue
+                    self.add_links(uid, linktype, links)
+                    for neighbour, _ in links:
+                        self.visited.setdefault(neighbour, level + 1)
+            self.expanded.update(x for x in frontier if x not in unfinished)
+            if showprogress:
+                print("Depth {}: expanded {} records, {} records found, {}/{} requests used".format(
+                    level + 1, len(frontier) - len(unfinished), len(self.visited), self.requests, self.budget))
+            if self.requests >= self.budget:
+                print("Request budget of {} exhausted at depth {}".format(self.budget, level + 1))
+                break
+        return self
+
+    def graph(self):
+        """Return the exploration as an adjacency dict mapping each UID to a dict of {neighbour: kind}."""
+        adjacency = {x: dict() for x in self.visited}
+        for source, target, kind in self.edges:
+            adjacency.setdefault(source, dict())[target] = kind
+            adjacency.setdefault(target, dict())
+        return adjacency
+
+    def network(self, kind="cocitation", **kwargs):
+        """Return the co-citation (or with kind "coupling", bibliographic coupling) network of the exploration.
+
+        See wrex.network.citation_network() for the other parameters.
+        """
+        return citation_network(self.edges, kind, **kwargs)
+
+    def to_networkx(self):
+        """Return the exploration as a networkx.DiGraph, with papers and references attached as node data."""
+        try:
+            import networkx
+        except ImportError:
+            raise ImportError("to_networkx() requires the networkx package to be installed")
+        graph = networkx.DiGraph()
+        for uid, level in self.visited.items():
+            graph.add_node(uid, depth=level, paper=self.papers.get(uid), reference=self.references.get(uid))
+        graph.add_edges_from((x, y, {"kind": z}) for x, y, z in self.edges)
+        return graph
+
+
+def explore(conn, seeds=None, querystr=None, depth=1, budget=1000, showprogress=False, **kwargs):
+    """Helper function which creates a WOSexplorer, runs it and returns it. See WOSexplorer for the parameters."""
+    explorer = WOSexplorer(conn, seeds=seeds, querystr=querystr, depth=depth, budget=budget, **kwargs)
+    return explorer.run(showprogress)
@@ -0,0 +1,414 @@
+"""Extraction of WOS text format fields from raw WOS API records."""
+from functools import partial
+from operator import itemgetter
+
+
+def list_from_WOSlist(raw, key=None):
+    # TODO: Needs a refactor to handle if raw is just a list rather than a dict.
+    if isinstance(raw, list):
+        # This is the expected configuration
+        if key is None:
+            return raw
+        else:
+            return [x[key] for x in raw]
+    elif isinstance(raw, dict):
+        if key is None:
+            return [raw]
+        else:
+            return [raw[key]]
+    else:
+        return [raw]
+
+
+def dict_from_WOSlist(raw, key="type", content="content"):
+    try:
+        return {x[key]: x[content] for x in raw}
+    except TypeError:
+        return {raw[key]: raw[content]}
+
+
+def dict_from_WOSmultilist(raw, key="type", content="content"):
+    finaldict = dict()
+    for x in raw:
+        if x[key] in finaldict:
+            finaldict[x[key]] += "; {}".format(x[content])
+        else:
+            finaldict[x[key]] = x[content]
+    return finaldict
+
+
+def language_from_WOSlanguages(raw):
+    if raw["count"] <= 1:
+        return raw["language"]["content"]
+    else:
+        return dict_from_WOSlist(raw["language"])["primary"]
+
+
+def addresses_from_WOSaddresses(raw):
+    return [x["address_spec"]["full_address"] for x in list_from_WOSlist(raw)]
+
+
+def orcids_from_WOSnames(raw):
+    return ["{}/{}".format(x["full_name"], x["orcid_id"]) for x in list_from_WOSlist(raw) if "orcid_id" in x]
+
+
+def end_record(raw):
+    return ""
+
+
+# Steps shared between several fields must be the same object, so that the extractor only computes them once
+wos_standard_names = partial(list_from_WOSlist, key="wos_standard")
+full_names = partial(list_from_WOSlist, key="full_name")
+identifiers_dict = partial(dict_from_WOSlist, content="value")
+categories_dict = partial(dict_from_WOSmultilist, key="ascatype")
+
+_summary = ("static_data", "summary")
+_pub_info = _summary + ("pub_info",)
+_publisher = _summary + ("publishers", "publisher")
+_fullrecord = ("static_data", "fullrecord_metadata")
+_titles = _summary + ("titles", "title", dict_from_WOSlist)
+_identifiers = ("dynamic_data", "cluster_related", "identifiers", "identifier", identifiers_dict)
+_categories = _fullrecord + ("category_info", "subjects", "subject", categories_dict)
+
+# The (tag, path) pairs making up a WOS text format record, in the order they are written out.
+# Each step of a path is either a key/index into the value reached so far, or a callable which transforms that value
+# (e.g. turning a WOS list of {"type": ..., "content": ...} dicts into a dict). A field is missing if any step fails.
+FIELD_SPEC = [
+    ("PT", _pub_info + ("pubtype", 0)),
+    ("LA", _fullrecord + ("languages", language_from_WOSlanguages)),
+    ("DT", _summary + ("doctypes", "doctype")),
+    ("AB", _fullrecord + ("abstracts", "abstract", "abstract_text", "p")),
+    ("RP", _fullrecord + ("reprint_addresses", "address_name", "address_spec", "full_address")),
+    ("NR", _fullrecord + ("refs", "count")),
+    ("TC", ("dynamic_data", "citation_related", "tc_list", "silo_tc", "local_count")),
+    ("PU", _publisher + ("names", "name", "full_name")),
+    ("PI", _publisher + ("address_spec", "city")),
+    ("PA", _publisher + ("address_spec", "full_address")),
+    ("PD", _pub_info + ("pubmonth",)),
+    ("PY", _pub_info + ("pubyear",)),
+    ("VL", _pub_info + ("vol",)),
+    ("IS", _pub_info + ("issue",)),
+    ("PG", _pub_info + ("page", "page_count")),
+    ("GA", ("static_data", "item", "ids", "content")),
+    ("UT", ("UID",)),
+    ("AU", _summary + ("names", "name", wos_standard_names)),
+    ("AF", _summary + ("names", "name", full_names)),
+    ("ID", ("static_data", "item", "keywords_plus", "keyword", list_from_WOSlist)),
+    ("TI", _titles + ("item",)),
+    ("SO", _titles + ("source",)),
+    ("J9", _titles + ("abbrev_29",)),
+    ("JI", _titles + ("abbrev_iso",)),
+    ("AR", _identifiers + ("art_no",)),
+    ("DI", _identifiers + ("doi",)),
+    ("PM", _identifiers + ("pmid",)),
+    ("SN", _identifiers + ("issn",)),
+    ("EI", _identifiers + ("eissn",)),
+    ("WC", _categories + ("traditional",)),
+    ("SC", _categories + ("extended",)),
+    ("ER", (end_record,)),
+]
+
+# Fields which are not part of the default record, but can be added to a spec (before "ER") when needed, e.g.
+# FieldExtractor(FIELD_SPEC[:-1] + EXTRA_FIELD_SPEC + FIELD_SPEC[-1:])
+EXTRA_FIELD_SPEC = [
+    ("C1", _fullrecord + ("addresses", "address_name", addresses_from_WOSaddresses)),
+    ("OI", _summary + ("names", "name", orcids_from_WOSnames)),
+]
+
+# Errors which mean that a step of a path could not be followed, and so that the field is missing
+_lookup_errors = (KeyError, IndexError, TypeError)
+# Placeholder for a shared prefix which is missing from a record
+_missing = object()
+
+
+def keys_getter(keys):
+    """Return a function looking up a sequence of keys/indices in turn, e.g. keys_getter(("a", 0))(x) is x["a"][0]."""
+    if len(keys) == 1:
+        return itemgetter(keys[0])
+    if len(keys) == 2:
+        a, b = keys
+        return lambda x: x[a][b]
+    if len(keys) == 3:
+        a, b, c = keys
+        return lambda x: x[a][b][c]
+    head = keys_getter(keys[:3])
+    tail = keys_getter(keys[3:])
+    return lambda x: tail(head(x))
+
+
+def path_getter(steps):
+    """Return a single function following the steps of a path (see FIELD_SPEC) from a value."""
+    funcs = []
+    keys = []
+    for step in steps:
+        if callable(step):
+            if keys:
+                funcs.append(keys_getter(keys))
+                keys = []
+            funcs.append(step)
+        else:
+            keys.append(step)
+    if keys:
+        funcs.append(keys_getter(keys))
+    getter = funcs[0]
+    for func in funcs[1:]:
+        getter = compose(getter, func)
+    return getter
+
+
+def compose(first, second):
+    return lambda x: second(first(x))
+
+
+class FieldExtractor:
+    """
+    The FieldExtractor class turns a field spec into a plan for extracting every field of a raw record in one pass.
+
+    Every path prefix which is shared by several fields (e.g. static_data -> summary, or the titles dict) is looked up
+    once per record and kept, and each field is then looked up from its nearest shared prefix. The remaining steps of
+    each lookup are turned into a single function when the plan is made (see path_getter()), so following them costs
+    one call.
+    """
+    def __init__(self, spec=None):
+        self.spec = [(x, tuple(y)) for x, y in (FIELD_SPEC if spec is None else spec)]
+        self.tags = [x for x, _ in self.spec]
+        if len(set(self.tags)) != len(self.tags):
+            raise ValueError("Field spec contains duplicate tags")
+        self.nodecount, self.plan = self.make_plan()
+
+    def __repr__(self):
+        return 'wrex.{0}(tags={1})'.format(self.__class__.__name__, self.tags)
+
+    def __call__(self, rawdata):
+        return self.extract(rawdata)
+
+    def make_plan(self):
+        """Return the number of shared prefixes and the (parent, getter, node, tag) lookups extracting the spec.
+
+        Each lookup calls `getter` on the value of shared prefix `parent` (0 being the record itself), storing the result
+        as shared prefix `node` or as field `tag`.
+        """
+        # A prefix is worth keeping if the fields below it branch off in more than one direction
+        branches = dict()
+        for _, path in self.spec:
+            for x in range(1, len(path)):
+                branches.setdefault(path[:x], set()).add(path[x])
+        shared = {x for x, y in branches.items() if len(y) > 1}
+
+        nodes = {(): 0}
+        plan = []
+
+        def lookup(path, node, tag):
+            parent = max(x for x in range(len(path)) if path[:x] in nodes)
+            plan.append((nodes[path[:parent]], path_getter(path[parent:]), node, tag))
+
+        for tag, path in self.spec:
+            for x in range(1, len(path)):
+                if path[:x] in shared and path[:x] not in nodes:
+                    nodes[path[:x]] = len(nodes)
+                    lookup(path[:x], nodes[path[:x]], None)
+            lookup(path, None, tag)
+        return len(nodes), plan
+
+    def extract(self, rawdata):
+        """Return the dict of every field of the spec found in a raw record."""
+        values = [rawdata] + [_missing] * (self.nodecount - 1)
+        out = dict()
+        for parent, getter, node, tag in self.plan:
+            value = values[parent]
+            if value is _missing:
+                continue
+            try:
+                value = getter(value)
+            except _lookup_errors:
+                continue
+            if tag is None:
+                values[node] = value
+            else:
+                out[tag] = value
+        return out
+
+    def missing(self, fielddict):
+        """Return the set of tags of this extractor which are absent from `fielddict`."""
+        return set(self.tags).difference(fielddict)
+
+
+default_extractor = FieldExtractor()
+
+
+def extract_fields(rawdata):
+    """Extract the fields of FIELD_SPEC from a raw record, exactly as default_extractor does but written out by hand.
+
+    Every record ingested goes through here, so the shared prefixes of FIELD_SPEC are looked up once into local
+    variables and each field is read from them directly. This must be kept in step with FIELD_SPEC, which
+    benchmarks/bench_fields.py checks. A prefix which cannot be reached is left as None, so that every lookup below it
+    fails and its fields are missing, as they are in the spec.
+    """
+    out = dict()
+    try:
+        static = rawdata["static_data"]
+    except _lookup_errors:
+        static = None
+    try:
+        summary = static["summary"]
+    except _lookup_errors:
+        summary = None
+    try:
+        pub_info = summary["pub_info"]
+    except _lookup_errors:
+        pub_info = None
+    try:
+        fullrecord = static["fullrecord_metadata"]
+    except _lookup_errors:
+        fullrecord = None
+    try:
+        publisher = summary["publishers"]["publisher"]
+    except _lookup_errors:
+        publisher = None
+    try:
+        publisher_address = publisher["address_spec"]
+    except _lookup_errors:
+        publisher_address = None
+    try:
+        dynamic = rawdata["dynamic_data"]
+    except _lookup_errors:
+        dynamic = None
+    try:
+        item = static["item"]
+    except _lookup_errors:
+        item = None
+    try:
+        names = summary["names"]["name"]
+    except _lookup_errors:
+        # A null name list still gives [None] author lists, so it has to be told apart from a missing one
+        names = _missing
+
+    try:
+        out["PT"] = pub_info["pubtype"][0]
+    except _lookup_errors:
+        pass
+    try:
+        out["LA"] = language_from_WOSlanguages(fullrecord["languages"])
+    except _lookup_errors:
+        pass
+    try:
+        out["DT"] = summary["doctypes"]["doctype"]
+    except _lookup_errors:
+        pass
+    try:
+        out["AB"] = fullrecord["abstracts"]["abstract"]["abstract_text"]["p"]
+    except _lookup_errors:
+        pass
+    try:
+        out["RP"] = fullrecord["reprint_addresses"]["address_name"]["address_spec"]["full_address"]
+    except _lookup_errors:
+        pass
+    try:
+        out["NR"] = fullrecord["refs"]["count"]
+    except _lookup_errors:
+        pass
+    try:
+        out["TC"] = dynamic["citation_related"]["tc_list"]["silo_tc"]["local_count"]
+    except _lookup_errors:
+        pass
+    try:
+        out["PU"] = publisher["names"]["name"]["full_name"]
+    except _lookup_errors:
+        pass
+    try:
+        out["PI"] = publisher_address["city"]
+    except _lookup_errors:
+        pass
+    try:
+        out["PA"] = publisher_address["full_address"]
+    except _lookup_errors:
+        pass
+    for tag, key in (("PD", "pubmonth"), ("PY", "pubyear"), ("VL", "vol"), ("IS", "issue")):
+        try:
+            out[tag] = pub_info[key]
+        except _lookup_errors:
+            pass
+    try:
+        out["PG"] = pub_info["page"]["page_count"]
+    except _lookup_errors:
+        pass
+    try:
+        out["GA"] = item["ids"]["content"]
+    except _lookup_errors:
+        pass
+    try:
+        out["UT"] = rawdata["UID"]
+    except _lookup_errors:
+        pass
+    if names is not _missing:
+        try:
+            out["AU"] = list_from_WOSlist(names, key="wos_standard")
+        except _lookup_errors:
+            pass
+        try:
+            out["AF"] = list_from_WOSlist(names, key="full_name")
+        except _lookup_errors:
+            pass
+    try:
+        out["ID"] = list_from_WOSlist(item["keywords_plus"]["keyword"])
+    except _lookup_errors:
+        pass
+
+    # The titles, identifiers and categories are always dicts once built, so their fields can be read with get()
+    try:
+        titles = dict_from_WOSlist(summary["titles"]["title"])
+    except _lookup_errors:
+        titles = None
+    if titles is not None:
+        for tag, key in (("TI", "item"), ("SO", "source"), ("J9", "abbrev_29"), ("JI", "abbrev_iso")):
+            value = titles.get(key, _missing)
+            if value is not _missing:
+                out[tag] = value
+    try:
+        identifiers = dict_from_WOSlist(dynamic["cluster_related"]["identifiers"]["identifier"], content="value")
+    except _lookup_errors:
+        identifiers = None
+    if identifiers is not None:
+        for tag, key in (("AR", "art_no"), ("DI", "doi"), ("PM", "pmid"), ("SN", "issn"), ("EI", "eissn")):
+            value = identifiers.get(key, _missing)
+            if value is not _missing:
+                out[tag] = value
+    try:
+        categories = dict_from_WOSmultilist(fullrecord["category_info"]["subjects"]["subject"], key="ascatype")
+    except _lookup_errors:
+        categories = None
+    if categories is not None:
+        for tag, key in (("WC", "traditional"), ("SC", "extended")):
+            value = categories.get(key, _missing)
+            if value is not _missing:
+                out[tag] = value
+    out["ER"] = ""
+    return out
+
+
+def make_field_dict(rawdata, printmissing=False, extractor=None):
+    """Extract the WOS text format fields of a raw record into a dict, ordered as they should be written out.
+
+    Parameters
+    ----------
+    rawdata: dict
+        A single record (one entry of "REC") as returned by the WOS API
+    printmissing: bool
+        Print the tags which could not be found in the record
+    extractor: FieldExtractor
+        The extractor to use (default FIELD_SPEC, through the hand-written extract_fields())
+    """
+    # TODO: Look at FITTING the data in here to the published model and fix it to be so if needed.
+    #   - Make model validator
+    #   - Make code which fixes non-canonical output to be in model style
+    #   - Parse KNOWN GOOD models to fit appropriately
+    if extractor is None:
+        extractor = default_extractor
+        workingdict = extract_fields(rawdata)
+    else:
+        workingdict = extractor.extract(rawdata)
+    if printmissing:
+        missing = extractor.missing(workingdict)
+        if missing:
+            print("Missing fields: {}\n".format(missing))
+    return workingdict
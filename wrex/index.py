@@ -0,0 +1,169 @@
+"""In-memory inverted indexes over the fields of WOSpaper objects, for filtering and facet counts."""
+import heapq
+
+# The indexed facets and the fields they are read from
+index_fields = {
+    "author": "AU",
+    "keyword": "ID",
+    "category": "WC",
+    "area": "SC",
+    "year": "PY",
+    "publication": "SO",
+    "doi": "DI",
+}
+
+
+class WOSindex:
+    """
+    The WOSindex class maps the values of a set of facets (authors, keywords, categories, ...) to the UIDs of the
+    papers which have them.
+
+    Each facet keeps a posting set of UIDs per value, and each paper the values it was indexed under, so papers can be
+    removed or re-indexed without a scan. "; " separated category fields are split into single categories, years are
+    held as integers and DOIs are matched case-insensitively.
+    """
+    def __init__(self, fields=None):
+        """Initialise a WOSindex instance
+
+        Parameters
+        ----------
+        fields: dict
+            The facets to index, mapping each facet name to the field it is read from (default index_fields)
+        """
+        self.fields = dict(index_fields if fields is None else fields)
+        self.postings = {x: dict() for x in self.fields}
+        self.entries = dict()
+
+    def __repr__(self):
+        return 'wrex.{0}(fields={1}, papers={2})'.format(self.__class__.__name__, list(self.fields), len(self))
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, uid):
+        return uid in self.entries
+
+    def normalise(self, name, value):
+        if name == "year":
+            try:
+                return int(value)
+            except (TypeError, ValueError):
+                return None
+        if name == "doi":
+            return value.lower()
+        return value
+
+    def values(self, name, fielddict):
+        """Return the distinct values of a facet in the fields of a paper."""
+        value = fielddict.get(self.fields[name])
+        if value is None or value == "":
+            return ()
+        if isinstance(value, list):
+            values = value
+        elif isinstance(value, str) and self.fields[name] in ("WC", "SC"):
+            values = [x.strip() for x in value.split(";")]
+        else:
+            values = [value]
+        return tuple(dict.fromkeys(y for y in (self.normalise(name, x) for x in values) if y is not None and y != ""))
+
+    def add(self, paper):
+        """Index a paper, replacing any earlier entry for its UID."""
+        if paper.uid in self.entries:
+            self.remove(paper.uid)
+        fielddict = paper.fielddict(return_dict=True)
+        entry = dict()
+        for name in self.fields:
+            values = self.values(name, fielddict)
+            postings = self.postings[name]
+            for x in values:
+                if x in postings:
+                    postings[x].add(paper.uid)
+                else:
+                    postings[x] = {paper.uid}
+            entry[name] = values
+        self.entries[paper.uid] = entry
+
+    def remove(self, uid):
+        """Remove a UID from the index."""
+        entry = self.entries.pop(uid, None)
+        if entry is None:
+            return
+        for name, values in entry.items():
+            postings = self.postings[name]
+            for x in values:
+                postings[x].discard(uid)
+                if not postings[x]:
+                    del postings[x]
+
+    def lookup(self, name, value):
+        """Return the set of UIDs with a value of a facet.
+
+        `value` may be a list, tuple or set of values (matching any of them), and for "year" a range object, e.g.
+        range(1970, 1980) for the years 1970 to 1979.
+        """
+        if name not in self.postings:
+            raise KeyError("{} is not an indexed facet, choose from {}".format(name, list(self.fields)))
+        postings = self.postings[name]
+        if name == "year" and isinstance(value, range):
+            return set().union(*[y for x, y in postings.items() if x in value])
+        if isinstance(value, (list, set, frozenset, tuple)):
+            return set().union(*[postings.get(self.normalise(name, x), ()) for x in value])
+        return set(postings.get(self.normalise(name, value), ()))
+
+    def match(self, **criteria):
+        """Return the set of UIDs matching every criterion (facet name=value, see lookup())."""
+        if not criteria:
+            return set(self.entries)
+        matches = None
+        # Look the smallest posting sets up first, so the intersection shrinks as quickly as possible
+        for name, value in sorted(criteria.items(), key=lambda x: self.estimate(*x)):
+            found = self.lookup(name, value)
+            matches = found if matches is None else matches & found
+            if not matches:
+                break
+        return matches
+
+    def estimate(self, name, value):
+        postings = self.postings.get(name, {})
+        if isinstance(value, (list, set, frozenset, tuple, range)):
+            return len(self.entries)
+        return len(postings.get(self.normalise(name, value), ()))
+
+    def facet(self, name, uids=None, top=None):
+        """Count the papers per value of a facet, most frequent first.
+
+        Parameters
+        ----------
+        name: str
+            The facet to count
+        uids: set
+            Only count these papers (default every indexed paper)
+        top: int
+            Only return the `top` most frequent values
+
+        Returns
+        -------
+        list
+            (value, count) tuples
+        """
+        if name not in self.postings:
+            raise KeyError("{} is not an indexed facet, choose from {}".format(name, list(self.fields)))
+        postings = self.postings[name]
+        if uids is None:
+            counts = {x: len(y) for x, y in postings.items()}
+        elif len(postings) < len(uids):
+            # Few distinct values (e.g. years) are cheaper to count by intersecting their posting sets
+            uids = uids if isinstance(uids, (set, frozenset)) else set(uids)
+            counts = {x: len(y & uids) for x, y in postings.items()}
+            counts = {x: y for x, y in counts.items() if y}
+        else:
+            counts = dict()
+            for uid in uids:
+                for x in self.entries[uid][name]:
+                    counts[x] = counts.get(x, 0) + 1
+
+        def rank(x):
+            return -x[1], str(x[0])
+        if top is not None:
+            return heapq.nsmallest(top, counts.items(), key=rank)
+        return sorted(counts.items(), key=rank)
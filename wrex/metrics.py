@@ -0,0 +1,137 @@
+"""Per-request and per-page events of the request/parse pipeline, with hooks and aggregated counters."""
+import logging
+import threading
+import time
+
+
+class WOSmetrics:
+    """
+    The WOSmetrics class receives an event for every API request and every parsed page, passes it to any registered
+    hooks and keeps aggregated counters of them.
+
+    Every WOSconnection has one, shared by its copies, and every WOSquery has its own whose events are also passed on
+    to the metrics of the connection it was made from, so counters are available both per query and overall.
+
+    Events are dicts with a "event" key of "request" or "page":
+        request     url, status, latency (seconds of the final attempt), elapsed (seconds including waiting for the rate
+                    limit and retries), bytes, retries, statuses (of every attempt, None for a dropped connection),
+                    fromcache and quota (the remaining quota last reported by the API)
+        page        queryid, firstrecord, records (in the page), added (new UIDs), parsetime (seconds)
+    """
+    def __init__(self, parent=None):
+        """Initialise a WOSmetrics instance
+
+        Parameters
+        ----------
+        parent: WOSmetrics
+            Metrics which every event is passed on to after it has been counted here
+        """
+        self.parent = parent
+        self.hooks = []
+        self.lock = threading.Lock()
+        self.reset()
+
+    def __repr__(self):
+        return 'wrex.{0}(requests={1}, pages={2}, hooks={3})'.format(self.__class__.__name__, self.counters["requests"],
+                                                                     self.counters["pages"], len(self.hooks))
+
+    def __getstate__(self):
+        # Locks cannot be pickled, and hooks are often lambdas or closures which cannot be either, so a pickled (or
+        # copied) WOSmetrics keeps its counters and parent but starts without hooks
+        state = self.__dict__.copy()
+        del state["lock"]
+        state["hooks"] = []
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def reset(self):
+        """Set every counter back to zero."""
+        with self.lock:
+            self.started = time.time()
+            self.counters = {
+                "requests": 0,
+                "attempts": 0,
+                "retries": 0,
+                "errors": 0,
+                "cachehits": 0,
+                "bytes": 0,
+                "latency": 0.0,
+                "maxlatency": 0.0,
+                "elapsed": 0.0,
+                "pages": 0,
+                "records": 0,
+                "added": 0,
+                "parsetime": 0.0,
+            }
+            self.statuses = dict()
+            self.quota = dict()
+
+    def add_hook(self, hook):
+        """Register a callable which is called with every event dict (from the thread which caused it)."""
+        self.hooks.append(hook)
+        return hook
+
+    def remove_hook(self, hook):
+        self.hooks.remove(hook)
+
+    def emit(self, event):
+        """Count an event, call the hooks with it and pass it on to the parent metrics."""
+        with self.lock:
+            counters = self.counters
+            if event["event"] == "request":
+                counters["requests"] += 1
+                counters["attempts"] += len(event["statuses"])
+                counters["retries"] += event["retries"]
+                counters["bytes"] += event["bytes"]
+                counters["latency"] += event["latency"]
+                counters["maxlatency"] = max(counters["maxlatency"], event["latency"])
+                counters["elapsed"] += event["elapsed"]
+                if event["fromcache"]:
+                    counters["cachehits"] += 1
+                for status in event["statuses"]:
+                    if status is None:
+                        counters["errors"] += 1
+                    else:
+                        self.statuses[status] = self.statuses.get(status, 0) + 1
+                self.quota.update(event["quota"])
+            elif event["event"] == "page":
+                counters["pages"] += 1
+                counters["records"] += event["records"]
+                counters["added"] += event["added"]
+                counters["parsetime"] += event["parsetime"]
+        for hook in self.hooks:
+            hook(event)
+        if self.parent is not None:
+            self.parent.emit(event)
+
+    def summary(self):
+        """Return the counters, along with request and record rates and mean timings, as a flat dict."""
+        with self.lock:
+            summary = dict(self.counters)
+            summary.update({"status_{}".format(x): y for x, y in sorted(self.statuses.items())})
+            summary.update({"quota_{}".format(x): y for x, y in self.quota.items()})
+        summary["duration"] = time.time() - self.started
+        network = max(summary["requests"] - summary["cachehits"], 1)
+        summary["meanlatency"] = summary["latency"] / network
+        summary["requestspersecond"] = summary["requests"] / summary["duration"] if summary["duration"] else 0.0
+        summary["recordspersecond"] = summary["records"] / summary["duration"] if summary["duration"] else 0.0
+        summary["parsepersecond"] = summary["records"] / summary["parsetime"] if summary["parsetime"] else 0.0
+        return summary
+
+    def log(self, logger=None, level=logging.INFO):
+        """Write the summary to a logger (default the "wrex" logger) as a single line of key=value pairs."""
+        logger = logger or logging.getLogger("wrex")
+        logger.log(level, " ".join("{}={}".format(x, round(y, 4) if isinstance(y, float) else y)
+                                   for x, y in self.summary().items()))
+
+
+def logging_hook(logger=None, level=logging.DEBUG):
+    """Return a hook which writes every event to a logger (default the "wrex" logger)."""
+    logger = logger or logging.getLogger("wrex")
+
+    def hook(event):
+        logger.log(level, " ".join("{}={}".format(x, y) for x, y in event.items()))
+    return hook
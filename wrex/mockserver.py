@@ -0,0 +1,246 @@
+"""A local stand-in for the WOS API, serving synthetic records for testing and benchmarks without an API key."""
+import json
+import random
+import re
+import threading
+import time
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from socketserver import ThreadingMixIn
+from urllib.parse import urlparse, parse_qs
+from .synthetic import make_record, record_year
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    # http.server only has its own ThreadingHTTPServer from Python 3.7
+    pass
+
+
+class WOSmockserver:
+    """
+    The WOSmockserver class runs a local HTTP server which mimics the /api/wos and /api/wos/query/{id} endpoints.
+
+    Every query finds `records` synthetic records (see wrex.synthetic), except "UT=(... OR ...)" queries which find the
+    listed UIDs of the synthetic corpus, and pages of it can be requested by query ID as from the real API. A "PY=1990"
+    or "PY=(1990-1999)" clause anywhere in a query restricts it to the records published in those years, and pages
+    beyond `maxrecord` are refused as the real API refuses them beyond its retrieval cap. The server
+    can respond slowly (`latency`), throttle requests with 429 responses (randomly with probability `throttle`, and/or
+    above `persecond` requests per second) and drop records from pages (with probability `drop` a page comes back with
+    only half of its records), so that clients can be exercised against the failure modes of the real API.
+
+    Records are generated and encoded once each, so serving pages costs the server little CPU time.
+    """
+    def __init__(self, records=1000, latency=0.0, maxcount=100, maxrecord=None, throttle=0.0, persecond=None, drop=0.0,
+                 retryafter=0.1, seed=0, host="127.0.0.1", port=0):
+        """Initialise a WOSmockserver instance
+
+        Parameters
+        ----------
+        records: int
+            The number of records found by every query
+        latency: float
+            Seconds to wait before answering each request
+        maxcount: int
+            The largest page size accepted (larger counts are rejected with a 400 response, as by the API)
+        maxrecord: int
+            The largest firstRecord accepted (default unlimited, the real API accepts up to 100000)
+        throttle: float
+            Probability of answering a request with a 429 response
+        persecond: float
+            Answer requests beyond this many per second with a 429 response (default unlimited)
+        drop: float
+            Probability of a page coming back with only half of its records
+        retryafter: float
+            The Retry-After header sent with 429 responses, in seconds (None to send none)
+        seed: int
+            Seed of the synthetic records (see wrex.synthetic.make_record())
+        host: str
+            The address to listen on
+        port: int
+            The port to listen on (default 0, any free port)
+        """
+        self.records = records
+        self.latency = latency
+        self.maxcount = maxcount
+        self.maxrecord = maxrecord
+        self.throttle = throttle
+        self.persecond = persecond
+        self.drop = drop
+        self.retryafter = retryafter
+        self.seed = seed
+        self.host = host
+        self.port = port
+
+        # Number of requests answered, per status code
+        self.requests = dict()
+        self.queries = dict()
+        self.encoded = dict()
+        self.years = None
+        self.window = []
+        self.lock = threading.Lock()
+        self.random = random.Random(seed)
+        self.server = None
+        self.thread = None
+
+    def __repr__(self):
+        return 'wrex.{0}(records={1}, latency={2}, throttle={3}, drop={4})'.format(
+            self.__class__.__name__, self.records, self.latency, self.throttle, self.drop)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    @property
+    def apiurl(self):
+        """The url to pass to WOSconnection as `apiurl`."""
+        return "http://{}:{}/api/wos".format(self.host, self.server.server_address[1])
+
+    def start(self):
+        """Start serving in a background thread and return the API url."""
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep connections alive between requests, as the real API does
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                status, headers, body = mock.respond(self.path)
+                self.send_response(status)
+                for x, y in headers.items():
+                    self.send_header(x, y)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self.apiurl
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def record(self, uid_index):
+        """Return the JSON encoded synthetic record at an index of the corpus, encoding it on first use."""
+        encoded = self.encoded.get(uid_index)
+        if encoded is None:
+            encoded = json.dumps(make_record(uid_index, self.seed)).encode("utf-8")
+            self.encoded[uid_index] = encoded
+        return encoded
+
+    def error(self, status, message, headers=None):
+        return status, headers or {}, json.dumps({"message": message}).encode("utf-8")
+
+    def limited(self):
+        """Return whether a request should be throttled, and the quota headers to send with the response."""
+        headers = {}
+        with self.lock:
+            throttled = self.throttle and self.random.random() < self.throttle
+            if self.persecond:
+                now = time.monotonic()
+                self.window = [x for x in self.window if now - x < 1]
+                if len(self.window) >= self.persecond:
+                    throttled = True
+                else:
+                    self.window.append(now)
+                headers["X-REQ-ReqPerSec-Limit"] = str(int(self.persecond))
+                headers["X-REQ-ReqPerSec-Remaining"] = str(max(0, int(self.persecond) - len(self.window)))
+        if throttled and self.retryafter is not None:
+            headers["Retry-After"] = str(self.retryafter)
+        return throttled, headers
+
+    def respond(self, path):
+        """Return the status code, headers and body of the response to a request path."""
+        if self.latency:
+            time.sleep(self.latency)
+        status, headers, body = self.route(path)
+        with self.lock:
+            self.requests[status] = self.requests.get(status, 0) + 1
+        return status, headers, body
+
+    def route(self, path):
+        url = urlparse(path)
+        params = {x: y[0] for x, y in parse_qs(url.query).items()}
+        throttled, headers = self.limited()
+        if throttled:
+            return self.error(429, "Request rate exceeded", headers)
+        try:
+            count = int(params.get("count", 100))
+            firstrecord = int(params.get("firstRecord", 1))
+        except ValueError:
+            return self.error(400, "count and firstRecord must be integers", headers)
+        if not 0 <= count <= self.maxcount or firstrecord < 1:
+            return self.error(400, "count must be between 0 and {} and firstRecord at least 1".format(self.maxcount),
+                              headers)
+        if self.maxrecord is not None and firstrecord > self.maxrecord:
+            return self.error(400, "firstRecord must be at most {}".format(self.maxrecord), headers)
+
+        parts = url.path.rstrip("/").split("/")
+        if parts[-1] == "wos":
+            if "usrQuery" not in params:
+                return self.error(400, "usrQuery is required", headers)
+            with self.lock:
+                queryid = len(self.queries) + 1
+                self.queries[queryid] = self.match(params["usrQuery"])
+            return 200, headers, self.page(queryid, firstrecord, count, firstrun=True)
+        if len(parts) >= 2 and parts[-2] == "query":
+            try:
+                queryid = int(parts[-1])
+            except ValueError:
+                queryid = None
+            if queryid not in self.queries:
+                return self.error(404, "Query ID {} not found".format(parts[-1]), headers)
+            return 200, headers, self.page(queryid, firstrecord, count)
+        return self.error(404, "Unknown endpoint {}".format(url.path), headers)
+
+    def match(self, querystr):
+        """Return the corpus indexes of the records found by a query."""
+        querystr = querystr.strip()
+        years = re.search(r"PY=\(?(\d{4})(?:-(\d{4}))?\)?", querystr)
+        if years:
+            first = int(years.group(1))
+            last = int(years.group(2) or first)
+            return [x for x in self.match(querystr[:years.start()] + querystr[years.end():])
+                    if first <= self.year(x) <= last]
+        if querystr.startswith("UT=(") and querystr.endswith(")"):
+            indexes = []
+            for uid in querystr[4:-1].split(" OR "):
+                try:
+                    index = int(uid.strip().split(":")[-1]) - self.seed * 10 ** 9
+                except ValueError:
+                    continue
+                if 0 <= index < self.records:
+                    indexes.append(index)
+            return indexes
+        return range(self.records)
+
+    def year(self, uid_index):
+        """Return the publication year of the synthetic record at an index of the corpus."""
+        if self.years is None:
+            self.years = [record_year(x, self.seed) for x in range(self.records)]
+        return self.years[uid_index]
+
+    def page(self, queryid, firstrecord, count, firstrun=False):
+        found = self.queries[queryid]
+        indexes = found[firstrecord - 1:firstrecord - 1 + count]
+        if self.drop and len(indexes) > 1:
+            with self.lock:
+                dropped = self.random.random() < self.drop
+            if dropped:
+                indexes = indexes[:len(indexes) // 2]
+        records = b'{"REC": [' + b", ".join(self.record(x) for x in indexes) + b"]}" if len(indexes) else b'""'
+        queryresult = json.dumps({"QueryID": queryid, "RecordsSearched": self.records,
+                                  "RecordsFound": len(found)}).encode("utf-8")
+        if firstrun:
+            return b'{"QueryResult": ' + queryresult + b', "Data": {"Records": {"records": ' + records + b"}}}"
+        return b'{"QueryResult": ' + queryresult + b', "Records": {"records": ' + records + b"}}"
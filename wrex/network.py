@@ -0,0 +1,376 @@
+"""Co-authorship, co-occurrence and co-citation networks built from sparse incidence matrices."""
+import collections.abc
+import contextlib
+import csv
+import io
+import os
+from xml.sax.saxutils import escape, quoteattr
+from .index import WOSindex, index_fields
+
+try:
+    import numpy
+    import scipy.sparse
+    import scipy.sparse.csgraph
+except ImportError:
+    numpy = None
+    scipy = None
+
+# Edge weight normalisations, as functions of the raw weight and the paper counts of both ends
+normalisations = ("association", "cosine", "jaccard")
+
+
+def require_scipy():
+    if numpy is None or scipy is None:
+        raise ImportError("Building networks requires the numpy and scipy packages to be installed")
+
+
+@contextlib.contextmanager
+def open_text(target):
+    """Yield a text handle for a path or file object, closing it afterwards only if it was opened from a path."""
+    if isinstance(target, (str, os.PathLike)):
+        with open(target, "w", encoding="utf-8") as handle:
+            yield handle
+    elif isinstance(target, io.TextIOBase):
+        yield target
+    else:
+        handle = io.TextIOWrapper(target, encoding="utf-8")
+        try:
+            yield handle
+        finally:
+            handle.flush()
+            handle.detach()
+
+
+class WOSnetwork:
+    """
+    The WOSnetwork class holds a weighted, undirected network of entities (authors, keywords, categories, papers...).
+
+    The edges are kept as a symmetric scipy.sparse CSR adjacency matrix whose rows and columns follow `labels`, and
+    `counts` holds the number of papers each entity occurs in. Thresholding, top-k pruning and export all work on the
+    matrix as a whole, so networks of millions of edges are handled without a Python loop per edge (writing text
+    formats aside).
+    """
+    def __init__(self, adjacency, labels, counts, kind="cooccurrence"):
+        """Initialise a WOSnetwork instance
+
+        Parameters
+        ----------
+        adjacency: scipy.sparse matrix
+            The symmetric weighted adjacency matrix, with an empty diagonal
+        labels: list
+            The entity of each row/column
+        counts: numpy.ndarray
+            The number of papers each entity occurs in
+        kind: str
+            What the edges mean (e.g. "author", "cocitation"), used when exporting
+        """
+        require_scipy()
+        self.adjacency = scipy.sparse.csr_matrix(adjacency)
+        self.labels = list(labels)
+        self.counts = numpy.asarray(counts)
+        self.kind = kind
+        self.lookup = None
+
+    def __repr__(self):
+        return 'wrex.{0}(kind="{1}", nodes={2}, edges={3})'.format(self.__class__.__name__, self.kind, len(self),
+                                                                   self.edgecount())
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __contains__(self, label):
+        return label in self.positions()
+
+    def positions(self):
+        if self.lookup is None:
+            self.lookup = {x: y for y, x in enumerate(self.labels)}
+        return self.lookup
+
+    def edgecount(self):
+        """Return the number of (undirected) edges."""
+        return self.adjacency.nnz // 2
+
+    def edges(self):
+        """Return the sources, targets and weights of every edge as three numpy arrays, each edge appearing once."""
+        upper = scipy.sparse.triu(self.adjacency, k=1).tocoo()
+        return upper.row, upper.col, upper.data
+
+    def weight(self, source, target):
+        """Return the weight of the edge between two entities (0 if they are not linked)."""
+        lookup = self.positions()
+        return self.adjacency[lookup[source], lookup[target]].item()
+
+    def neighbours(self, label, top=None):
+        """Return the neighbours of an entity as (label, weight) pairs, strongest first."""
+        row = self.adjacency.getrow(self.positions()[label])
+        order = numpy.argsort(-row.data, kind="stable")
+        if top is not None:
+            order = order[:top]
+        return [(self.labels[row.indices[x]], row.data[x].item()) for x in order]
+
+    def strength(self, top=None):
+        """Return the entities with their summed edge weights as (label, strength) pairs, strongest first."""
+        strength = numpy.asarray(self.adjacency.sum(axis=1)).ravel()
+        order = numpy.argsort(-strength, kind="stable")
+        if top is not None:
+            order = order[:top]
+        return [(self.labels[x], strength[x].item()) for x in order]
+
+    def copy(self, adjacency=None):
+        return WOSnetwork(self.adjacency.copy() if adjacency is None else adjacency, self.labels, self.counts, self.kind)
+
+    def threshold(self, minweight):
+        """Return a copy of the network without the edges weighing less than `minweight`."""
+        adjacency = self.adjacency.copy()
+        adjacency.data[adjacency.data < minweight] = 0
+        adjacency.eliminate_zeros()
+        return self.copy(adjacency)
+
+    def prune(self, top):
+        """Return a copy of the network keeping only the `top` strongest edges of every entity.
+
+        An edge is kept if it is among the strongest of either of its ends, so the network stays symmetric.
+        """
+        matrix = self.adjacency.tocoo()
+        # Rank the entries of every row by descending weight
+        order = numpy.lexsort((-matrix.data, matrix.row))
+        rows = matrix.row[order]
+        rank = numpy.arange(len(rows)) - numpy.searchsorted(rows, rows, side="left")
+        keep = order[rank < top]
+        kept = scipy.sparse.csr_matrix((numpy.ones(len(keep), dtype=bool), (matrix.row[keep], matrix.col[keep])),
+                                       shape=matrix.shape)
+        kept = kept.maximum(kept.T)
+        return self.copy(self.adjacency.multiply(kept).tocsr())
+
+    def components(self):
+        """Return the connected component number of every entity, as a numpy array following `labels`."""
+        return scipy.sparse.csgraph.connected_components(self.adjacency, directed=False)[1]
+
+    def subgraph(self, labels):
+        """Return the network between a subset of the entities."""
+        lookup = self.positions()
+        positions = numpy.array([lookup[x] for x in labels], dtype=numpy.int64)
+        return WOSnetwork(self.adjacency[positions][:, positions], [self.labels[x] for x in positions],
+                          self.counts[positions], self.kind)
+
+    def write_edgelist(self, target, delimiter="\t", header=True):
+        """Write the edges as delimited source, target, weight lines (e.g. delimiter="," for CSV)."""
+        sources, targets, weights = self.edges()
+        labels = self.labels
+        with open_text(target) as handle:
+            writer = csv.writer(handle, delimiter=delimiter, lineterminator="\n")
+            if header:
+                writer.writerow(("source", "target", "weight"))
+            writer.writerows((labels[x], labels[y], z)
+                             for x, y, z in zip(sources.tolist(), targets.tolist(), weights.tolist()))
+
+    def write_pajek(self, target):
+        """Write the network in the Pajek .net format (as read by Pajek, VOSviewer and igraph)."""
+        sources, targets, weights = self.edges()
+        with open_text(target) as handle:
+            handle.write("*Vertices {}\n".format(len(self)))
+            handle.writelines('{} "{}"\n'.format(x + 1, str(y).replace('"', "'")) for x, y in enumerate(self.labels))
+            handle.write("*Edges\n")
+            handle.writelines("{} {} {}\n".format(x + 1, y + 1, z)
+                              for x, y, z in zip(sources.tolist(), targets.tolist(), weights.tolist()))
+
+    def write_graphml(self, target):
+        """Write the network as GraphML (as read by Gephi, Cytoscape and networkx), with counts and weights."""
+        sources, targets, weights = self.edges()
+        with open_text(target) as handle:
+            handle.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                         '<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n'
+                         '  <key id="label" for="node" attr.name="label" attr.type="string"/>\n'
+                         '  <key id="count" for="node" attr.name="count" attr.type="double"/>\n'
+                         '  <key id="weight" for="edge" attr.name="weight" attr.type="double"/>\n'
+                         '  <graph id={} edgedefault="undirected">\n'.format(quoteattr(self.kind)))
+            handle.writelines('    <node id="n{}"><data key="label">{}</data><data key="count">{}</data></node>\n'.format(
+                x, escape(str(y)), z) for x, (y, z) in enumerate(zip(self.labels, self.counts.tolist())))
+            handle.writelines('    <edge source="n{}" target="n{}"><data key="weight">{}</data></edge>\n'.format(x, y, z)
+                              for x, y, z in zip(sources.tolist(), targets.tolist(), weights.tolist()))
+            handle.write("  </graph>\n</graphml>\n")
+
+    def to_networkx(self):
+        """Return the network as a networkx.Graph, with paper counts as node data and weights as edge data."""
+        try:
+            import networkx
+        except ImportError:
+            raise ImportError("to_networkx() requires the networkx package to be installed")
+        graph = networkx.Graph(kind=self.kind)
+        graph.add_nodes_from((x, {"count": y}) for x, y in zip(self.labels, self.counts.tolist()))
+        sources, targets, weights = self.edges()
+        labels = self.labels
+        graph.add_weighted_edges_from((labels[x], labels[y], z)
+                                      for x, y, z in zip(sources.tolist(), targets.tolist(), weights.tolist()))
+        return graph
+
+
+def incidence(papers, facet="author", field=None, mincount=1):
+    """
+    Return the sparse papers x entities incidence matrix of a facet of some papers.
+
+    Every distinct value of the facet is given an integer ID as the papers are read, so the matrix is assembled straight
+    from flat arrays of IDs. If `papers` is a WOSquery which already has its inverted indexes built (see
+    WOSquery.filter()), the matrix is read from them instead, without touching the fields of any paper.
+
+    Parameters
+    ----------
+    papers: WOSquery, mapping or iterable of WOSpaper
+        The papers to read
+    facet: str
+        The facet to read, one of wrex.index.index_fields (e.g. "author", "keyword" or "category")
+    field: str
+        Read the facet from this field tag instead (e.g. "AF" for full author names)
+    mincount: int
+        Leave out entities occurring in fewer papers than this
+
+    Returns
+    -------
+    tuple
+        The scipy.sparse CSR matrix, the UIDs of its rows and the entities of its columns
+    """
+    require_scipy()
+    index = getattr(papers, "index", None)
+    if field is None and isinstance(index, WOSindex) and facet in index.fields:
+        uids = list(papers.data)
+        rowof = {x: y for y, x in enumerate(uids)}
+        postings = [(x, y) for x, y in index.postings[facet].items() if len(y) >= mincount]
+        labels = [x for x, _ in postings]
+        rows = numpy.fromiter((rowof[x] for _, y in postings for x in y), dtype=numpy.int64)
+        cols = numpy.repeat(numpy.arange(len(postings)), [len(y) for _, y in postings])
+        matrix = scipy.sparse.csr_matrix((numpy.ones(len(rows), dtype=numpy.int32), (rows, cols)),
+                                         shape=(len(uids), len(labels)))
+        return matrix, uids, labels
+
+    if isinstance(papers, collections.abc.Mapping):
+        papers = papers.values()
+    extractor = WOSindex({facet: field or index_fields[facet]})
+    ids = dict()
+    uids = []
+    cols = []
+    indptr = [0]
+    for paper in papers:
+        uids.append(paper.uid)
+        cols.extend(ids.setdefault(x, len(ids)) for x in extractor.values(facet, paper.fielddict(return_dict=True)))
+        indptr.append(len(cols))
+    labels = list(ids)
+    matrix = scipy.sparse.csr_matrix((numpy.ones(len(cols), dtype=numpy.int32), numpy.array(cols, dtype=numpy.int64),
+                                      numpy.array(indptr, dtype=numpy.int64)), shape=(len(uids), len(labels)))
+    if mincount > 1:
+        keep = numpy.flatnonzero(numpy.asarray(matrix.sum(axis=0)).ravel() >= mincount)
+        matrix = matrix[:, keep]
+        labels = [labels[x] for x in keep]
+    return matrix, uids, labels
+
+
+def cooccurrence(matrix, labels, minweight=0, top=None, normalise=None, fractional=False, kind="cooccurrence"):
+    """
+    Build the co-occurrence network of the columns of an incidence matrix, through a single sparse product.
+
+    Parameters
+    ----------
+    matrix: scipy.sparse matrix
+        The rows x entities incidence matrix (see incidence())
+    labels: list
+        The entity of each column
+    minweight: float
+        Leave out edges weighing less than this (applied after normalisation)
+    top: int
+        Keep only the `top` strongest edges of every entity (see WOSnetwork.prune())
+    normalise: str
+        Divide each co-occurrence count c_ij by a function of the counts c_i and c_j of its ends: "association"
+        (c_i * c_j), "cosine" (the square root of c_i * c_j) or "jaccard" (c_i + c_j - c_ij). Default None, raw counts.
+    fractional: bool
+        Weigh each row by 1 / (n - 1) for its n entities, so that every paper adds up to a weight of one per entity
+        however many entities it has (fractional counting, as is usual for co-authorship)
+    kind: str
+        What the edges mean, see WOSnetwork
+
+    Returns
+    -------
+    WOSnetwork
+    """
+    require_scipy()
+    if normalise is not None and normalise not in normalisations:
+        raise ValueError("normalise must be one of {}, not {}".format(normalisations, normalise))
+    matrix = scipy.sparse.csr_matrix(matrix)
+    counts = numpy.asarray(matrix.sum(axis=0)).ravel()
+    weighted = matrix
+    if fractional:
+        entities = numpy.diff(matrix.indptr)
+        weights = numpy.divide(1.0, entities - 1, out=numpy.zeros(len(entities)), where=entities > 1)
+        weighted = scipy.sparse.diags(weights) @ matrix
+    adjacency = (matrix.T @ weighted).tocsr()
+    adjacency = (adjacency - scipy.sparse.diags(adjacency.diagonal(), dtype=adjacency.dtype)).tocsr()
+    adjacency.eliminate_zeros()
+    if normalise is not None:
+        adjacency = adjacency.tocoo()
+        ci = counts[adjacency.row]
+        cj = counts[adjacency.col]
+        if normalise == "association":
+            adjacency.data = adjacency.data / (ci * cj)
+        elif normalise == "cosine":
+            adjacency.data = adjacency.data / numpy.sqrt(ci * cj)
+        else:
+            adjacency.data = adjacency.data / (ci + cj - adjacency.data)
+        adjacency = adjacency.tocsr()
+    network = WOSnetwork(adjacency, labels, counts, kind)
+    if minweight:
+        network = network.threshold(minweight)
+    if top is not None:
+        network = network.prune(top)
+    return network
+
+
+def build_network(papers, facet="author", field=None, mincount=1, minweight=0, top=None, normalise=None,
+                  fractional=False):
+    """
+    Build the co-occurrence network of a facet of some papers, e.g. co-authorship or keyword co-occurrence.
+
+    Two entities are linked with a weight of the number of papers they share. See incidence() and cooccurrence() for the
+    parameters.
+
+    Returns
+    -------
+    WOSnetwork
+    """
+    matrix, _, labels = incidence(papers, facet, field, mincount)
+    return cooccurrence(matrix, labels, minweight, top, normalise, fractional, kind=facet if field is None else field)
+
+
+def citation_network(edges, kind="cocitation", mincount=1, minweight=0, top=None, normalise=None):
+    """
+    Build the co-citation or bibliographic coupling network of the "cites" edges of an exploration (see WOSexplorer).
+
+    With kind "cocitation", two papers are linked by the number of papers citing both of them. With kind "coupling",
+    two papers are linked by the number of references they share. `mincount` leaves out papers cited by (or citing)
+    fewer papers than this, and the other parameters are as for cooccurrence().
+
+    Returns
+    -------
+    WOSnetwork
+    """
+    require_scipy()
+    if kind not in ("cocitation", "coupling"):
+        raise ValueError('kind must be "cocitation" or "coupling", not {}'.format(kind))
+    citing = dict()
+    cited = dict()
+    rows = []
+    cols = []
+    for source, target, linkkind in edges:
+        if linkkind == "cites":
+            rows.append(citing.setdefault(source, len(citing)))
+            cols.append(cited.setdefault(target, len(cited)))
+    matrix = scipy.sparse.csr_matrix((numpy.ones(len(rows), dtype=numpy.int32), (rows, cols)),
+                                     shape=(len(citing), len(cited)))
+    # Repeated edges would otherwise be summed into a weight above one
+    matrix.data[:] = 1
+    labels = list(cited)
+    if kind == "coupling":
+        matrix = matrix.T.tocsr()
+        labels = list(citing)
+    if mincount > 1:
+        keep = numpy.flatnonzero(numpy.asarray(matrix.sum(axis=0)).ravel() >= mincount)
+        matrix = matrix[:, keep]
+        labels = [labels[x] for x in keep]
+    return cooccurrence(matrix, labels, minweight, top, normalise, kind=kind)
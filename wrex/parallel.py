@@ -0,0 +1,76 @@
+"""Extraction of fields from raw records on a pool of worker processes."""
+import concurrent.futures
+import os
+from .decode import dumps, loads, response_content, response_records
+from .fields import make_field_dict
+
+
+def extract_batch(records):
+    """Extract the fields of a list of raw records (run in a worker process)."""
+    return [make_field_dict(x) for x in records]
+
+
+def extract_page(content, firstrun=False, encode=False):
+    """Decode the body of an API response and extract the fields of its records (run in a worker process).
+
+    With `encode`, the raw records are also returned re-encoded as compact JSON bytes (as kept by a WOSrecordstore), in
+    a (field dicts, encoded records) tuple, so that the main process can store them without decoding the page itself.
+    """
+    records = response_records(loads(content), firstrun)
+    if encode:
+        return extract_batch(records), [dumps(x) for x in records]
+    return extract_batch(records)
+
+
+class WOSparser:
+    """
+    The WOSparser class extracts the fields of raw records on a pool of worker processes.
+
+    Field extraction is pure Python and CPU-bound, so a single process only ever uses one core however many pages are
+    being retrieved at once. A WOSparser hands whole pages (as the undecoded response body, which is cheap to send to a
+    worker) or batches of raw records to its workers and returns their field dicts, from which papers can be built
+    without extracting anything in the main process. It can be passed to WOSquery.getall() and WOSquery.regenerate().
+
+    Pages of queries with "drop" or "columnar" storage are only decoded on the workers. With "keep" storage the main
+    process has to decode every page to hold its raw records anyway, so getall() extracts their fields there too and
+    leaves the WOSparser unused.
+    """
+    def __init__(self, workers=None, batchsize=500):
+        """Initialise a WOSparser instance
+
+        Parameters
+        ----------
+        workers: int
+            Number of worker processes (default the number of CPUs)
+        batchsize: int
+            Number of raw records sent to a worker at a time by extract() (default 500)
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.batchsize = batchsize
+        self.executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.workers)
+
+    def __repr__(self):
+        return 'wrex.{0}(workers={1}, batchsize={2})'.format(self.__class__.__name__, self.workers, self.batchsize)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def submit_page(self, response, firstrun=False, encode=False):
+        """Start extracting the fields of the records of an API response, returning a future of their field dicts (and
+        encoded raw records with `encode`, see extract_page())."""
+        return self.executor.submit(extract_page, response_content(response), firstrun, encode)
+
+    def extract(self, records):
+        """Extract the fields of a list of raw records, returning their field dicts in the same order."""
+        records = list(records)
+        batches = [records[x:x + self.batchsize] for x in range(0, len(records), self.batchsize)]
+        fielddicts = []
+        for x in self.executor.map(extract_batch, batches):
+            fielddicts += x
+        return fielddicts
+
+    def close(self):
+        self.executor.shutdown()
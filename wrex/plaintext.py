@@ -0,0 +1,197 @@
+"""Streaming reader for the tagged WOS plain text format, as written by WOSquery.export() and the Web of Science UI."""
+import gzip
+import io
+import os
+from .WOS import WOSquery, WOSpaper
+from .parallel import WOSparser
+
+# Tags holding one value per line
+list_tags = {"AU", "AF", "BA", "BF", "CA", "GP", "BE", "CR", "C1", "C3"}
+# Tags holding "; " separated values, wrapped over as many lines as needed by the Web of Science UI (but written one
+# value per line by WOSexportwriter)
+split_tags = {"ID", "DE", "OI", "RI"}
+# Tags which make_field_dict() extracts as integers
+integer_tags = {"NR", "TC", "PY", "PG"}
+# Lines outside of records
+header_tags = {"FN", "VR", "EF"}
+
+
+def field_value(tag, lines):
+    """Turn the lines of a field into the value make_field_dict() would have extracted for it."""
+    if tag in list_tags:
+        return lines
+    if tag in split_tags:
+        if any(";" in x for x in lines):
+            return [x.strip() for x in " ".join(lines).split(";") if x.strip()]
+        return lines
+    value = " ".join(lines)
+    if tag in integer_tags and value.isdigit():
+        return int(value)
+    return value
+
+
+def parse_lines(lines):
+    """Parse lines of the WOS plain text format, yielding the field dict of each record as soon as it ends.
+
+    Continuation lines (starting with three spaces) are added to the field above them. Header and footer lines (FN, VR,
+    EF) and blank lines between records are skipped, and a record left unterminated at the end of the input is dropped.
+    """
+    fields = dict()
+    tag = None
+    values = None
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if line.startswith("   ") and tag is not None:
+            values.append(line[3:])
+            continue
+        if not line.strip():
+            continue
+        if tag is not None:
+            fields[tag] = field_value(tag, values)
+        # Files opened with a plain UTF-8 encoding keep the byte order mark of Web of Science exports
+        line = line.lstrip("\ufeff")
+        tag = line[:2]
+        if tag == "ER":
+            fields["ER"] = ""
+            yield fields
+            fields = dict()
+            tag = None
+        elif tag in header_tags and not fields:
+            tag = None
+        else:
+            values = [line[3:]]
+
+
+def parse_chunk(chunk, encoding="utf-8-sig"):
+    """Parse a bytes chunk of whole records (see split_chunks()) into a list of field dicts (run in a worker process)."""
+    return list(parse_lines(chunk.decode(encoding).splitlines()))
+
+
+def open_source(source, encoding="utf-8-sig"):
+    """Return a text handle for a path (gzipped if it ends in .gz) or file object, and whether it should be closed."""
+    if isinstance(source, (str, os.PathLike)):
+        if os.fspath(source).endswith(".gz"):
+            return io.TextIOWrapper(gzip.open(source, "rb"), encoding=encoding), True
+        return open(source, "r", encoding=encoding), True
+    if isinstance(source, io.TextIOBase):
+        return source, False
+    return io.TextIOWrapper(source, encoding=encoding), False
+
+
+def open_binary(source):
+    if isinstance(source, (str, os.PathLike)):
+        if os.fspath(source).endswith(".gz"):
+            return gzip.open(source, "rb"), True
+        return open(source, "rb"), True
+    return source, False
+
+
+def read_records(source, encoding="utf-8-sig"):
+    """
+    Read a file in the WOS plain text format one line at a time, yielding the field dict of each record.
+
+    The field dicts use the same tags and value types as make_field_dict(), so the records of a file written by
+    WOSquery.export_to() come back exactly as they were exported. Only one record is held in memory at a time.
+
+    Parameters
+    ----------
+    source: str or file object
+        The path to read (gzipped if it ends in .gz), or an open file object (text or binary)
+    encoding: str
+        The encoding of the file (default UTF-8, with or without the byte order mark written by the Web of Science)
+    """
+    handle, owned = open_source(source, encoding)
+    try:
+        yield from parse_lines(handle)
+    finally:
+        if owned:
+            handle.close()
+
+
+def read_papers(source, encoding="utf-8-sig"):
+    """Read a file in the WOS plain text format one line at a time, yielding a WOSpaper for each record.
+
+    The papers are built from their field dicts, so they have no raw records (see WOSpaper).
+    """
+    for fields in read_records(source, encoding):
+        yield WOSpaper(None, fielddict=fields)
+
+
+def split_chunks(source, chunksize=4 * 1024 ** 2):
+    """Read a file in the WOS plain text format in bytes chunks of about `chunksize`, each ending after an ER line."""
+    handle, owned = open_binary(source)
+    try:
+        remainder = b""
+        while True:
+            block = handle.read(chunksize)
+            if not block:
+                break
+            block = remainder + block
+            # The last complete record ends with an ER line at the very start of the block or after a newline
+            end = max(block.rfind(b"\nER\n"), block.rfind(b"\nER \n"), block.rfind(b"\nER\r\n"),
+                      block.rfind(b"\nER \r\n"))
+            if end < 0:
+                remainder = block
+                continue
+            end = block.index(b"\n", end + 1) + 1
+            yield block[:end]
+            remainder = block[end:]
+        if remainder:
+            yield remainder
+    finally:
+        if owned:
+            handle.close()
+
+
+def read_export(sources, parser=None, storage="keep", chunksize=4 * 1024 ** 2, encoding="utf-8-sig"):
+    """
+    Load one or more files in the WOS plain text format into a single WOSquery, without making any API requests.
+
+    Records found in several files (or several times in one) are only kept once. Without a parser, every file is read
+    one line at a time. With one, the files are cut into chunks of whole records which are parsed on its worker
+    processes, with at most two chunks per worker in flight, so memory stays bounded however large the files are.
+
+    Parameters
+    ----------
+    sources: str, file object or list
+        The file or files to read (see read_records())
+    parser: int or WOSparser
+        If given, chunks are parsed on the worker processes of this WOSparser (or of a new one with this many processes)
+    storage: str
+        How papers are stored, "keep" or "drop" (papers read from text have no raw records to keep, so "columnar" stores
+        nothing either)
+    chunksize: int
+        The approximate size in bytes of the chunks handed to the parser
+    encoding: str
+        The encoding of the files
+
+    Returns
+    -------
+    WOSquery
+    """
+    if isinstance(sources, (str, os.PathLike)) or hasattr(sources, "read"):
+        sources = [sources]
+    wosquery = WOSquery(None, None, storage=storage)
+    ownedparser = parser is not None and not isinstance(parser, WOSparser)
+    if ownedparser:
+        parser = WOSparser(parser)
+    try:
+        for source in sources:
+            if parser is None:
+                wosquery.add_papers(list(read_papers(source, encoding)))
+                continue
+            pending = []
+            for chunk in split_chunks(source, chunksize):
+                pending.append(parser.executor.submit(parse_chunk, chunk, encoding))
+                # Take in the oldest chunk before reading further ahead than the workers can keep up with
+                if len(pending) >= 2 * parser.workers:
+                    wosquery.add_papers([WOSpaper(None, fielddict=x) for x in pending.pop(0).result()])
+            for future in pending:
+                wosquery.add_papers([WOSpaper(None, fielddict=x) for x in future.result()])
+    finally:
+        if ownedparser:
+            parser.close()
+    wosquery.found = len(wosquery.data)
+    wosquery.pages = {x: min(wosquery.count, wosquery.found - x + 1) for x in wosquery.page_offsets()}
+    wosquery.check_complete()
+    return wosquery
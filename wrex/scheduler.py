@@ -0,0 +1,204 @@
+import asyncio
+import random
+import threading
+import time
+from .const import api_requests_per_second, request_max_retries
+
+
+class TokenBucket:
+    """
+    A thread-safe token bucket which releases at most `rate` tokens per second, with bursts of up to `capacity`.
+    """
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def __repr__(self):
+        return 'wrex.{0}(rate={1}, capacity={2})'.format(self.__class__.__name__, self.rate, self.capacity)
+
+    def __getstate__(self):
+        # Locks cannot be pickled or copied, so a copy of the bucket gets a lock of its own
+        state = self.__dict__.copy()
+        del state["lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self):
+        """Take a token if one is available and return 0, otherwise return the seconds until one will be."""
+        with self.lock:
+            self.refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            return (1 - self.tokens) / self.rate
+
+    def acquire(self):
+        """Block until a token is available and take it."""
+        wait = self.reserve()
+        while wait:
+            time.sleep(wait)
+            wait = self.reserve()
+
+    async def aacquire(self):
+        """Wait on the event loop until a token is available and take it."""
+        wait = self.reserve()
+        while wait:
+            await asyncio.sleep(wait)
+            wait = self.reserve()
+
+    def setrate(self, rate, capacity=None):
+        with self.lock:
+            self.refill()
+            self.rate = float(rate)
+            self.capacity = float(capacity if capacity is not None else rate)
+            self.tokens = min(self.tokens, self.capacity)
+
+    def drain(self):
+        """Empty the bucket, so that the next acquire() waits for a fresh token."""
+        with self.lock:
+            self.refill()
+            self.tokens = min(self.tokens, 0)
+
+
+class WOSscheduler:
+    """
+    The WOSscheduler class paces and retries the requests made through a WOSconnection.
+
+    Requests are released through a token bucket sized to the per-second limit of the API. The throttle and quota headers
+    of every response are read back so that the bucket slows down as soon as the server reports no requests left in the
+    current second, and throttled (429), failing (500) or dropped requests are retried with jittered exponential backoff.
+    """
+    # Response headers reporting the remaining quota, as sent by the expanded and starter WOS APIs
+    quotaheaders = {
+        "X-REQ-ReqPerSec-Remaining": "persecond",
+        "X-RateLimit-Remaining-Second": "persecond",
+        "X-REC-AmtPerYear-Remaining": "peryear",
+        "X-RateLimit-Remaining-Day": "perday",
+    }
+    limitheaders = ("X-REQ-ReqPerSec-Limit", "X-RateLimit-Limit-Second")
+
+    def __init__(self, persecond=api_requests_per_second, maxretries=request_max_retries, backoff=1.0, maxbackoff=60.0,
+                 retrycodes=(429, 500)):
+        """Initialise a WOSscheduler instance
+
+        Parameters
+        ----------
+        persecond: float
+            The maximum number of requests released per second (default 5, the limit of the WOS expanded API)
+        maxretries: int
+            The number of times a throttled or failed request is retried before its response is returned as-is
+        backoff: float
+            The base delay in seconds of the exponential backoff between retries
+        maxbackoff: float
+            The maximum delay in seconds between retries
+        retrycodes: tuple
+            The response status codes which should be retried
+        """
+        self.persecond = persecond
+        self.bucket = TokenBucket(persecond)
+        self.maxretries = maxretries
+        self.backoff = backoff
+        self.maxbackoff = maxbackoff
+        self.retrycodes = retrycodes
+        self.quota = dict()
+        self.retries = 0
+
+    def __repr__(self):
+        return 'wrex.{0}(persecond={1}, maxretries={2})'.format(self.__class__.__name__, self.bucket.rate,
+                                                                self.maxretries)
+
+    def update(self, headers):
+        """Read the throttle and quota headers of a response, slowing the token bucket down if needed.
+
+        A per-second limit reported by the API can lower the rate of the bucket, but never raise it above `persecond`.
+        """
+        for header, name in self.quotaheaders.items():
+            if header in headers:
+                try:
+                    self.quota[name] = int(headers[header])
+                except ValueError:
+                    pass
+        for header in self.limitheaders:
+            if header in headers:
+                try:
+                    limit = float(headers[header])
+                except ValueError:
+                    continue
+                limit = min(limit, self.persecond)
+                if limit > 0 and limit != self.bucket.rate:
+                    self.bucket.setrate(limit)
+        if self.quota.get("persecond", 1) <= 0:
+            self.bucket.drain()
+
+    def delay(self, attempt, response=None):
+        """Return the number of seconds to wait before retry number `attempt`."""
+        if response is not None:
+            try:
+                return float(response.headers["Retry-After"])
+            except (KeyError, ValueError):
+                pass
+        # Full jitter, so that concurrent workers throttled at the same time do not retry in lockstep
+        return random.uniform(0, min(self.maxbackoff, self.backoff * 2 ** attempt))
+
+    def retry(self, response, attempt):
+        """Read the headers of a response and return whether it should be retried as retry number `attempt`."""
+        self.update(response.headers)
+        if response.status_code not in self.retrycodes or attempt >= self.maxretries:
+            return False
+        if response.status_code == 429:
+            self.bucket.drain()
+        return True
+
+    def request(self, send):
+        """Call `send()` to perform a request once a token is available, retrying it when throttled or failing.
+
+        After `maxretries` retries the last response is returned (or the last exception raised) unchanged.
+        """
+        attempt = 0
+        while True:
+            self.bucket.acquire()
+            try:
+                response = send()
+            except OSError:
+                # Dropped connections and timeouts (requests exceptions are OSErrors)
+                if attempt >= self.maxretries:
+                    raise
+                response = None
+            else:
+                if not self.retry(response, attempt):
+                    return response
+            time.sleep(self.delay(attempt, response))
+            attempt += 1
+            self.retries += 1
+
+    async def arequest(self, send):
+        """Async counterpart of request(), awaiting the coroutine function `send()` and waiting on the event loop.
+
+        Tokens and retries are shared with any blocking requests made through the same scheduler.
+        """
+        attempt = 0
+        while True:
+            await self.bucket.aacquire()
+            try:
+                response = await send()
+            except OSError:
+                if attempt >= self.maxretries:
+                    raise
+                response = None
+            else:
+                if not self.retry(response, attempt):
+                    return response
+            await asyncio.sleep(self.delay(attempt, response))
+            attempt += 1
+            self.retries += 1
@@ -0,0 +1,272 @@
+"""Versioned binary snapshots of a WOSquery, reopened through a memory map with papers materialised on demand."""
+import collections.abc
+import mmap
+import os
+import struct
+import sys
+from array import array
+from . import exceptions
+from .WOS import WOSquery, WOSpaper
+from .checkpoint import parse_timestamp, timestamp_format
+from .compact import WOSrecordstore
+from .decode import dumps, loads
+
+snapshot_magic = b"WREXSNAP"
+snapshot_version = 1
+# Magic bytes and format version at the start of the file
+preamble = struct.Struct("<8sH6x")
+# Length of the JSON header and the magic bytes again at the end of the file
+footer = struct.Struct("<Q8s")
+
+
+class WOSsnapshot(collections.abc.MutableMapping):
+    """
+    The WOSsnapshot class opens a snapshot written by save_snapshot() as a mapping of UID to WOSpaper.
+
+    The file is memory-mapped and only its header and UIDs are read when it is opened. Each paper is built from its
+    stored fields (and, if the snapshot kept them, its raw record) the first time it is accessed, and kept from then on.
+    Papers can be added, replaced and removed as in a dict without changing the file.
+
+    Snapshot layout (version 1), with all offsets relative to the start of their section:
+        preamble        b"WREXSNAP", uint16 version, padding to 16 bytes
+        fields          the extracted fields of each paper as compact JSON, back to back
+        raw             the raw record of each paper as compact JSON (optional)
+        uids            the UIDs of all papers, newline separated
+        fieldoffsets    uint64 end offset of every paper in `fields`, after a leading 0 (8 byte aligned)
+        rawoffsets      the same for `raw` (optional, 8 byte aligned)
+        header          JSON with the query metadata and the position of each section
+        footer          uint64 length of the header, b"WREXSNAP"
+    """
+    def __init__(self, path):
+        """Open a snapshot file
+
+        Parameters
+        ----------
+        path: str
+            The snapshot to open
+        """
+        self.path = os.path.expanduser(path)
+        self.handle = open(self.path, "rb")
+        try:
+            self.mmap = mmap.mmap(self.handle.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self.handle.close()
+            raise exceptions.WOSSnapshotError("{} is empty and not a wrex snapshot".format(self.path))
+        self.views = []
+        try:
+            self.header = self.read_header()
+        except Exception:
+            self.close()
+            raise
+        sections = self.header["sections"]
+        self.length = self.header["records"]
+        self.uids = bytes(self.mmap[slice(*sections["uids"])]).decode("utf-8").split("\n") if self.length else []
+        self.index = dict(zip(self.uids, range(self.length)))
+        self.fields = WOSrecordstore(self.view(*sections["fields"]), self.read_offsets(sections["fieldoffsets"]))
+        self.raw = None
+        if sections["raw"] is not None:
+            self.raw = WOSrecordstore(self.view(*sections["raw"]), self.read_offsets(sections["rawoffsets"]))
+
+        # Papers which have been materialised or added, and UIDs of the snapshot which have been removed
+        self.papers = dict()
+        self.removed = set()
+        self.added = 0
+
+    def __repr__(self):
+        return 'wrex.{0}(path="{1}", records={2})'.format(self.__class__.__name__, self.path, len(self))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def read_header(self):
+        if len(self.mmap) < preamble.size + footer.size:
+            raise exceptions.WOSSnapshotError("{} is too short to be a wrex snapshot".format(self.path))
+        magic, version = preamble.unpack_from(self.mmap, 0)
+        headerlength, endmagic = footer.unpack_from(self.mmap, len(self.mmap) - footer.size)
+        if magic != snapshot_magic or endmagic != snapshot_magic:
+            raise exceptions.WOSSnapshotError("{} is not a complete wrex snapshot".format(self.path))
+        if version > snapshot_version:
+            raise exceptions.WOSSnapshotError("{} is a version {} snapshot, this version of wrex reads up to version "
+                                              "{}".format(self.path, version, snapshot_version))
+        end = len(self.mmap) - footer.size
+        return loads(self.mmap[end - headerlength:end])
+
+    def view(self, start, end, cast=None):
+        # Every view into the map has to be released before it can be closed
+        self.views.append(memoryview(self.mmap))
+        self.views.append(self.views[-1][start:end])
+        if cast is not None:
+            self.views.append(self.views[-1].cast(cast))
+        return self.views[-1]
+
+    def read_offsets(self, start):
+        end = start + 8 * (self.length + 1)
+        if self.header["byteorder"] == sys.byteorder:
+            return self.view(start, end, "Q")
+        # Snapshots written on a machine of the other byte order have to be copied and swapped
+        offsets = array("Q", self.mmap[start:end])
+        offsets.byteswap()
+        return offsets
+
+    def paper(self, index):
+        """Build the paper at `index` of the snapshot from its stored fields."""
+        return WOSpaper(None, fielddict=self.fields.get(index), store=self.raw, index=index if self.raw else -1)
+
+    def __getitem__(self, uid):
+        paper = self.papers.get(uid)
+        if paper is None:
+            if uid not in self.index or uid in self.removed:
+                raise KeyError(uid)
+            paper = self.paper(self.index[uid])
+            self.papers[uid] = paper
+        return paper
+
+    def __setitem__(self, uid, paper):
+        if uid in self.index:
+            self.removed.discard(uid)
+        elif uid not in self.papers:
+            self.added += 1
+        self.papers[uid] = paper
+
+    def __delitem__(self, uid):
+        if uid not in self:
+            raise KeyError(uid)
+        self.papers.pop(uid, None)
+        if uid in self.index:
+            self.removed.add(uid)
+        else:
+            self.added -= 1
+
+    def __contains__(self, uid):
+        return (uid in self.index and uid not in self.removed) or uid in self.papers
+
+    def __iter__(self):
+        for x in self.uids:
+            if x not in self.removed:
+                yield x
+        for x in list(self.papers):
+            if x not in self.index:
+                yield x
+
+    def __len__(self):
+        return self.length - len(self.removed) + self.added
+
+    def close(self):
+        """Close the memory map. Papers which have not been materialised (or whose raw records are read from the
+        snapshot) can no longer be accessed afterwards."""
+        for x in reversed(self.views):
+            x.release()
+        self.views = []
+        if not self.mmap.closed:
+            self.mmap.close()
+        self.handle.close()
+
+
+def save_snapshot(wosquery, path, rawdata=False):
+    """
+    Write a WOSquery (its metadata, pages and the extracted fields of every paper) to a binary snapshot file.
+
+    Parameters
+    ----------
+    wosquery : WOSquery
+        The query to save.
+    path : str
+        The file to write.
+    rawdata : bool
+        Also store the raw record of every paper which still has one, so that fielddict(regenerate=True) and exports of
+        fields missing from the extracted fields keep working after loading.
+
+    Returns
+    -------
+    int
+        The number of papers written.
+    """
+    path = os.path.expanduser(path)
+    uids = []
+    fieldoffsets = array("Q", [0])
+    rawoffsets = array("Q", [0])
+    with open(path, "wb") as f:
+        f.write(preamble.pack(snapshot_magic, snapshot_version))
+        start = f.tell()
+        position = 0
+        for uid, paper in wosquery.data.items():
+            uids.append(uid)
+            blob = dumps(paper.fielddict(return_dict=True))
+            f.write(blob)
+            position += len(blob)
+            fieldoffsets.append(position)
+        sections = {"fields": [start, start + position]}
+
+        if rawdata:
+            start += position
+            position = 0
+            for paper in wosquery.data.values():
+                record = paper.rawdata
+                blob = dumps(record) if record is not None else b"null"
+                f.write(blob)
+                position += len(blob)
+                rawoffsets.append(position)
+            sections["raw"] = [start, start + position]
+        else:
+            sections["raw"] = None
+
+        sections["uids"] = write_section(f, "\n".join(uids).encode("utf-8"))
+        sections["fieldoffsets"] = write_section(f, fieldoffsets.tobytes())[0]
+        sections["rawoffsets"] = write_section(f, rawoffsets.tobytes())[0] if rawdata else None
+
+        header = dumps({
+            "version": snapshot_version,
+            "byteorder": sys.byteorder,
+            "records": len(uids),
+            "querystr": wosquery.querystr,
+            "queryid": wosquery.queryid,
+            "found": wosquery.found,
+            "searched": wosquery.searched,
+            "count": wosquery.count,
+            "timestamp": wosquery.timestamp.strftime(timestamp_format),
+            "pages": {str(x): y for x, y in wosquery.pages.items()},
+            "sections": sections,
+        })
+        f.write(header)
+        f.write(footer.pack(len(header), snapshot_magic))
+    return len(uids)
+
+
+def write_section(f, blob):
+    """Write a section starting at the next multiple of 8 bytes, returning its [start, end] position."""
+    f.write(b"\0" * (-f.tell() % 8))
+    start = f.tell()
+    f.write(blob)
+    return [start, start + len(blob)]
+
+
+def load_snapshot(path, connection=None):
+    """
+    Open a snapshot written by save_snapshot() as a WOSquery, without extracting or decoding any of its papers yet.
+
+    Parameters
+    ----------
+    path : str
+        The snapshot to open.
+    connection : WOSconnection
+        A connection to attach to the query, needed to retrieve missing pages, refresh or re-issue it.
+
+    Returns
+    -------
+    WOSquery
+        A query whose `data` is a WOSsnapshot, which materialises each paper the first time it is accessed.
+    """
+    data = WOSsnapshot(path)
+    header = data.header
+    wosquery = WOSquery(None, connection, querystr=header["querystr"], count=header["count"])
+    wosquery.queryid = header["queryid"]
+    wosquery.found = header["found"]
+    wosquery.searched = header["searched"]
+    wosquery.timestamp = parse_timestamp(header["timestamp"])
+    wosquery.pages = {int(x): y for x, y in header["pages"].items()}
+    wosquery.data = data
+    wosquery.check_complete()
+    return wosquery
@@ -0,0 +1,283 @@
+"""A local SQLite store of harvested papers, with indexed author, keyword, category, identifier and year lookups."""
+import itertools
+import os
+import sqlite3
+import threading
+import time
+from .WOS import WOSpaper
+from .decode import dumps, loads
+
+# Identifier fields which are kept in the identifiers table, and the categories fields kept in the categories table
+store_identifiers = ("DI", "PM", "SN", "EI")
+store_categories = ("WC", "SC")
+
+
+class WOSstore:
+    """
+    The WOSstore class keeps papers in a local SQLite database so that large harvests can be sliced offline.
+
+    Papers are upserted by UID, so results can be ingested incrementally (e.g. after every getall() or refresh()) and
+    newer versions of a record replace older ones. Besides the extracted fields of each paper, normalised and indexed
+    tables hold its authors (AU/AF), keywords (ID), categories (WC/SC), identifiers (DI/PM/SN/EI) and year, which
+    search() combines to find papers without going back to the API. Text lookups are case-insensitive.
+    """
+    def __init__(self, path, batchsize=10000):
+        """Initialise a WOSstore instance
+
+        Parameters
+        ----------
+        path: str
+            The file in which the store is kept (created if it does not exist), or ":memory:"
+        batchsize: int
+            The number of papers ingested per transaction (default 10000)
+        """
+        self.path = path if path == ":memory:" else os.path.expanduser(path)
+        self.batchsize = batchsize
+        self.lock = threading.Lock()
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode = WAL")
+        self.db.execute("PRAGMA synchronous = NORMAL")
+        # The secondary indexes are inserted into in random order, so give them a cache larger than the default 2 MB
+        self.db.execute("PRAGMA cache_size = -65536")
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS papers (
+                uid TEXT PRIMARY KEY,
+                year INTEGER,
+                title TEXT,
+                fields BLOB,
+                rawdata BLOB,
+                updated REAL
+            );
+            CREATE INDEX IF NOT EXISTS papers_year ON papers (year);
+            CREATE TABLE IF NOT EXISTS authors (
+                uid TEXT,
+                position INTEGER,
+                name TEXT COLLATE NOCASE,
+                fullname TEXT COLLATE NOCASE,
+                PRIMARY KEY (uid, position)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS authors_name ON authors (name);
+            CREATE INDEX IF NOT EXISTS authors_fullname ON authors (fullname);
+            CREATE TABLE IF NOT EXISTS keywords (
+                keyword TEXT COLLATE NOCASE,
+                uid TEXT,
+                PRIMARY KEY (keyword, uid)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS keywords_uid ON keywords (uid);
+            CREATE TABLE IF NOT EXISTS categories (
+                category TEXT COLLATE NOCASE,
+                field TEXT,
+                uid TEXT,
+                PRIMARY KEY (category, field, uid)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS categories_uid ON categories (uid);
+            CREATE TABLE IF NOT EXISTS identifiers (
+                value TEXT COLLATE NOCASE,
+                field TEXT,
+                uid TEXT,
+                PRIMARY KEY (value, field, uid)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS identifiers_uid ON identifiers (uid);
+        """)
+        self.db.commit()
+
+    def __repr__(self):
+        return 'wrex.{0}(path="{1}")'.format(self.__class__.__name__, self.path)
+
+    def __len__(self):
+        with self.lock:
+            return self.db.execute("SELECT COUNT(*) FROM papers").fetchone()[0]
+
+    def __contains__(self, uid):
+        with self.lock:
+            return self.db.execute("SELECT 1 FROM papers WHERE uid = ?", (uid,)).fetchone() is not None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def ingest(self, papers, rawdata=False):
+        """Add papers to the store, replacing any stored papers with the same UID.
+
+        Parameters
+        ----------
+        papers: iterable
+            The WOSpaper objects to add, e.g. a WOSquery, a WOSstream or a list of papers
+        rawdata: bool
+            Also store the raw record of each paper (if it still has one)
+
+        Returns
+        -------
+        int
+            The number of papers ingested
+        """
+        ingested = 0
+        papers = iter(papers)
+        while True:
+            batch = list(itertools.islice(papers, self.batchsize))
+            if not batch:
+                break
+            self.ingest_batch(batch, rawdata)
+            ingested += len(batch)
+        return ingested
+
+    def ingest_batch(self, papers, rawdata=False):
+        # A UID given more than once in a batch is stored as its last occurrence, as if the batch was ingested in order
+        papers = {x.uid: x for x in papers}.values()
+        now = time.time()
+        rows = []
+        authors = []
+        keywords = []
+        categories = []
+        identifiers = []
+        for paper in papers:
+            fields = paper.fielddict(return_dict=True)
+            uid = paper.uid
+            record = paper.rawdata if rawdata else None
+            rows.append((uid, paper_year(fields), fields.get("TI"), dumps(fields),
+                         dumps(record) if record is not None else None, now))
+            for position, (name, fullname) in enumerate(itertools.zip_longest(as_list(fields.get("AU")),
+                                                                               as_list(fields.get("AF")))):
+                authors.append((uid, position, name, fullname))
+            keywords += [(x, uid) for x in dict.fromkeys(as_list(fields.get("ID")))]
+            for field in store_categories:
+                categories += [(x, field, uid) for x in dict.fromkeys(split_categories(fields.get(field)))]
+            for field in store_identifiers:
+                if fields.get(field):
+                    identifiers.append((str(fields[field]), field, uid))
+
+        with self.lock:
+            with self.db:
+                # Only papers which are already stored have old author, keyword, category and identifier rows to replace
+                existing = [(x,) for x in self.stored_uids([x[0] for x in rows])]
+                for table in ("authors", "keywords", "categories", "identifiers"):
+                    self.db.executemany("DELETE FROM {} WHERE uid = ?".format(table), existing)
+                self.db.executemany("""
+                    INSERT INTO papers (uid, year, title, fields, rawdata, updated) VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (uid) DO UPDATE SET year = excluded.year, title = excluded.title,
+                        fields = excluded.fields, rawdata = COALESCE(excluded.rawdata, papers.rawdata),
+                        updated = excluded.updated
+                """, rows)
+                self.db.executemany("INSERT INTO authors VALUES (?, ?, ?, ?)", authors)
+                # Keywords and categories differing only in case are stored once per paper
+                self.db.executemany("INSERT OR IGNORE INTO keywords VALUES (?, ?)", keywords)
+                self.db.executemany("INSERT OR IGNORE INTO categories VALUES (?, ?, ?)", categories)
+                self.db.executemany("INSERT OR IGNORE INTO identifiers VALUES (?, ?, ?)", identifiers)
+
+    def stored_uids(self, uids):
+        """Return which of the given UIDs are already in the store."""
+        stored = []
+        # Stay well below the SQLite limit on the number of parameters of a single statement
+        for x in range(0, len(uids), 500):
+            chunk = uids[x:x + 500]
+            stored += [y[0] for y in self.db.execute("SELECT uid FROM papers WHERE uid IN ({})".format(
+                ", ".join("?" * len(chunk))), chunk)]
+        return stored
+
+    def make_paper(self, row):
+        fields, record = row
+        return WOSpaper(loads(record) if record is not None else None, fielddict=loads(fields))
+
+    def get(self, uid):
+        """Return the stored paper with the given UID, or None if it is not in the store."""
+        with self.lock:
+            row = self.db.execute("SELECT fields, rawdata FROM papers WHERE uid = ?", (uid,)).fetchone()
+        return self.make_paper(row) if row is not None else None
+
+    def search_sql(self, author=None, fullname=None, keyword=None, category=None, identifier=None, year=None):
+        conditions = []
+        params = []
+        for value, subquery in ((author, "SELECT uid FROM authors WHERE name = ?"),
+                                (fullname, "SELECT uid FROM authors WHERE fullname = ?"),
+                                (keyword, "SELECT uid FROM keywords WHERE keyword = ?"),
+                                (category, "SELECT uid FROM categories WHERE category = ?"),
+                                (identifier, "SELECT uid FROM identifiers WHERE value = ?")):
+            if value is not None:
+                conditions.append("uid IN ({})".format(subquery))
+                params.append(value)
+        if isinstance(year, (tuple, list)):
+            conditions.append("year BETWEEN ? AND ?")
+            params += [int(year[0]), int(year[1])]
+        elif year is not None:
+            conditions.append("year = ?")
+            params.append(int(year))
+        where = " WHERE " + " AND ".join(conditions) if conditions else ""
+        return where, params
+
+    def search(self, author=None, fullname=None, keyword=None, category=None, identifier=None, year=None, limit=None):
+        """Return the stored papers matching every given criterion (all papers if none are given).
+
+        Parameters
+        ----------
+        author: str
+            An author name as in the AU field, e.g. "KNUTH, DE"
+        fullname: str
+            An author name as in the AF field, e.g. "Knuth, Donald E."
+        keyword: str
+            A Keyword Plus term (ID field)
+        category: str
+            A Web of Science category (WC) or research area (SC)
+        identifier: str
+            A DOI, PubMed ID, ISSN or eISSN
+        year: int or tuple
+            A publication year, or an inclusive (first, last) range of years
+        limit: int
+            The maximum number of papers to return
+
+        Returns
+        -------
+        list
+            The matching WOSpaper objects, ordered by year and UID
+        """
+        where, params = self.search_sql(author, fullname, keyword, category, identifier, year)
+        sql = "SELECT fields, rawdata FROM papers{} ORDER BY year, uid".format(where)
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+        with self.lock:
+            rows = self.db.execute(sql, params).fetchall()
+        return [self.make_paper(x) for x in rows]
+
+    def count(self, author=None, fullname=None, keyword=None, category=None, identifier=None, year=None):
+        """Return the number of stored papers matching every given criterion (see search())."""
+        where, params = self.search_sql(author, fullname, keyword, category, identifier, year)
+        with self.lock:
+            return self.db.execute("SELECT COUNT(*) FROM papers{}".format(where), params).fetchone()[0]
+
+    def remove(self, uid):
+        """Remove the paper with the given UID from the store."""
+        with self.lock:
+            with self.db:
+                for table in ("papers", "authors", "keywords", "categories", "identifiers"):
+                    self.db.execute("DELETE FROM {} WHERE uid = ?".format(table), (uid,))
+
+    def close(self):
+        self.db.close()
+
+
+def as_list(value):
+    if value is None:
+        return []
+    if isinstance(value, list):
+        return value
+    return [value]
+
+
+def split_categories(value):
+    """Split a "; " separated WC or SC field into its categories."""
+    if not value:
+        return []
+    if isinstance(value, list):
+        return value
+    return [x.strip() for x in value.split(";") if x.strip()]
+
+
+def paper_year(fields):
+    try:
+        return int(fields.get("PY"))
+    except (TypeError, ValueError):
+        return None
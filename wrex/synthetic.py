@@ -0,0 +1,129 @@
+"""Deterministic synthetic records shaped like the "REC" entries returned by the WOS API, for benchmarks and testing."""
+import random
+
+_surnames = ["SMITH", "KNUTH", "GARCIA", "WANG", "MULLER", "ROSSI", "SATO", "KIM", "NOVAK", "OKAFOR", "SILVA", "DUBOIS"]
+_journals = [
+    ("JOURNAL OF THEORETICAL BIOLOGY", "J THEOR BIOL", "J. Theor. Biol."),
+    ("DATAMATION", "DATAMATION", "Datamation"),
+    ("NATURE", "NATURE", "Nature"),
+    ("PLOS ONE", "PLOS ONE", "PLoS One"),
+    ("ECOLOGY LETTERS", "ECOL LETT", "Ecol. Lett."),
+]
+_publishers = [
+    ("ACADEMIC PRESS LTD- ELSEVIER SCIENCE LTD", "LONDON", "24-28 OVAL RD, LONDON NW1 7DX, ENGLAND"),
+    ("NATURE PUBLISHING GROUP", "LONDON", "MACMILLAN BUILDING, 4 CRINAN ST, LONDON N1 9XW, ENGLAND"),
+    ("PUBLIC LIBRARY SCIENCE", "SAN FRANCISCO", "1160 BATTERY STREET, STE 100, SAN FRANCISCO, CA 94111 USA"),
+]
+_categories = [
+    ("Biology", "Life Sciences & Biomedicine - Other Topics"),
+    ("Ecology", "Environmental Sciences & Ecology"),
+    ("Computer Science, Software Engineering", "Computer Science"),
+    ("Mathematical & Computational Biology", "Mathematical & Computational Biology"),
+]
+_words = ["MODEL", "DYNAMICS", "EVOLUTION", "NETWORK", "POPULATION", "SELECTION", "SORTING", "GROWTH", "DIVERSITY",
+          "COMPETITION", "CLIMATE", "INFERENCE", "SPECIES", "TRANSMISSION", "STABILITY"]
+
+
+def record_year(index, seed=0):
+    """Return the publication year of make_record(index, seed) without building the rest of the record."""
+    # The year is the first value drawn for each record
+    return random.Random(seed * 1000003 + index).randint(1970, 2020)
+
+
+def make_record(index, seed=0):
+    """Return a synthetic raw record. The same `index` and `seed` always produce the same record."""
+    rng = random.Random(seed * 1000003 + index)
+    uid = "WOS:{:015d}".format(seed * 10 ** 9 + index)
+    year = rng.randint(1970, 2020)
+    journal = rng.choice(_journals)
+    publisher = rng.choice(_publishers)
+
+    names = []
+    for position in range(rng.randint(1, 6)):
+        surname = rng.choice(_surnames)
+        initials = "".join(rng.choice("ABCDEFGHJKLMNPRST") for _ in range(rng.randint(1, 2)))
+        name = {"seq_no": position + 1, "role": "author", "wos_standard": "{}, {}".format(surname, initials),
+                "full_name": "{}, {}".format(surname.title(), initials), "display_name": "{}, {}".format(surname, initials)}
+        if rng.random() < 0.3:
+            name["orcid_id"] = "0000-000{}-{:04d}-{:04d}".format(rng.randint(1, 3), rng.randint(0, 9999),
+                                                                 rng.randint(0, 9999))
+        names.append(name)
+
+    titles = [
+        {"type": "source", "content": journal[0]},
+        {"type": "source_abbrev", "content": journal[1]},
+        {"type": "abbrev_iso", "content": journal[2]},
+        {"type": "abbrev_29", "content": journal[1]},
+        {"type": "item", "content": " ".join(rng.choice(_words) for _ in range(rng.randint(3, 9)))},
+    ]
+
+    # The API sends single entries as bare dicts rather than lists of one, so mix both shapes in
+    if rng.random() < 0.8:
+        languages = {"count": 1, "language": {"type": "primary", "content": "English"}}
+    else:
+        languages = {"count": 2, "language": [{"type": "primary", "content": "English"},
+                                              {"type": "secondary", "content": "French"}]}
+    identifiers = [{"type": "issn", "value": "{:04d}-{:04d}".format(rng.randint(0, 9999), rng.randint(0, 9999))},
+                   {"type": "doi", "value": "10.{}/{}.{}".format(rng.randint(1000, 9999), year, index)}]
+    if rng.random() < 0.5:
+        identifiers.append({"type": "pmid", "value": "MEDLINE:{}".format(rng.randint(10 ** 6, 10 ** 8))})
+    if rng.random() < 0.3:
+        identifiers.append({"type": "eissn", "value": "{:04d}-{:04d}".format(rng.randint(0, 9999),
+                                                                             rng.randint(0, 9999))})
+    traditional, extended = rng.choice(_categories)
+    subjects = [{"ascatype": "traditional", "code": "DR", "content": traditional},
+                {"ascatype": "extended", "content": extended}]
+    if rng.random() < 0.3:
+        other = rng.choice(_categories)
+        subjects += [{"ascatype": "traditional", "code": "XY", "content": other[0]},
+                     {"ascatype": "extended", "content": other[1]}]
+    keywords = list({rng.choice(_words) for _ in range(rng.randint(0, 6))})
+    addresses = [{"address_spec": {"addr_no": x + 1, "full_address": "UNIV {}, DEPT {}, CITY {}".format(
+        rng.choice(_surnames), rng.choice(_words), rng.randint(1, 99))}} for x in range(rng.randint(1, 3))]
+
+    fullrecord = {
+        "languages": languages,
+        "refs": {"count": rng.randint(0, 80)},
+        "category_info": {"headings": {"count": 1, "heading": "Science & Technology"},
+                          "subjects": {"count": len(subjects), "subject": subjects}},
+        "addresses": {"count": len(addresses), "address_name": addresses if len(addresses) > 1 else addresses[0]},
+        "reprint_addresses": {"count": 1, "address_name": {"address_spec": addresses[0]["address_spec"]}},
+    }
+    if rng.random() < 0.85:
+        fullrecord["abstracts"] = {"count": 1, "abstract": {"abstract_text": {
+            "count": 1, "p": " ".join(rng.choice(_words).lower() for _ in range(rng.randint(40, 200)))}}}
+
+    record = {
+        "UID": uid,
+        "static_data": {
+            "summary": {
+                "EWUID": {"WUID": {"coll_id": "WOS"}, "edition": {"value": "WOS.SCI"}},
+                "pub_info": {"coverdate": "{} {}".format(rng.choice(["JAN", "MAR", "JUN", "SEP"]), year),
+                             "has_abstract": "Y", "pubyear": year, "pubtype": "Journal", "vol": str(rng.randint(1, 400)),
+                             "issue": str(rng.randint(1, 12)), "pubmonth": rng.choice(["JAN", "MAR", "JUN", "SEP"]),
+                             "page": {"begin": "1", "end": "10", "page_count": rng.randint(1, 40)}},
+                "titles": {"count": len(titles), "title": titles},
+                "names": {"count": len(names), "name": names if len(names) > 1 else names[0]},
+                "doctypes": {"count": 1, "doctype": rng.choice(["Article", "Article", "Review", "Letter"])},
+                "publishers": {"publisher": {"address_spec": {"addr_no": 1, "full_address": publisher[2],
+                                                              "city": publisher[1]},
+                                             "names": {"count": 1, "name": {"role": "publisher", "seq_no": 1,
+                                                                            "full_name": publisher[0]}}}},
+            },
+            "item": {"ids": {"content": "{}{}".format(rng.choice("ABCDEFG"), rng.randint(1000, 9999)), "avail": "N"},
+                     "keywords_plus": {"count": len(keywords), "keyword": keywords}},
+            "fullrecord_metadata": fullrecord,
+        },
+        "dynamic_data": {
+            "citation_related": {"tc_list": {"silo_tc": {"coll_id": "WOS", "local_count": rng.randint(0, 500)}}},
+            "cluster_related": {"identifiers": {"identifier": identifiers}},
+        },
+    }
+    if not keywords:
+        del record["static_data"]["item"]["keywords_plus"]
+    return record
+
+
+def make_corpus(size, seed=0):
+    """Return a list of `size` synthetic raw records."""
+    return [make_record(x, seed) for x in range(size)]